@@ -1,102 +1,145 @@
-import pandas as pd
-import re
-from collections import defaultdict
-
-def clean_nip_schedule(file_path):
-    # Read the corrupted CSV with flexible parsing
-    df = pd.read_csv(file_path, header=0, on_bad_lines='skip')
-    
-    # Initialize clean data storage
-    clean_data = []
-    current_vaccine = None
-    vaccine_entries = defaultdict(dict)
-    
-    # Vaccine mapping with primary identifiers
-    vaccine_map = {
-        'Hepatitis B': ['Hepatitis B', 'Hep B'],
-        'Pentavalent': ['Pentavalent', 'Diphtheria', 'Pertussis', 'Tetanus', 'Hib'],
-        'IPV': ['IPV', 'Polio'],
-        'Pneumococcal': ['Pneumococcal', 'PCV'],
-        'Td': ['Td', 'Tetanus'],
-        'Measles': ['Measles'],
-        'Rubella': ['Rubella'],
-        'Japanese Encephalitis': ['Japanese Encephalitis', 'JE']
-    }
-    
-    for _, row in df.iterrows():
-        # Check for vaccine name in any column
-        vaccine_found = None
-        for col in df.columns:
-            cell_value = str(row[col])
-            for vaccine, patterns in vaccine_map.items():
-                if any(re.search(p, cell_value, re.IGNORECASE) for p in patterns):
-                    vaccine_found = vaccine
-                    break
-            if vaccine_found:
-                break
-        
-        if vaccine_found:
-            current_vaccine = vaccine_found
-            vaccine_entries[current_vaccine] = {
-                'Vaccine': current_vaccine,
-                'When to give': '',
-                'Dose': '',
-                'Route': '',
-                'Site': ''
-            }
-        
-        if current_vaccine:
-            # Clean and add information to appropriate fields
-            for col in df.columns:
-                clean_val = re.sub(r'[^a-zA-Z0-9\s\-/()]', '', str(row[col])).strip()
-                if not clean_val:
-                    continue
-                
-                if col == 'When to give':
-                    vaccine_entries[current_vaccine]['When to give'] += ' ' + clean_val
-                elif col == 'Dose':
-                    vaccine_entries[current_vaccine]['Dose'] += ' ' + clean_val
-                elif col == 'Route':
-                    vaccine_entries[current_vaccine]['Route'] += ' ' + clean_val
-                elif col == 'Site':
-                    vaccine_entries[current_vaccine]['Site'] += ' ' + clean_val
-                elif col == 'Vaccine' and not vaccine_found:
-                    # Handle continuation lines
-                    vaccine_entries[current_vaccine]['Vaccine'] += ' ' + clean_val
-    
-    # Post-processing
-    for vaccine, entry in vaccine_entries.items():
-        # Standardize dose information
-        if 'dose' in entry['Dose'].lower():
-            entry['Dose'] = re.sub(r'(?i)dose\s*', '', entry['Dose'])
-        
-        # Extract age information
-        age_matches = re.findall(
-            r'(\d+\s*(?:days?|weeks?|months?|years?)|at\s*birth|first\s*\d+\s*days?)', 
-            entry['When to give'],
-            re.IGNORECASE
-        )
-        if age_matches:
-            entry['When to give'] = ', '.join(sorted(set(age_matches)))
-        
-        # Clean other fields
-        for field in ['Dose', 'Route', 'Site']:
-            entry[field] = re.sub(r'\s+', ' ', entry[field]).strip()
-            entry[field] = re.sub(r'(?i)left\b', 'Left', entry[field])
-            entry[field] = re.sub(r'(?i)right\b', 'Right', entry[field])
-        
-        clean_data.append(entry)
-    
-    return pd.DataFrame(clean_data)
-
-# Process the file
-input_path = r"C:\Users\mackrish_malik\Desktop\Amandeep Code\output\nip_schedule.csv"
-output_path = r"C:\Users\mackrish_malik\Desktop\Amandeep Code\output\cleaned_nip_schedule.csv"
-
-cleaned_df = clean_nip_schedule(input_path)
-
-# Save cleaned data
-cleaned_df.to_csv(output_path, index=False)
-
-print("Cleaning complete. Results:")
-print(cleaned_df.head().to_string(index=False))
\ No newline at end of file
+import numpy as np
+import pandas as pd
+import re
+
+# Vaccine mapping with primary identifiers
+VACCINE_MAP = {
+    'Hepatitis B': ['Hepatitis B', 'Hep B'],
+    'Pentavalent': ['Pentavalent', 'Diphtheria', 'Pertussis', 'Tetanus', 'Hib'],
+    'IPV': ['IPV', 'Polio'],
+    'Pneumococcal': ['Pneumococcal', 'PCV'],
+    'Td': ['Td', 'Tetanus'],
+    'Measles': ['Measles'],
+    'Rubella': ['Rubella'],
+    'Japanese Encephalitis': ['Japanese Encephalitis', 'JE']
+}
+
+FIELDS = ['When to give', 'Dose', 'Route', 'Site']
+
+def build_vaccine_pattern(vaccine_map):
+    """One regex that tells which vaccine a cell mentions.
+
+    Each vaccine gets a lookahead alternative anchored at the start of the
+    cell. The regex engine tries them in order, so when a cell mentions
+    several vaccines the first one in vaccine_map wins, wherever it appears
+    in the text.
+    """
+    alternatives = [
+        f"(?=.*?(?P<v{i}>{'|'.join(patterns)}))"
+        for i, patterns in enumerate(vaccine_map.values())
+    ]
+    return re.compile("^(?:" + "|".join(alternatives) + ")", re.IGNORECASE | re.DOTALL)
+
+VACCINE_PATTERN = build_vaccine_pattern(VACCINE_MAP)
+NOISE_PATTERN = re.compile(r'[^a-zA-Z0-9\s\-/()]')
+AGE_PATTERN = re.compile(
+    r'(\d+\s*(?:days?|weeks?|months?|years?)|at\s*birth|first\s*\d+\s*days?)',
+    re.IGNORECASE
+)
+
+def _per_unique(series, transform):
+    """Apply a vectorized string transform once per distinct cell value.
+
+    OCR dumps repeat the same cells over and over, so the regex work scales
+    with the number of distinct values rather than the number of rows.
+    """
+    codes, uniques = pd.factorize(series.astype(str), use_na_sentinel=False)
+    return transform(pd.Series(uniques, dtype=object)).to_numpy()[codes]
+
+def find_vaccines(df, vaccine_map=VACCINE_MAP, pattern=VACCINE_PATTERN):
+    """Vaccine named in each row (first matching column wins), NaN if none"""
+    names = np.array(list(vaccine_map) + [np.nan], dtype=object)
+
+    def vaccine_of(values):
+        matched = values.str.extract(pattern).notna().to_numpy()
+        # Cells with no match point at the trailing NaN
+        index = np.where(matched.any(axis=1), matched.argmax(axis=1), len(names) - 1)
+        return pd.Series(names[index], dtype=object)
+
+    found = pd.Series(np.nan, index=df.index, dtype=object)
+    for col in df.columns:
+        found = found.fillna(pd.Series(_per_unique(df[col], vaccine_of), index=df.index))
+    return found
+
+def _clean_column(series):
+    """Strip noise characters; ' value' for non-empty cells, '' otherwise"""
+    def clean(values):
+        values = values.str.replace(NOISE_PATTERN, '', regex=True).str.strip()
+        return values.where(values == '', ' ' + values)
+    return pd.Series(_per_unique(series, clean), index=series.index, dtype=object)
+
+def clean_nip_dataframe(df, vaccine_map=VACCINE_MAP):
+    """Merge OCR'd NIP rows into one cleaned entry per vaccine.
+
+    A row that mentions a vaccine starts a new entry; the rows after it are
+    continuation lines whose cells are appended to that entry. If a vaccine
+    shows up again, its later block replaces the earlier one but keeps the
+    earlier position in the output.
+    """
+    pattern = VACCINE_PATTERN if vaccine_map is VACCINE_MAP else build_vaccine_pattern(vaccine_map)
+    found = find_vaccines(df, vaccine_map, pattern)
+    starts = found.notna()
+
+    # Block number per row; block 0 is anything before the first vaccine
+    block = starts.cumsum()
+    if not starts.any():
+        return pd.DataFrame()
+
+    heads = pd.DataFrame({'Vaccine': found[starts], 'block': block[starts]})
+    first_seen = heads.groupby('Vaccine', sort=False)['block'].min()
+    last_block = heads.groupby('Vaccine', sort=False)['block'].max()
+    order = first_seen.sort_values().index
+
+    # Only the last block of each vaccine reaches the output
+    blocks = last_block[order].to_numpy()
+    kept = block.isin(blocks).to_numpy()
+    kept_block = block[kept]
+
+    grouped = {}
+    for field in FIELDS:
+        if field in df.columns:
+            grouped[field] = _clean_column(df.loc[kept, field]).groupby(kept_block).agg(''.join)
+    if 'Vaccine' in df.columns:
+        # Only continuation rows extend the vaccine name
+        continuation = kept & ~starts.to_numpy()
+        grouped['Vaccine'] = _clean_column(df.loc[continuation, 'Vaccine']).groupby(block[continuation]).agg(''.join)
+
+    result = pd.DataFrame({'Vaccine': order.to_numpy(dtype=object)})
+    for field in ['Vaccine'] + FIELDS:
+        text = grouped[field].reindex(blocks, fill_value='').to_numpy() if field in grouped else ''
+        result[field] = result['Vaccine'] + text if field == 'Vaccine' else text
+    result[FIELDS] = result[FIELDS].astype(object)
+
+    # Standardize dose information
+    result['Dose'] = result['Dose'].str.replace(r'(?i)dose\s*', '', regex=True)
+
+    # Extract age information
+    ages = result['When to give'].str.findall(AGE_PATTERN)
+    has_ages = ages.str.len() > 0
+    result.loc[has_ages, 'When to give'] = ages[has_ages].map(lambda found_ages: ', '.join(sorted(set(found_ages))))
+
+    # Clean other fields
+    for field in ['Dose', 'Route', 'Site']:
+        values = result[field].str.replace(r'\s+', ' ', regex=True).str.strip()
+        values = values.str.replace(r'(?i)left\b', 'Left', regex=True)
+        result[field] = values.str.replace(r'(?i)right\b', 'Right', regex=True)
+
+    return result
+
+def clean_nip_schedule(file_path):
+    # Read the corrupted CSV with flexible parsing
+    df = pd.read_csv(file_path, header=0, on_bad_lines='skip')
+    return clean_nip_dataframe(df)
+
+if __name__ == "__main__":
+    # Process the file
+    input_path = r"C:\Users\mackrish_malik\Desktop\Amandeep Code\output\nip_schedule.csv"
+    output_path = r"C:\Users\mackrish_malik\Desktop\Amandeep Code\output\cleaned_nip_schedule.csv"
+
+    cleaned_df = clean_nip_schedule(input_path)
+
+    # Save cleaned data
+    cleaned_df.to_csv(output_path, index=False)
+
+    print("Cleaning complete. Results:")
+    print(cleaned_df.head().to_string(index=False))
@@ -1,80 +1,590 @@
-from flask import Flask, request, render_template
-from vaccine_recommender import VaccineRecommender
-
-app = Flask(__name__)
-recommender = VaccineRecommender("data/nip_schedule.json", "data/iap_schedule.json")
-
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    if request.method == 'POST':
-        try:
-            age_value = request.form.get('age_value', '0')
-            age_unit = request.form.get('age_unit', 'weeks')
-            include_iap = request.form.get('include_iap', 'off') == 'on'
-
-            if not age_value or not age_value.replace('.', '').isdigit():
-                raise ValueError("Please enter a valid age number")
-            
-            age_value = float(age_value)
-            if age_value < 0:
-                raise ValueError("Age cannot be negative")
-
-            # Convert to days
-            if age_unit == 'hours':
-                age_days = age_value / 24
-            elif age_unit == 'days':
-                age_days = age_value
-            elif age_unit == 'weeks':
-                age_days = age_value * 7
-            elif age_unit == 'months':
-                age_days = age_value * 30
-            elif age_unit == 'years':
-                age_days = age_value * 365
-            else:
-                age_days = 0
-                
-            nip_recs = recommender.get_nip_recommendations(age_days)
-            iap_recs = recommender.get_iap_recommendations(age_days) if include_iap else []
-            
-            return render_template('results.html', 
-                                age=f"{age_value} {age_unit}",
-                                nip_recommendations=nip_recs,
-                                iap_recommendations=iap_recs,
-                                include_iap=include_iap)
-            
-        except Exception as e:
-            return render_template('index.html', error=str(e)), 400
-    
-    return render_template('index.html')
-
-@app.route('/schedule')
-def full_schedule():
-    try:
-        schedule_type = request.args.get('type', 'nip')
-        if schedule_type not in ['nip', 'iap']:
-            raise ValueError("Invalid schedule type")
-            
-        formatted = recommender.get_formatted_schedule(schedule_type)
-        return render_template('schedule.html', 
-                            schedule=formatted,
-                            schedule_type=schedule_type.upper())
-    except Exception as e:
-        return render_template('error.html', error=str(e)), 400
-
-@app.route('/compare')
-def compare_schedules():
-    try:
-        schedules = recommender.get_all_schedules()
-        return render_template('compare.html',
-                            nip_schedule=schedules["nip"],
-                            iap_schedule=schedules["iap"],
-                            categories=schedules["iap_categories"])
-    except Exception as e:
-        return render_template('error.html', error=str(e)), 400
-
-@app.errorhandler(404)
-def page_not_found(e):
-    return render_template('error.html', error="Page not found"), 404
-
-if __name__ == '__main__':
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import time
+
+from flask import Flask, request, render_template, jsonify, g
+from werkzeug.exceptions import RequestEntityTooLarge
+from extraction_jobs import ExtractionQueue, FINISHED_STATES, JOB_OPTIONS
+from lru_cache import LRUCache
+from metrics import registry, FAST_BUCKETS, PROMETHEUS_CONTENT_TYPE
+from schedule_reloader import ScheduleReloader
+from vaccine_recommender import records_json, to_date
+from schedule_export import to_csv, to_ical
+
+app = Flask(__name__)
+
+# Seconds between checks of data/*.json for changes; 0 disables hot reload
+SCHEDULE_RELOAD_INTERVAL = float(os.environ.get('SCHEDULE_RELOAD_INTERVAL', '5'))
+schedules = ScheduleReloader("data/nip_schedule.json", "data/iap_schedule.json",
+                             interval=SCHEDULE_RELOAD_INTERVAL)
+
+# Serialized /api/recommendations bodies keyed on
+# (schedule generation, age_days, include_iap)
+recommendation_cache = LRUCache(maxsize=4096)
+
+# Rendered /schedule and /compare pages; the schedules only change on reload
+static_pages = {}
+
+# Uploaded PDFs are extracted off the request path by a local process pool
+# (see extraction_jobs.py); job state lives in EXTRACTION_JOBS_DIR
+EXTRACTION_JOBS_DIR = os.environ.get('EXTRACTION_JOBS_DIR', 'jobs')
+EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', '0')) or None
+# Finished jobs and their results are deleted after this long; 0 keeps them
+EXTRACTION_RETENTION_HOURS = float(os.environ.get('EXTRACTION_RETENTION_HOURS', '168'))
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '50')) * 1024 * 1024
+# Also bounds chunked bodies, which declare no Content-Length up front
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+DEFAULT_EXTRACTION_PAGES = '4:nip,5:iap'
+# Seconds between progress checks on /api/extractions/<id>/events, and the
+# longest one event stream may hold a request thread before the client
+# has to reconnect
+JOB_EVENT_INTERVAL = 0.5
+JOB_EVENTS_MAX_SECONDS = float(os.environ.get('JOB_EVENTS_MAX_SECONDS', '30'))
+extraction_jobs = ExtractionQueue(EXTRACTION_JOBS_DIR, workers=EXTRACTION_WORKERS,
+                                  retention=EXTRACTION_RETENTION_HOURS * 3600 or None)
+
+# Instrumentation; exported at /metrics, disabled with METRICS_ENABLED=0
+request_latency = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by route',
+    ('route', 'method', 'status'))
+lookup_latency = registry.histogram(
+    'recommender_lookup_seconds', 'Single-age recommender lookup time',
+    ('schedule',), buckets=FAST_BUCKETS)
+batch_latency = registry.histogram(
+    'recommender_batch_seconds', 'recommend_many time per batch request')
+static_page_lookups = registry.counter(
+    'static_page_cache_lookups_total', 'Rendered page cache lookups', ('result',))
+
+def _cache_stats():
+    hits = static_page_lookups.value(result='hit')
+    misses = static_page_lookups.value(result='miss')
+    return {
+        'recommendations': recommendation_cache.stats(),
+        'static_pages': {
+            'size': len(static_pages),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else 0.0
+        }
+    }
+
+registry.gauge('cache_hit_ratio', 'Hit ratio per response cache',
+               lambda: {(name, ): stats['hit_ratio'] for name, stats in _cache_stats().items()},
+               ('cache',))
+registry.gauge('extraction_jobs', 'PDF extraction jobs by state',
+               lambda: {(status, ): count for status, count in extraction_jobs.counts().items()},
+               ('status',))
+registry.gauge('cache_entries', 'Entries held per response cache',
+               lambda: {(name, ): stats['size'] for name, stats in _cache_stats().items()},
+               ('cache',))
+
+class RenderedPage:
+    """A rendered HTML body with its gzip variant and strong ETags"""
+
+    def __init__(self, html):
+        self.body = html.encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=9)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        # Each encoding is a different representation and gets its own tag
+        self.gzip_etag = self.etag + '-gz'
+
+# Days per age unit; unknown units fall back to 0 days
+AGE_UNIT_DAYS = {
+    'hours': 1 / 24,
+    'days': 1,
+    'weeks': 7,
+    'months': 30,
+    'years': 365
+}
+
+def to_days(age_value, age_unit):
+    """Convert an age in the given unit to days"""
+    if age_unit == 'hours':
+        return age_value / 24
+    return age_value * AGE_UNIT_DAYS.get(age_unit, 0)
+
+def parse_age_input(age_value, age_unit):
+    """Validate a raw age value from a form or query string and convert to days"""
+    if not age_value or not age_value.replace('.', '').isdigit():
+        raise ValueError("Please enter a valid age number")
+
+    age_value = float(age_value)
+    if age_value < 0:
+        raise ValueError("Age cannot be negative")
+
+    return age_value, to_days(age_value, age_unit)
+
+def _is_number(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def _to_age(value):
+    """A finite age from a JSON or CSV value; NaN, infinities and bools are rejected"""
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid age: {json.dumps(value)}")
+    try:
+        age = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid age: {json.dumps(value)}")
+    if not math.isfinite(age):
+        raise ValueError(f"Invalid age: {json.dumps(value)}")
+    return age
+
+def parse_age_list(req):
+    """Read a list of ages from a JSON body, a CSV upload or a CSV body"""
+    if req.is_json:
+        return ages_from_json(req.get_json())
+
+    if 'file' in req.files:
+        return ages_from_csv(req.files['file'].read().decode('utf-8-sig'))
+    return ages_from_csv(req.get_data(as_text=True))
+
+def ages_from_json(payload):
+    """Ages from a JSON list, or a {"ages": [...]} object"""
+    if isinstance(payload, dict):
+        payload = payload.get('ages', [])
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON list of ages")
+    return [_to_age(age) for age in payload]
+
+def ages_from_csv(text):
+    """Ages from CSV text, one per row, with an optional header row"""
+    ages = []
+    rows = csv.reader(io.StringIO(text))
+    column = 0
+    for i, row in enumerate(rows):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if column >= len(row):
+            raise ValueError(f"Row {i + 1} has no age column")
+        if not row[column].strip():
+            continue
+        if i == 0 and not _is_number(row[column]):
+            # Header row; pick the age column if there is one
+            header = [cell.strip().lower() for cell in row]
+            for name in ('age_days', 'age', 'age_value'):
+                if name in header:
+                    column = header.index(name)
+                    break
+            continue
+        ages.append(_to_age(row[column]))
+    return ages
+
+@app.route('/', methods=['GET', 'POST'])
+def index():
+    if request.method == 'POST':
+        try:
+            age_value = request.form.get('age_value', '0')
+            age_unit = request.form.get('age_unit', 'weeks')
+            include_iap = request.form.get('include_iap', 'off') == 'on'
+
+            age_value, age_days = parse_age_input(age_value, age_unit)
+
+            recommender = schedules.recommender
+            with lookup_latency.time(schedule='nip'):
+                nip_recs = recommender.get_nip_recommendations(age_days)
+            iap_recs = []
+            if include_iap:
+                with lookup_latency.time(schedule='iap'):
+                    iap_recs = recommender.get_iap_recommendations(age_days)
+            
+            return render_template('results.html', 
+                                age=f"{age_value} {age_unit}",
+                                nip_recommendations=nip_recs,
+                                iap_recommendations=iap_recs,
+                                include_iap=include_iap)
+            
+        except Exception as e:
+            return render_template('index.html', error=str(e)), 400
+    
+    return render_template('index.html')
+
+def invalidate_caches(generation):
+    """Drop everything derived from the previous schedules"""
+    recommendation_cache.clear()
+    static_pages.clear()
+
+schedules.add_listener(invalidate_caches)
+
+@app.before_request
+def start_schedule_reloader():
+    schedules.ensure_started()
+
+@app.before_request
+def start_extraction_dispatcher():
+    extraction_jobs.ensure_started()
+
+@app.before_request
+def start_request_timer():
+    if registry.enabled:
+        g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # Label by route pattern, not path, so the series count stays bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_latency.observe(time.perf_counter() - start, route=route,
+                                method=request.method, status=response.status_code)
+    return response
+
+def serve_static_page(key, render):
+    """Serve a page rendered once, with ETag/304 and pre-gzipped variants"""
+    # Tag with the generation so a render racing a reload is never reused
+    key = (schedules.generation,) + key
+    page = static_pages.get(key)
+    if page is None:
+        static_page_lookups.inc(result='miss')
+        page = RenderedPage(render())
+        static_pages[key] = page
+    else:
+        static_page_lookups.inc(result='hit')
+
+    use_gzip = 'gzip' in request.accept_encodings
+    etag = page.gzip_etag if use_gzip else page.etag
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(page.gzip_body if use_gzip else page.body,
+                                      mimetype='text/html')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+
+    response.set_etag(etag)
+    # The schedules can be reloaded at any time, so clients revalidate on
+    # every use; the ETag keeps that to a cheap 304
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def render_schedule_page(schedule_type):
+    formatted = schedules.recommender.get_formatted_schedule(schedule_type)
+    return render_template('schedule.html',
+                        schedule=formatted,
+                        schedule_type=schedule_type.upper())
+
+def render_compare_page():
+    all_schedules = schedules.recommender.get_all_schedules()
+    return render_template('compare.html',
+                        nip_schedule=all_schedules["nip"],
+                        iap_schedule=all_schedules["iap"],
+                        categories=all_schedules["iap_categories"])
+
+def prerender_static_pages():
+    """Render /schedule and /compare up front so the first hit is cheap too"""
+    generation = schedules.generation
+    with app.test_request_context():
+        for schedule_type in ('nip', 'iap'):
+            static_pages[(generation, 'schedule', schedule_type)] = RenderedPage(render_schedule_page(schedule_type))
+        static_pages[(generation, 'compare')] = RenderedPage(render_compare_page())
+
+@app.route('/schedule')
+def full_schedule():
+    try:
+        schedule_type = request.args.get('type', 'nip')
+        if schedule_type not in ['nip', 'iap']:
+            raise ValueError("Invalid schedule type")
+
+        return serve_static_page(('schedule', schedule_type),
+                                 lambda: render_schedule_page(schedule_type))
+    except Exception as e:
+        return render_template('error.html', error=str(e)), 400
+
+@app.route('/compare')
+def compare_schedules():
+    try:
+        return serve_static_page(('compare',), render_compare_page)
+    except Exception as e:
+        return render_template('error.html', error=str(e)), 400
+
+def _render_recommendations_json(recommender, age_days, include_iap):
+    with lookup_latency.time(schedule='nip'):
+        nip_recs = recommender.get_nip_recommendations(age_days)
+    iap_recs = ()
+    if include_iap:
+        with lookup_latency.time(schedule='iap'):
+            iap_recs = recommender.get_iap_recommendations(age_days)
+    # Records carry their own JSON; only the envelope is encoded here
+    return (f'{{"age_days": {json.dumps(age_days)}, "include_iap": {json.dumps(include_iap)}, '
+            f'"nip_recommendations": {records_json(nip_recs)}, '
+            f'"iap_recommendations": {records_json(iap_recs)}}}')
+
+def cached_recommendations(args):
+    """JSON body for /api/recommendations query args, and 'HIT' or 'MISS'.
+
+    Shared by the Flask route and the ASGI JSON API in asgi.py.
+    """
+    age_value = args.get('age_value', '0')
+    age_unit = args.get('age_unit', 'weeks')
+    include_iap = args.get('include_iap', 'off') in ('on', 'true', '1')
+
+    _, age_days = parse_age_input(age_value, age_unit)
+
+    key = (schedules.generation, age_days, include_iap)
+    body = recommendation_cache.get(key)
+    if body is not None:
+        return body, 'HIT'
+    body = _render_recommendations_json(schedules.recommender, age_days, include_iap)
+    recommendation_cache.put(key, body)
+    return body, 'MISS'
+
+def batch_recommendations_json(ages, args):
+    """JSON body for a batch of ages and the batch route's query args.
+
+    Ages in the same age window share one records tuple, so each distinct
+    tuple is joined into JSON once per batch.
+    """
+    age_unit = args.get('age_unit', 'days')
+    include_iap = args.get('include_iap', 'off') in ('on', 'true', '1')
+    if any(age < 0 for age in ages):
+        raise ValueError("Age cannot be negative")
+
+    ages_days = [to_days(age, age_unit) for age in ages]
+    with batch_latency.time():
+        results = schedules.recommender.recommend_many(ages_days, include_iap=include_iap)
+
+    fragments = {}
+    def fragment(records):
+        text = fragments.get(id(records))
+        if text is None:
+            text = fragments[id(records)] = records_json(records)
+        return text
+
+    items = [
+        f'{{"age": {json.dumps(age)}, "age_days": {json.dumps(result["age_days"])}, '
+        f'"nip_recommendations": {fragment(result["nip"])}, '
+        f'"iap_recommendations": {fragment(result["iap"])}}}'
+        for age, result in zip(ages, results)
+    ]
+    return (f'{{"count": {len(results)}, "include_iap": {json.dumps(include_iap)}, '
+            f'"results": [{", ".join(items)}]}}')
+
+@app.route('/api/recommendations')
+def api_recommendations():
+    try:
+        body, cache_status = cached_recommendations(request.args)
+        response = app.response_class(body, mimetype='application/json')
+        response.headers['X-Cache'] = cache_status
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/recommendations/cache')
+def api_recommendations_cache():
+    return jsonify(recommendation_cache.stats())
+
+@app.route('/api/recommendations/batch', methods=['POST'])
+def batch_recommendations():
+    try:
+        body = batch_recommendations_json(parse_age_list(request), request.args)
+        return app.response_class(body, mimetype='application/json')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+PROJECTION_FORMATS = {
+    'csv': 'text/csv',
+    'ics': 'text/calendar'
+}
+
+def _projection_options(args):
+    horizon = args.get('horizon_days')
+    as_of = args.get('as_of')
+    fmt = args.get('format', 'json')
+    if fmt not in ('json',) + tuple(PROJECTION_FORMATS):
+        raise ValueError("format must be json, csv or ics")
+    return {
+        'horizon': int(horizon) if horizon else None,
+        'as_of': to_date(as_of) if as_of else None,
+        'include_iap': args.get('include_iap', 'on') in ('on', 'true', '1')
+    }, fmt
+
+def _projection_response(projections, child_ids, dates_of_birth, fmt):
+    if fmt in PROJECTION_FORMATS:
+        body = to_csv(projections, child_ids) if fmt == 'csv' else to_ical(projections, child_ids)
+        response = app.response_class(body, mimetype=PROJECTION_FORMATS[fmt])
+        response.headers['Content-Disposition'] = f'attachment; filename=schedule.{fmt}'
+        return response
+
+    return jsonify({
+        "count": len(projections),
+        "children": [
+            {
+                "child": child,
+                "date_of_birth": dob.isoformat(),
+                "doses": [
+                    {
+                        "vaccine": dose["vaccine"],
+                        "schedule_type": dose["schedule_type"],
+                        "due_age": dose["due_age"],
+                        "due_date": dose["due_date"].isoformat(),
+                        "window_end": dose["window_end"].isoformat() if dose["window_end"] else None,
+                        "status": dose["status"]
+                    }
+                    for dose in projection
+                ]
+            }
+            for child, dob, projection in zip(child_ids, dates_of_birth, projections)
+        ]
+    })
+
+@app.route('/api/schedule/projection')
+def schedule_projection():
+    """Every dose for one child: ?dob=YYYY-MM-DD[&horizon_days=&as_of=&format=json|csv|ics]"""
+    try:
+        if not request.args.get('dob'):
+            raise ValueError("Please give a date of birth (dob=YYYY-MM-DD)")
+        dob = to_date(request.args['dob'])
+        options, fmt = _projection_options(request.args)
+        projection = schedules.recommender.project_schedule(dob, **options)
+        return _projection_response([projection], [dob.isoformat()], [dob], fmt)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/schedule/projection/batch', methods=['POST'])
+def batch_schedule_projection():
+    """Every dose for many children from a JSON list of dates of birth.
+
+    The body is a list of 'YYYY-MM-DD' strings, or an object with
+    "dates_of_birth" and optional matching "ids". Query args as for
+    /api/schedule/projection.
+    """
+    try:
+        payload = request.get_json(silent=True)
+        ids = None
+        if isinstance(payload, dict):
+            ids = payload.get('ids')
+            payload = payload.get('dates_of_birth')
+        if not isinstance(payload, list):
+            raise ValueError("Expected a JSON list of dates of birth")
+        dates_of_birth = [to_date(dob) for dob in payload]
+        if ids is None:
+            ids = [dob.isoformat() for dob in dates_of_birth]
+        elif len(ids) != len(dates_of_birth):
+            raise ValueError("ids and dates_of_birth must be the same length")
+
+        options, fmt = _projection_options(request.args)
+        projections = schedules.recommender.project_schedules(dates_of_birth, **options)
+        return _projection_response(projections, [str(i) for i in ids], dates_of_birth, fmt)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+def _job_urls(job_id):
+    return {
+        "status_url": f"/api/extractions/{job_id}",
+        "events_url": f"/api/extractions/{job_id}/events",
+        "results_url": f"/api/extractions/{job_id}/results"
+    }
+
+@app.route('/api/extractions', methods=['POST'])
+def submit_extraction():
+    """Queue a PDF for schedule extraction; answers 202 with the job id.
+
+    The PDF is the 'pdf' field of a multipart upload, or the whole body
+    with Content-Type application/pdf. pages ('4:nip,5:iap', 1-based) and
+    the process_page flags in JOB_OPTIONS (force_ocr=1, ...) come from the
+    form or the query string.
+    """
+    try:
+        upload = request.files.get('pdf')
+        if upload is not None:
+            pdf_bytes, filename = upload.read(), upload.filename
+        elif request.mimetype == 'application/pdf':
+            pdf_bytes, filename = request.get_data(), request.args.get('filename')
+        else:
+            raise ValueError("Send the PDF as a multipart 'pdf' field or as application/pdf")
+        if len(pdf_bytes) >= MAX_UPLOAD_BYTES:
+            # A chunked body is cut off at the limit rather than refused
+            raise RequestEntityTooLarge()
+        if not pdf_bytes.startswith(b'%PDF-'):
+            raise ValueError("Not a PDF file")
+
+        from main import parse_page_spec
+        page_jobs = parse_page_spec(request.values.get('pages', DEFAULT_EXTRACTION_PAGES))
+        options = {name: request.values.get(name) in ('on', 'true', '1')
+                   for name in JOB_OPTIONS if name in request.values}
+        job_id = extraction_jobs.submit(pdf_bytes, page_jobs, filename=filename, **options)
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"PDF must be smaller than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"}), 413
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = jsonify({"job_id": job_id, "status": "queued", **_job_urls(job_id)})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/extractions/{job_id}"
+    return response
+
+@app.route('/api/extractions/<job_id>')
+def extraction_status(job_id):
+    """The job's state with per-page progress (status, method, rows, seconds)"""
+    status = extraction_jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify({**status, **_job_urls(job_id)})
+
+@app.route('/api/extractions/<job_id>/events')
+def extraction_events(job_id):
+    """Server-sent events: the job's status each time a page finishes.
+
+    Each stream holds one request thread, so it ends when the job does or
+    after JOB_EVENTS_MAX_SECONDS, whichever comes first. EventSource
+    clients reconnect by themselves (after the retry delay sent here) and
+    get the current status straight away; others should poll the status
+    URL. Long-lived watchers are better served by the ASGI app's worker
+    (see asgi.py), which does not tie up a thread per stream.
+    """
+    if extraction_jobs.status(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    def events():
+        deadline = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+        last = None
+        yield "retry: 1000\n\n"
+        while True:
+            status = extraction_jobs.status(job_id)
+            progress = (status['status'], status['pages_done'])
+            if progress != last:
+                last = progress
+                yield f"event: progress\ndata: {json.dumps(status)}\n\n"
+            if status['status'] in FINISHED_STATES or time.monotonic() >= deadline:
+                return
+            time.sleep(JOB_EVENT_INTERVAL)
+
+    response = app.response_class(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Let nginx pass events through as they come
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/extractions/<job_id>/results')
+def extraction_results(job_id):
+    """Rows parsed so far, by schedule; complete once status is 'done'"""
+    status = extraction_jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify({"job_id": job_id, "status": status['status'],
+                    "results": extraction_jobs.results(job_id)})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint; ?format=json returns a summary instead"""
+    if request.args.get('format') == 'json':
+        return jsonify(registry.summary())
+    return app.response_class(registry.render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.errorhandler(404)
+def page_not_found(e):
+    return render_template('error.html', error="Page not found"), 404
+
+if __name__ == '__main__':
+    prerender_static_pages()
     app.run(debug=True)
\ No newline at end of file
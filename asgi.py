@@ -0,0 +1,177 @@
+"""ASGI entry point with a native async JSON API.
+
+    uvicorn asgi:application --workers 4
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+
+/api/recommendations, /api/recommendations/batch and the extraction job
+event streams (/api/extractions/<id>/events) are answered here directly,
+without a WSGI thread per request, and share the Flask app's schedules,
+caches, jobs and metrics. An event stream here lasts until its job ends,
+and request bodies are capped at MAX_UPLOAD_MB like in the Flask app.
+
+Everything else is passed to the Flask app when asgiref is installed
+(it is in requirements.txt) and is a 404 otherwise.
+"""
+import asyncio
+import json
+import time
+from urllib.parse import parse_qsl
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from app import (JOB_EVENT_INTERVAL, MAX_UPLOAD_BYTES, ages_from_csv, ages_from_json, batch_recommendations_json,
+                 cached_recommendations, extraction_jobs, request_latency, schedules)
+from extraction_jobs import FINISHED_STATES
+# Importing wsgi prerenders the static pages and freezes the heap, once
+from wsgi import application as flask_app
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    WsgiToAsgi = None
+
+fallback = WsgiToAsgi(flask_app) if WsgiToAsgi else None
+
+async def _read_body(scope, receive, limit=MAX_UPLOAD_BYTES):
+    """The whole request body; RequestEntityTooLarge past limit bytes,
+    whether declared up front or only found while reading"""
+    declared = dict(scope['headers']).get(b'content-length')
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise RequestEntityTooLarge()
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise RequestEntityTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def _send(send, status, body, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode()),
+                    *headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+def _error(message):
+    return json.dumps({"error": message}).encode()
+
+async def recommendations(scope, receive, send):
+    try:
+        args = dict(parse_qsl(scope['query_string'].decode()))
+        body, cache_status = cached_recommendations(args)
+    except Exception as e:
+        await _send(send, 400, _error(str(e)))
+        return 400
+    await _send(send, 200, body.encode(), [(b'x-cache', cache_status.encode())])
+    return 200
+
+async def batch_recommendations(scope, receive, send):
+    try:
+        args = dict(parse_qsl(scope['query_string'].decode()))
+        headers = dict(scope['headers'])
+        body = await _read_body(scope, receive)
+        if headers.get(b'content-type', b'').startswith(b'application/json'):
+            ages = ages_from_json(json.loads(body or b'null'))
+        else:
+            ages = ages_from_csv(body.decode('utf-8-sig'))
+        # Big cohorts take a while; keep the event loop free meanwhile
+        loop = asyncio.get_running_loop()
+        body = await loop.run_in_executor(None, batch_recommendations_json, ages, args)
+    except RequestEntityTooLarge:
+        await _send(send, 413, _error(f"Request body must be smaller than "
+                                      f"{MAX_UPLOAD_BYTES // (1024 * 1024)} MB"))
+        return 413
+    except Exception as e:
+        await _send(send, 400, _error(str(e)))
+        return 400
+    await _send(send, 200, body.encode())
+    return 200
+
+async def extraction_events(scope, receive, send, job_id):
+    loop = asyncio.get_running_loop()
+    status = await loop.run_in_executor(None, extraction_jobs.status, job_id)
+    if status is None:
+        await _send(send, 404, _error("Unknown job"))
+        return 404
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no')]
+    })
+    last = None
+    while True:
+        progress = (status['status'], status['pages_done'])
+        if progress != last:
+            last = progress
+            event = f"event: progress\ndata: {json.dumps(status)}\n\n"
+            await send({'type': 'http.response.body', 'body': event.encode(), 'more_body': True})
+        if status['status'] in FINISHED_STATES:
+            break
+        await asyncio.sleep(JOB_EVENT_INTERVAL)
+        status = await loop.run_in_executor(None, extraction_jobs.status, job_id)
+    await send({'type': 'http.response.body', 'body': b''})
+    return 200
+
+def _job_events_id(path):
+    """The job id of an /api/extractions/<id>/events path, else None"""
+    prefix, suffix = '/api/extractions/', '/events'
+    if path.startswith(prefix) and path.endswith(suffix):
+        job_id = path[len(prefix):-len(suffix)]
+        if job_id and '/' not in job_id:
+            return job_id
+    return None
+
+ROUTES = {
+    ('GET', '/api/recommendations'): recommendations,
+    ('POST', '/api/recommendations/batch'): batch_recommendations
+}
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            schedules.stop()
+            extraction_jobs.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    schedules.ensure_started()
+    extraction_jobs.ensure_started()
+    handler = ROUTES.get((scope['method'], scope['path']))
+    job_id = _job_events_id(scope['path']) if scope['method'] == 'GET' else None
+    if job_id is not None:
+        start = time.perf_counter()
+        status = await extraction_events(scope, receive, send, job_id)
+        request_latency.observe(time.perf_counter() - start, route='/api/extractions/<job_id>/events',
+                                method='GET', status=status)
+        return
+    if handler is None:
+        if fallback is not None:
+            await fallback(scope, receive, send)
+        else:
+            await _send(send, 404, _error("Not found (install asgiref to serve the HTML pages)"))
+        return
+
+    start = time.perf_counter()
+    status = await handler(scope, receive, send)
+    request_latency.observe(time.perf_counter() - start, route=scope['path'],
+                            method=scope['method'], status=status)
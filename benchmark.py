@@ -0,0 +1,335 @@
+"""Benchmarks for the recommender, the Flask routes and the extraction pipeline.
+
+Run from the repository root:
+
+    python benchmark.py --scale 200 --output bench.json
+
+Everything runs on generated inputs: the schedules are scaled copies of
+data/*.json and the PDF is written with PyMuPDF, so results are comparable
+between commits. Results are printed (or written) as one JSON document.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+NIP_FILE = os.path.join(ROOT, "data", "nip_schedule.json")
+IAP_FILE = os.path.join(ROOT, "data", "iap_schedule.json")
+
+IAP_UNITS = ('w', 'm', 'y')
+
+def _summary(timings):
+    """Latency statistics in microseconds for a list of durations in seconds"""
+    values = np.asarray(timings) * 1e6
+    return {
+        "count": len(values),
+        "mean_us": float(values.mean()),
+        "p50_us": float(np.percentile(values, 50)),
+        "p95_us": float(np.percentile(values, 95)),
+        "p99_us": float(np.percentile(values, 99)),
+        "max_us": float(values.max())
+    }
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def generate_schedules(directory, scale=100, seed=0):
+    """Write scaled copies of the NIP and IAP schedules into directory.
+
+    Every entry is repeated scale times. Copy 0 is the original; the others
+    get a numbered vaccine name and random due ages, so the index sees
+    thousands of distinct windows instead of the same few repeated.
+    Returns (nip_path, iap_path).
+    """
+    rng = random.Random(seed)
+    with open(NIP_FILE) as f:
+        nip = json.load(f)
+    with open(IAP_FILE) as f:
+        iap = json.load(f)
+
+    nip_schedule = []
+    for copy in range(scale):
+        for vaccine in nip["schedule"]:
+            if copy == 0:
+                nip_schedule.append(vaccine)
+                continue
+            due_weeks = rng.randint(0, 520)
+            nip_schedule.append({
+                **vaccine,
+                "vaccine": f"{vaccine['vaccine']} #{copy}",
+                "due_age": f"At {due_weeks} weeks",
+                "max_age": f"{due_weeks // 52 + rng.randint(1, 10)} years of age"
+            })
+
+    iap_schedule = []
+    for copy in range(scale):
+        for vaccine in iap["schedule"]:
+            if copy == 0:
+                iap_schedule.append(vaccine)
+                continue
+            doses = [f"{rng.randint(1, 24)}{rng.choice(IAP_UNITS)}"
+                     for _ in vaccine["schedule"]]
+            iap_schedule.append({
+                **vaccine,
+                "vaccine": f"{vaccine['vaccine']} #{copy}",
+                "schedule": doses
+            })
+
+    nip_path = os.path.join(directory, "nip_schedule.json")
+    iap_path = os.path.join(directory, "iap_schedule.json")
+    with open(nip_path, "w") as f:
+        json.dump({**nip, "schedule": nip_schedule}, f)
+    with open(iap_path, "w") as f:
+        json.dump({**iap, "schedule": iap_schedule}, f)
+    return nip_path, iap_path
+
+def bench_recommender(nip_path, iap_path, calls=2000, batch_size=100000, seed=0):
+    """Index build time, per-call lookup latency and recommend_many throughput"""
+    from vaccine_recommender import VaccineRecommender
+
+    build_seconds, recommender = _timed(VaccineRecommender, nip_path, iap_path)
+    rng = np.random.default_rng(seed)
+    ages = rng.uniform(0, 20 * 365, size=calls).tolist()
+
+    nip_timings, iap_timings = [], []
+    for age in ages:
+        nip_timings.append(_timed(recommender.get_nip_recommendations, age)[0])
+        iap_timings.append(_timed(recommender.get_iap_recommendations, age)[0])
+
+    batch = rng.uniform(0, 20 * 365, size=batch_size)
+    batch_seconds, _ = _timed(recommender.recommend_many, batch)
+    return {
+        "nip_entries": len(recommender.nip_schedule),
+        "iap_entries": len(recommender.iap_schedule),
+        "nip_windows": len(recommender.nip_index),
+        "iap_windows": len(recommender.iap_index),
+        "build_seconds": build_seconds,
+        "nip_lookup": _summary(nip_timings),
+        "iap_lookup": _summary(iap_timings),
+        "batch": {
+            "size": batch_size,
+            "seconds": batch_seconds,
+            "ages_per_second": batch_size / batch_seconds if batch_seconds else None
+        }
+    }
+
+ROUTES = [
+    ("index", "GET", "/", None),
+    ("recommend_form", "POST", "/", {"age_value": "10", "age_unit": "weeks", "include_iap": "on"}),
+    ("schedule_nip", "GET", "/schedule?type=nip", None),
+    ("schedule_iap", "GET", "/schedule?type=iap", None),
+    ("compare", "GET", "/compare", None),
+    ("api_cached", "GET", "/api/recommendations?age_value=10&age_unit=weeks&include_iap=on", None),
+]
+
+def bench_routes(nip_path, iap_path, requests=200, batch_requests=20, batch_ages=100, seed=0):
+    """Requests per second for each route through the Flask test client.
+
+    The app is pointed at the scaled schedules. api_uncached varies the age
+    on every request so each one misses the response cache. The batch route
+    answers batch_ages ages per request and is timed batch_requests times.
+    """
+    import app as webapp
+    from schedule_reloader import ScheduleReloader
+
+    webapp.schedules = ScheduleReloader(nip_path, iap_path, interval=0)
+    webapp.schedules.add_listener(webapp.invalidate_caches)
+    webapp.invalidate_caches(webapp.schedules.generation)
+    client = webapp.app.test_client()
+
+    rng = random.Random(seed)
+    routes = list(ROUTES)
+    routes.append(("api_uncached", "GET", None, None))
+    routes.append(("api_batch", "POST", "/api/recommendations/batch?include_iap=on", None))
+    batch_body = {"ages": [rng.uniform(0, 20 * 365) for _ in range(batch_ages)]}
+
+    results = {}
+    for name, method, path, form in routes:
+        timings = []
+        status = None
+        for i in range(batch_requests if name == "api_batch" else requests):
+            if name == "api_uncached":
+                path = f"/api/recommendations?age_value={i + 0.5}&age_unit=days&include_iap=on"
+            if name == "api_batch":
+                seconds, response = _timed(client.post, path, json=batch_body)
+            elif method == "POST":
+                seconds, response = _timed(client.post, path, data=form)
+            else:
+                seconds, response = _timed(client.get, path)
+            timings.append(seconds)
+            status = response.status_code
+        total = sum(timings)
+        results[name] = {
+            **_summary(timings),
+            "status": status,
+            "requests_per_second": len(timings) / total if total else None
+        }
+    return results
+
+# Left edge of each column in the sample PDF, in points
+SAMPLE_COLUMNS = (30, 160, 265, 370, 440)
+
+def make_sample_pdf(path, pages=3, rows=40):
+    """Write a NIP-style table PDF with a text layer, for the pipeline benchmark"""
+    import fitz
+
+    with open(NIP_FILE) as f:
+        schedule = json.load(f)["schedule"]
+
+    doc = fitz.open()
+    for pg_num in range(pages):
+        page = doc.new_page()
+        header = ["Vaccine", "When to give", "Max age", "Dose", "Route"]
+        for x, text in zip(SAMPLE_COLUMNS, header):
+            page.insert_text((x, 50), text, fontsize=9)
+        for i in range(rows):
+            vaccine = schedule[(pg_num * rows + i) % len(schedule)]
+            cells = [vaccine["vaccine"][:22], vaccine["due_age"][:18],
+                     vaccine.get("max_age", "")[:18], vaccine["dose"][:10], vaccine["route"][:14]]
+            for x, text in zip(SAMPLE_COLUMNS, cells):
+                page.insert_text((x, 70 + i * 18), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+    return path
+
+def bench_pipeline(pdf_path, output_dir, ocr=True):
+    """Per-stage timings for every page of pdf_path, plus totals.
+
+    Stages: text_layer, render, enhance, ocr, parse and save. OCR is
+    reported as skipped when no backend can start (e.g. no tesseract).
+    """
+    import fitz
+    import main as pipeline
+    from writers import append_dataset, remove_dataset
+
+    ocr_error = None
+    if ocr:
+        try:
+            # Starting a backend is not enough; pytesseract only fails on first use
+            pipeline.tesseract_version()
+        except Exception as e:
+            ocr_error = str(e)
+    else:
+        ocr_error = "disabled"
+
+    output = os.path.join(output_dir, "bench_schedule.csv")
+    remove_dataset(output, 'csv')
+
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for pg_num in range(doc.page_count):
+            stages = {}
+            stages["text_layer"], lines = _timed(pipeline.extract_text_layer, doc.load_page(pg_num))
+            stages["render"], image = _timed(pipeline.render_page_image, doc, pg_num, grayscale=True)
+            stages["enhance"], _ = _timed(pipeline.enhance_image, image)
+            if ocr_error is None:
+                stages["ocr"], ocr_lines = _timed(pipeline.extract_text_from_image, image)
+                lines = ocr_lines or lines
+            stages["parse"], data = _timed(pipeline.parse_nip_table, lines)
+            stages["save"], _ = _timed(append_dataset, data, output, 'csv',
+                                       {'source_page': pg_num + 1})
+            pages.append({
+                "page": pg_num + 1,
+                "size": list(image.size),
+                "lines": len(lines),
+                "rows": len(data),
+                "seconds": stages
+            })
+
+    totals = {}
+    for page in pages:
+        for stage, seconds in page["seconds"].items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+    return {
+        "pdf_pages": len(pages),
+        "ocr": "skipped: " + ocr_error if ocr_error else "ran",
+        "total_seconds": totals,
+        "pages": pages
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run(scale=100, calls=2000, batch_size=100000, requests=200, batch_requests=20,
+        batch_ages=100, pages=3, skip_routes=False, skip_pipeline=False, ocr=True, seed=0):
+    """Run every benchmark and return the results as one dict"""
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "settings": {"scale": scale, "calls": calls, "batch_size": batch_size,
+                     "requests": requests, "batch_requests": batch_requests,
+                     "batch_ages": batch_ages, "pages": pages, "seed": seed}
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        nip_path, iap_path = generate_schedules(workdir, scale, seed)
+        results["recommender"] = bench_recommender(nip_path, iap_path, calls, batch_size, seed)
+        if not skip_routes:
+            results["routes"] = bench_routes(nip_path, iap_path, requests, batch_requests,
+                                             batch_ages, seed)
+        if not skip_pipeline:
+            pdf_path = make_sample_pdf(os.path.join(workdir, "sample.pdf"), pages)
+            results["pipeline"] = bench_pipeline(pdf_path, workdir, ocr)
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommender, routes and pipeline.")
+    parser.add_argument("--scale", type=int, default=100,
+                        help="Copies of each schedule entry (default: 100)")
+    parser.add_argument("--calls", type=int, default=2000,
+                        help="Single lookups to time per schedule (default: 2000)")
+    parser.add_argument("--batch-size", type=int, default=100000,
+                        help="Ages in the recommend_many batch (default: 100000)")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="Requests per route (default: 200)")
+    parser.add_argument("--batch-requests", type=int, default=20,
+                        help="Requests to the batch API (default: 20)")
+    parser.add_argument("--batch-ages", type=int, default=100,
+                        help="Ages per batch API request (default: 100)")
+    parser.add_argument("--pages", type=int, default=3,
+                        help="Pages in the generated sample PDF (default: 3)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-routes", action="store_true")
+    parser.add_argument("--skip-pipeline", action="store_true")
+    parser.add_argument("--no-ocr", action="store_true",
+                        help="Leave OCR out of the pipeline timings")
+    parser.add_argument("-o", "--output", help="Write the JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # app.py resolves data/ and templates/ relative to the working directory
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    results = run(scale=args.scale, calls=args.calls, batch_size=args.batch_size,
+                  requests=args.requests, batch_requests=args.batch_requests,
+                  batch_ages=args.batch_ages, pages=args.pages, skip_routes=args.skip_routes,
+                  skip_pipeline=args.skip_pipeline, ocr=not args.no_ocr, seed=args.seed)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Benchmark results written to {args.output}")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
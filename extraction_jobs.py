@@ -0,0 +1,404 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process dispatcher lock, every process dispatches
+    fcntl = None
+
+# Jobs go queued -> running -> done or failed
+FINISHED_STATES = ('done', 'failed')
+
+# Seconds between sweeps for finished jobs past their retention
+SWEEP_INTERVAL = 3600
+
+# process_page options a job may set
+JOB_OPTIONS = ('force_ocr', 'ocr_words', 'adaptive_dpi', 'table_cells', 'ocr_regions')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL,
+    pages_total INTEGER NOT NULL,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS pages (
+    job_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    parser TEXT NOT NULL,
+    status TEXT NOT NULL,
+    method TEXT,
+    rows INTEGER,
+    seconds REAL,
+    error TEXT,
+    data TEXT,
+    PRIMARY KEY (job_id, page, parser)
+);
+"""
+
+class ExtractionQueue:
+    """PDF extraction jobs run on a local process pool, with state in SQLite.
+
+    submit() stores the upload and its pages and returns at once; a
+    dispatcher thread claims queued jobs and runs their pages through
+    main.process_page on a pool of worker processes, recording each page
+    as it finishes. It keeps claiming jobs while the pool has idle
+    workers, so several small uploads run side by side, and closes each
+    job when its own last page is in. Any process can read a job's
+    progress, since it lives in the database, not in the process that
+    runs it. Finished jobs, results included, are deleted retention
+    seconds after they end (never when retention is None).
+
+    The dispatcher and its pool start on first use in each process, so a
+    preloading server never forks them. Where fcntl is available, only one
+    process per jobs directory dispatches at a time; the others take over
+    if it exits. A running job not updated for stale_after seconds (its
+    dispatcher died) is picked up again.
+    """
+
+    def __init__(self, directory, workers=None, ocr_backend='auto', poll_interval=1.0,
+                 stale_after=600, retention=7 * 24 * 3600):
+        self.directory = directory
+        self.db_path = os.path.join(directory, 'jobs.sqlite3')
+        self.cache_dir = os.path.join(directory, '.ocr_cache')
+        # Leave a core for the web workers by default
+        self.workers = max(1, workers or (os.cpu_count() or 2) - 1)
+        self.ocr_backend = ocr_backend
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.retention = retention
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._pool = None
+        self._ready = False
+        self._last_sweep = 0.0
+
+    @contextmanager
+    def _db(self):
+        """A short-lived connection; commits on success, one per call so
+        request threads and the dispatcher never share one. The directory
+        and tables are created on first use."""
+        if not self._ready:
+            os.makedirs(self.directory, exist_ok=True)
+            with sqlite3.connect(self.db_path, timeout=30) as db:
+                # Readers (status polls) then never wait for the dispatcher's writes
+                db.execute('PRAGMA journal_mode=WAL')
+                db.executescript(SCHEMA)
+            db.close()
+            self._ready = True
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _pdf_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.pdf")
+
+    def submit(self, pdf_bytes, page_jobs, filename=None, **options):
+        """Queue a PDF for extraction and return the new job's id.
+
+        page_jobs are (page_number, parser_name) pairs, 0-based as from
+        main.parse_page_spec; options are process_page flags (JOB_OPTIONS).
+        """
+        unknown = set(options) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+        page_jobs = list(dict.fromkeys(page_jobs))
+        if not page_jobs:
+            raise ValueError("No pages to extract")
+
+        job_id = uuid.uuid4().hex
+        path = self._pdf_path(job_id)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(path + '.tmp', path)
+
+        now = time.time()
+        with self._db() as db:
+            db.execute('INSERT INTO jobs (id, filename, status, options, pages_total, created, updated) '
+                       'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       (job_id, filename, 'queued', json.dumps(options), len(page_jobs), now, now))
+            db.executemany('INSERT INTO pages (job_id, page, parser, status) VALUES (?, ?, ?, ?)',
+                           [(job_id, page, parser, 'pending') for page, parser in page_jobs])
+        self.ensure_started()
+        self._wake.set()
+        return job_id
+
+    def status(self, job_id):
+        """The job's state and per-page progress as a dict, or None"""
+        with self._db() as db:
+            job = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if job is None:
+                return None
+            pages = db.execute('SELECT page, parser, status, method, rows, seconds, error '
+                               'FROM pages WHERE job_id = ? ORDER BY page, parser',
+                               (job_id,)).fetchall()
+            position = None
+            if job['status'] == 'queued':
+                position = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < ?",
+                                      (job['created'],)).fetchone()[0]
+        return {
+            'job_id': job['id'],
+            'filename': job['filename'],
+            'status': job['status'],
+            'queue_position': position,
+            'options': json.loads(job['options']),
+            'pages_total': job['pages_total'],
+            'pages_done': job['pages_done'],
+            'error': job['error'],
+            'created': job['created'],
+            'started': job['started'],
+            'finished': job['finished'],
+            'pages': [
+                {
+                    'page': page['page'] + 1,
+                    'parser': page['parser'],
+                    'status': page['status'],
+                    'method': page['method'],
+                    'rows': page['rows'],
+                    'seconds': page['seconds'],
+                    'error': page['error']
+                }
+                for page in pages
+            ]
+        }
+
+    def counts(self):
+        """Number of jobs in each state"""
+        with self._db() as db:
+            rows = db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+    def results(self, job_id):
+        """Rows extracted so far, by parser, each tagged with its 1-based Page"""
+        results = {}
+        with self._db() as db:
+            pages = db.execute("SELECT page, parser, data FROM pages WHERE job_id = ? AND status = 'done' "
+                               "ORDER BY page, parser", (job_id,)).fetchall()
+        for page in pages:
+            rows = results.setdefault(page['parser'], [])
+            for row in json.loads(page['data']):
+                row['Page'] = page['page'] + 1
+                rows.append(row)
+        return results
+
+    def ensure_started(self):
+        """Start the dispatcher thread in this process if it isn't running"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._pool = None
+            self._thread = threading.Thread(target=self._run, name="extraction-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            from main import _init_ocr_worker
+            # spawn, not fork: the web process has threads (and maybe a
+            # half-held lock) that a forked child would inherit
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_ocr_worker,
+                                             initargs=(self.ocr_backend,))
+        return self._pool
+
+    def _acquire_dispatcher_lock(self):
+        """Something to hold while this process dispatches (the locked
+        file, kept open), or None when another process already does"""
+        if fcntl is None:
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, 'dispatcher.lock'), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _run(self):
+        lock = None
+        running = {}    # future -> (job id, page, parser)
+        remaining = {}  # job id -> pages not yet recorded
+        last_touch = time.monotonic()
+        while not self._stop.is_set():
+            if lock is None:
+                lock = self._acquire_dispatcher_lock()
+            if lock is not None:
+                # Claim more jobs while some workers would otherwise sit idle
+                while len(running) < self.workers:
+                    job = self._claim()
+                    if job is None:
+                        break
+                    try:
+                        self._submit_job(job['id'], json.loads(job['options']), running, remaining)
+                    except Exception as e:
+                        print(f"Extraction job {job['id']} failed: {str(e)}")
+                        self._finish(job['id'], str(e))
+                self._sweep()
+            if not running:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                job_id, page, parser = running.pop(future)
+                self._record_page(job_id, self._page_result(future, page, parser))
+                remaining[job_id] -= 1
+                if not remaining[job_id]:
+                    del remaining[job_id]
+                    self._finish(job_id)
+            # Pages queued behind other jobs record nothing for a while;
+            # keep their jobs from looking abandoned (see stale_after)
+            if remaining and time.monotonic() - last_touch > self.stale_after / 4:
+                last_touch = time.monotonic()
+                self._touch(list(remaining))
+
+    def _claim(self):
+        """Mark the oldest runnable job as running and return it"""
+        now = time.time()
+        try:
+            with self._db() as db:
+                db.execute('BEGIN IMMEDIATE')
+                job = db.execute("SELECT id, options FROM jobs WHERE status = 'queued' "
+                                 "OR (status = 'running' AND updated < ?) ORDER BY created LIMIT 1",
+                                 (now - self.stale_after,)).fetchone()
+                if job is not None:
+                    db.execute("UPDATE jobs SET status = 'running', started = ?, updated = ? WHERE id = ?",
+                               (now, now, job['id']))
+                return job
+        except sqlite3.Error as e:
+            print(f"Extraction queue error: {str(e)}")
+            return None
+
+    def _submit_job(self, job_id, options, running, remaining):
+        """Queue a claimed job's pending pages on the pool"""
+        from concurrent.futures.process import BrokenProcessPool
+        from main import process_page
+
+        with self._db() as db:
+            pages = db.execute("SELECT page, parser FROM pages WHERE job_id = ? AND status = 'pending'",
+                               (job_id,)).fetchall()
+        if not pages:
+            # Reclaimed after its last page was recorded
+            self._finish(job_id)
+            return
+        pdf_path = self._pdf_path(job_id)
+        pool = self._get_pool()
+        futures = {}
+        try:
+            for page in pages:
+                future = pool.submit(process_page, pdf_path, page['page'], parser_name=page['parser'],
+                                     cache_dir=self.cache_dir, ocr_backend=self.ocr_backend, **options)
+                futures[future] = (job_id, page['page'], page['parser'])
+        except Exception as e:
+            for future in futures:
+                future.cancel()
+            if isinstance(e, BrokenProcessPool):
+                self._pool = None
+            raise
+        running.update(futures)
+        remaining[job_id] = len(futures)
+
+    def _page_result(self, future, page, parser):
+        """A finished page's process_page result, or a failed one if its
+        worker could not run it"""
+        from concurrent.futures.process import BrokenProcessPool
+        from main import record_page_metrics
+
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            self._pool = None
+            error = f"Worker process failed: {str(e)}"
+        except Exception as e:
+            error = str(e)
+        else:
+            record_page_metrics(result)
+            return result
+        return {'page': page, 'parser': parser, 'method': None, 'data': [],
+                'seconds': None, 'error': error}
+
+    def _record_page(self, job_id, result):
+        now = time.time()
+        with self._db() as db:
+            db.execute('UPDATE pages SET status = ?, method = ?, rows = ?, seconds = ?, error = ?, data = ? '
+                       'WHERE job_id = ? AND page = ? AND parser = ?',
+                       ('failed' if result['error'] else 'done', result['method'],
+                        len(result['data']), result['seconds'], result['error'],
+                        json.dumps(result['data']), job_id, result['page'], result['parser']))
+            db.execute('UPDATE jobs SET pages_done = pages_done + 1, updated = ? WHERE id = ?',
+                       (now, job_id))
+
+    def _touch(self, job_ids):
+        now = time.time()
+        with self._db() as db:
+            db.executemany('UPDATE jobs SET updated = ? WHERE id = ?', [(now, job_id) for job_id in job_ids])
+
+    def _sweep(self):
+        """Delete jobs that finished more than retention seconds ago"""
+        now = time.time()
+        if self.retention is None or now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        cutoff = now - self.retention
+        try:
+            with self._db() as db:
+                db.execute("DELETE FROM pages WHERE job_id IN (SELECT id FROM jobs "
+                           "WHERE status IN ('done', 'failed') AND finished < ?)", (cutoff,))
+                db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?",
+                           (cutoff,))
+        except sqlite3.Error as e:
+            print(f"Extraction queue error: {str(e)}")
+
+    def _finish(self, job_id, error=None):
+        """Close the job; it failed if every page did (or error is given)"""
+        now = time.time()
+        with self._db() as db:
+            if error is None:
+                done = db.execute("SELECT COUNT(*) FROM pages WHERE job_id = ? AND status = 'done'",
+                                  (job_id,)).fetchone()[0]
+                if not done:
+                    error = "No page could be extracted"
+            db.execute('UPDATE jobs SET status = ?, error = ?, finished = ?, updated = ? WHERE id = ?',
+                       ('failed' if error else 'done', error, now, now, job_id))
+        try:
+            os.remove(self._pdf_path(job_id))
+        except OSError:
+            pass
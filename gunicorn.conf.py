@@ -0,0 +1,50 @@
+"""gunicorn settings for serving the app in production.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+The async JSON API (asgi.py) uses the same settings with uvicorn's worker:
+
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+
+Environment overrides:
+    WEB_BIND      address to listen on (default 0.0.0.0:8000)
+    WEB_WORKERS   worker processes (default: one per CPU core)
+    WEB_THREADS   threads per gthread worker (default 4)
+    WEB_TIMEOUT   seconds before a stuck worker is restarted (default 30)
+
+The app itself reads:
+    EXTRACTION_JOBS_DIR  job database and pending uploads (default jobs)
+    EXTRACTION_WORKERS   OCR processes for uploaded PDFs (default: cores - 1)
+    EXTRACTION_RETENTION_HOURS  how long finished jobs and their results are
+                         kept (default 168; 0 keeps them)
+    MAX_UPLOAD_MB        largest accepted request body, e.g. a PDF (default 50)
+    JOB_EVENTS_MAX_SECONDS  how long a job event stream may hold a gthread
+                         request thread before the client reconnects (default 30);
+                         the uvicorn worker serves those streams without a thread
+
+Lookups are CPU-bound and hold the GIL, so throughput should scale with
+worker processes; threads mostly cover clients waiting on slow networks.
+That scaling has only been reasoned about, not measured: the setup was
+tested on a single-core machine, so run a load test at WEB_WORKERS=1..N
+on the target hardware before sizing a deployment by it. Each
+worker polls data/*.json on its own and rebuilds its recommender after a
+change (that copy is then private to the worker). /metrics reports the
+worker that answered the scrape. PDF extraction jobs run in a separate
+process pool that one worker at a time owns, so OCR never ties up the
+request threads.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', '4'))
+worker_class = 'gthread'
+timeout = int(os.environ.get('WEB_TIMEOUT', '30'))
+keepalive = 5
+
+# Import the app (and compile the schedules) once in the master, then fork
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
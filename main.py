@@ -1,421 +1,1093 @@
-import os
-import sys
-import re
-import fitz  # PyMuPDF
-from PIL import Image, ImageFilter
-import pytesseract
-import pandas as pd
-
-def check_dependencies():
-    """Verify all required packages are installed"""
-    required = {
-        'fitz': 'pymupdf',
-        'pytesseract': 'pytesseract',
-        'PIL': 'pillow',
-        'pandas': 'pandas'
-    }
-    
-    missing = []
-    for module, package in required.items():
-        try:
-            __import__(module)
-        except ImportError:
-            missing.append(package)
-    
-    if missing:
-        print("Missing dependencies. Please install with:")
-        print(f"pip install {' '.join(missing)}")
-        sys.exit(1)
-
-    try:
-        pytesseract.get_tesseract_version()
-    except pytesseract.TesseractNotFoundError:
-        print("\nTesseract OCR not found. Please install from:")
-        print("https://github.com/UB-Mannheim/tesseract/wiki")
-        print("Check 'Add to PATH' during installation")
-        sys.exit(1)
-
-def pdf_to_images(pdf_path, output_dir, page_numbers):
-    """Convert PDF pages to high-quality PNG images"""
-    try:
-        # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
-        
-        doc = fitz.open(pdf_path)
-        images = []
-        for pg_num in page_numbers:
-            page = doc.load_page(pg_num)
-            zoom = 2.0  # Double resolution for better OCR
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat, dpi=300)
-            img_path = os.path.join(output_dir, f"page_{pg_num+1}.png")
-            pix.save(img_path)
-            images.append(img_path)
-            print(f"Saved page {pg_num+1} as {img_path}")
-        return images
-    except Exception as e:
-        print(f"PDF conversion error: {str(e)}")
-        return []
-
-def enhance_image(image_path):
-    """Improve image quality for OCR"""
-    try:
-        img = Image.open(image_path)
-        img = img.convert('L')  # Grayscale
-        # Increase contrast
-        img = img.point(lambda x: 0 if x < 140 else 255)
-        # Reduce noise
-        img = img.filter(ImageFilter.MedianFilter(size=3))
-        # Sharpen
-        img = img.filter(ImageFilter.SHARPEN)
-        return img
-    except Exception as e:
-        print(f"Image processing error: {str(e)}")
-        return None
-
-def extract_text_from_image(image_path):
-    """Perform OCR on enhanced image"""
-    try:
-        img = enhance_image(image_path)
-        if not img:
-            return []
-        
-        # Optimize OCR for tables
-        config = r'--oem 3 --psm 6 -c preserve_interword_spaces=1'
-        text = pytesseract.image_to_string(img, config=config)
-        return [line.strip() for line in text.split('\n') if line.strip()]
-    except Exception as e:
-        print(f"OCR error: {str(e)}")
-        return []
-
-def parse_nip_table(lines):
-    """Extract NIP vaccination schedule"""
-    schedule = []
-    current_vaccine = ""
-    
-    for line in lines:
-        # Skip headers and separators
-        if "Vaccine" in line or re.match(r'^[\|+=_-]+$', line):
-            continue
-            
-        # Split into columns
-        cols = re.split(r'\s{2,}', line.strip())
-        
-        if len(cols) >= 4:
-            current_vaccine = cols[0]
-            entry = {
-                'Vaccine': current_vaccine,
-                'When to give': cols[1],
-                'Dose': cols[2],
-                'Route': cols[3],
-                'Site': cols[4] if len(cols) > 4 else ''
-            }
-            schedule.append(entry)
-        elif cols and current_vaccine:
-            # Handle wrapped vaccine names
-            schedule[-1]['Vaccine'] += " " + cols[0]
-    
-    return schedule
-
-def parse_iap_matrix(lines):
-    """Extract IAP vaccination matrix"""
-    schedule = []
-    age_headers = []
-    in_table = False
-    
-    for line in lines:
-        if not in_table and "Vaccine" in line and any(x in line.lower() for x in ['birth', '6w', '10w']):
-            in_table = True
-            age_headers = re.findall(r'\b(?:birth|\d+[wmdy])\b', line.lower())
-            continue
-            
-        if in_table:
-            if re.match(r'^[\|+=_-]+$', line):
-                continue
-                
-            # Get vaccine name (text before first dose code)
-            vaccine = re.split(r'[A-Z]{2,}\d*', line)[0].strip()
-            if not vaccine:
-                continue
-                
-            # Find all dose codes
-            doses = re.finditer(r'([A-Z]{2,}\d*)', line)
-            for i, dose in enumerate(doses):
-                if i < len(age_headers):
-                    schedule.append({
-                        'Vaccine': vaccine,
-                        'Age': age_headers[i],
-                        'Dose': dose.group()
-                    })
-    
-    return schedule
-
-def save_as_csv(data, filename, output_dir):
-    """Save extracted data to CSV"""
-    if not data:
-        print(f"No data to save for {filename}")
-        return False
-    
-    try:
-        df = pd.DataFrame(data)
-        # Clean data
-        df = df.applymap(lambda x: re.sub(r'[^\w\s\-/()]', '', str(x)).strip())
-        
-        os.makedirs(output_dir, exist_ok=True)
-        filepath = os.path.join(output_dir, filename)
-        df.to_csv(filepath, index=False, encoding='utf-8')
-        print(f"Saved {filename} with {len(df)} entries")
-        print("Sample data:")
-        print(df.head())
-        return True
-    except Exception as e:
-        print(f"Error saving {filename}: {str(e)}")
-        return False
-
-def main():
-    # Configuration
-    pdf_file = r"C:\Users\mackrish_malik\Desktop\Amandeep Code\Immunization.pdf"
-    output_folder = r"C:\Users\mackrish_malik\Desktop\Amandeep Code\output"
-    pages_to_extract = [3, 4]  # Pages 4 and 5 (0-based)
-    
-    # Verify environment
-    check_dependencies()
-    
-    # Step 1: Convert PDF to images
-    print("\nConverting PDF pages to images...")
-    images = pdf_to_images(pdf_file, output_folder, pages_to_extract)
-    if not images:
-        print("Failed to create images from PDF")
-        return
-    
-    # Step 2: Process NIP schedule
-    print("\nExtracting NIP schedule...")
-    nip_text = extract_text_from_image(images[0])
-    nip_data = parse_nip_table(nip_text)
-    save_as_csv(nip_data, 'nip_schedule.csv', output_folder)
-    
-    # Step 3: Process IAP schedule
-    print("\nExtracting IAP schedule...")
-    iap_text = extract_text_from_image(images[1])
-    iap_data = parse_iap_matrix(iap_text)
-    save_as_csv(iap_data, 'iap_schedule.csv', output_folder)
-    
-    print("\nProcess completed successfully!")
-
-if __name__ == "__main__":
-    main()
-
-# import os
-# import re
-# import pandas as pd
-# import pytesseract
-# from PIL import Image, ImageEnhance, ImageFilter
-
-# class ImmunizationExtractor:
-#     def __init__(self):
-#         self.vaccine_patterns = [
-#             ('BCG', r'BCG'),
-#             ('Hepatitis B', r'Hep[ab]t?i?t?i?s? B'),
-#             ('OPV', r'OPV'),
-#             ('Pentavalent', r'Penta(?:valent)?'),
-#             ('IPV', r'IPV'),
-#             ('Rotavirus', r'Rotavirus'),
-#             ('Pneumococcal', r'Pneumo(?:cocca)?l|PCV'),
-#             ('Measles', r'Measles'),
-#             ('Rubella', r'Rubella'),
-#             ('Japanese Encephalitis', r'Japanese Encephalitis|JE'),
-#             ('Vitamin A', r'Vitamin A'),
-#             ('DPT', r'DPT'),
-#             ('Td', r'Td')
-#         ]
-
-#     def clean_text(self, text):
-#         """Clean and normalize extracted text"""
-#         if not isinstance(text, str):
-#             text = str(text)
-#         text = re.sub(r'[^\w\s\-/()]', '', text)
-#         return text.strip()
-
-#     def enhance_image(self, image_path):
-#         """Enhanced image preprocessing"""
-#         try:
-#             img = Image.open(image_path)
-#             img = img.convert('L')
-#             enhancer = ImageEnhance.Contrast(img)
-#             img = enhancer.enhance(3.0)
-#             img = img.filter(ImageFilter.MedianFilter(size=3))
-#             img = img.point(lambda x: 0 if x < 180 else 255)
-#             return img
-#         except Exception as e:
-#             print(f"Image processing error: {str(e)}")
-#             return None
-
-#     def extract_text(self, image_path):
-#         """Robust text extraction with error handling"""
-#         try:
-#             img = self.enhance_image(image_path)
-#             if img is None:
-#                 return ""
-#             custom_config = r'--oem 3 --psm 6 -c preserve_interword_spaces=1'
-#             text = pytesseract.image_to_string(img, config=custom_config)
-#             return text
-#         except Exception as e:
-#             print(f"OCR error: {str(e)}")
-#             return ""
-
-#     def parse_nip_schedule(self, text):
-#         """Improved NIP table parser with robust column detection"""
-#         schedule = []
-#         current_entry = None
-        
-#         for line in text.split('\n'):
-#             line = line.strip()
-#             if not line:
-#                 continue
-                
-#             # Skip headers and separators
-#             if "Vaccine" in line or re.match(r'^[\|+=_-]+$', line):
-#                 continue
-                
-#             # Find vaccine names
-#             vaccine = None
-#             for v_name, pattern in self.vaccine_patterns:
-#                 match = re.search(pattern, line, re.IGNORECASE)
-#                 if match:
-#                     vaccine = v_name
-#                     remaining = line[match.end():].strip()
-#                     break
-            
-#             if vaccine:
-#                 # Save previous entry if exists
-#                 if current_entry:
-#                     schedule.append(current_entry)
-                
-#                 # Split remaining text into columns
-#                 parts = re.split(r'\s{2,}', remaining, maxsplit=3)
-#                 current_entry = {
-#                     'Vaccine': vaccine,
-#                     'When to give': self.clean_text(parts[0]) if len(parts) > 0 else '',
-#                     'Dose': self.clean_text(parts[1]) if len(parts) > 1 else '',
-#                     'Route': self.clean_text(parts[2]) if len(parts) > 2 else '',
-#                     'Site': self.clean_text(parts[3]) if len(parts) > 3 else ''
-#                 }
-#             elif current_entry:
-#                 # Handle continuation lines
-#                 if not current_entry['When to give']:
-#                     current_entry['Vaccine'] += " " + self.clean_text(line)
-#                 elif not current_entry['Dose']:
-#                     current_entry['When to give'] += " " + self.clean_text(line)
-#                 elif not current_entry['Route']:
-#                     current_entry['Dose'] += " " + self.clean_text(line)
-#                 elif not current_entry['Site']:
-#                     current_entry['Route'] += " " + self.clean_text(line)
-#                 else:
-#                     current_entry['Site'] += " " + self.clean_text(line)
-        
-#         # Add the last entry if it exists
-#         if current_entry:
-#             schedule.append(current_entry)
-            
-#         return schedule
-
-#     def parse_iap_schedule(self, text):
-#         """Fixed IAP matrix parser with proper parentheses"""
-#         schedule = []
-#         age_headers = []
-#         in_table = False
-        
-#         for line in text.split('\n'):
-#             line = line.strip()
-#             if not line:
-#                 continue
-                
-#             # Find age headers
-#             if not in_table and any(age in line.lower() for age in ['birth', '6w', '10w']):
-#                 age_headers = re.findall(r'\b(?:birth|\d+[wmdy])\b', line.lower())
-#                 in_table = True
-#                 continue
-                
-#             if in_table:
-#                 # Skip separators
-#                 if re.match(r'^[\-=\+]+$', line):
-#                     continue
-                    
-#                 # Find vaccine names
-#                 vaccine = None
-#                 for v_name, pattern in self.vaccine_patterns:
-#                     match = re.search(pattern, line, re.IGNORECASE)
-#                     if match:
-#                         vaccine = v_name
-#                         line = line[match.end():].strip()
-#                         break
-                        
-#                 if vaccine and age_headers:
-#                     # Find all dose codes with proper column calculation
-#                     for dose in re.finditer(r'([A-Z]{2,}\d*)', line):
-#                         pos = dose.start()
-#                         col = min(int(pos / (len(line)/len(age_headers))), len(age_headers)-1)
-#                         schedule.append({
-#                             'Vaccine': vaccine,
-#                             'Age': age_headers[col],
-#                             'Dose': dose.group()
-#                         })
-        
-#         return schedule
-
-#     def save_to_csv(self, data, filename, output_dir):
-#         """Save data with validation"""
-#         if not data:
-#             print(f"No data to save for {filename}")
-#             return False
-            
-#         try:
-#             df = pd.DataFrame(data)
-#             # Clean all columns
-#             for col in df.columns:
-#                 df[col] = df[col].apply(self.clean_text)
-            
-#             os.makedirs(output_dir, exist_ok=True)
-#             filepath = os.path.join(output_dir, filename)
-#             df.to_csv(filepath, index=False)
-#             print(f"Saved {filename} with {len(df)} entries")
-#             print("First 3 entries:")
-#             print(df.head(3).to_string(index=False))
-#             return True
-#         except Exception as e:
-#             print(f"Error saving {filename}: {str(e)}")
-#             return False
-
-#     def process_schedules(self, nip_image_path, iap_image_path, output_dir):
-#         """Main processing method with error handling"""
-#         print("\nProcessing NIP schedule...")
-#         nip_text = self.extract_text(nip_image_path)
-#         print("\nExtracted NIP Text Sample:")
-#         print(nip_text[:500] + "..." if len(nip_text) > 500 else nip_text)
-        
-#         nip_data = self.parse_nip_schedule(nip_text)
-#         self.save_to_csv(nip_data, 'nip_schedule.csv', output_dir)
-        
-#         print("\nProcessing IAP schedule...")
-#         iap_text = self.extract_text(iap_image_path)
-#         print("\nExtracted IAP Text Sample:")
-#         print(iap_text[:500] + "..." if len(iap_text) > 500 else iap_text)
-        
-#         iap_data = self.parse_iap_schedule(iap_text)
-#         self.save_to_csv(iap_data, 'iap_schedule.csv', output_dir)
-        
-#         print("\nProcessing completed!")
-
-# if __name__ == "__main__":
-#     output_dir = r"C:\Users\mackrish_malik\Desktop\Amandeep Code\output"
-#     nip_image_path = os.path.join(output_dir, "page_4.png")
-#     iap_image_path = os.path.join(output_dir, "page_5.png")
-    
-#     if not os.path.exists(nip_image_path):
-#         print(f"Error: NIP image not found at {nip_image_path}")
-#     if not os.path.exists(iap_image_path):
-#         print(f"Error: IAP image not found at {iap_image_path}")
-    
-#     extractor = ImmunizationExtractor()
-#     extractor.process_schedules(nip_image_path, iap_image_path, output_dir)
-
+import os
+import sys
+import argparse
+import glob
+import importlib.util
+import json
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+# PyMuPDF, Pillow, NumPy, pandas and the OCR modules are imported inside the
+# stages that use them, so importing this module (or just the parsers)
+# stays cheap and text-layer runs never load the OCR stack
+from ocr_backend import get_backend, tesserocr_usable
+from ocr_cache import OCRCache
+from parsers import GRID_PARSERS, PAGE_PARSERS, parse_iap_matrix, parse_nip_table
+from metrics import registry
+from writers import (FORMATS, append_dataset, clean_dataframe, dataset_path,
+                     dataset_size, remove_dataset, truncate_dataset)
+
+@lru_cache(maxsize=None)
+def get_preprocessor():
+    """Vectorized grayscale/threshold/median/sharpen; one per process so its
+    scratch buffers are reused from page to page"""
+    from preprocessing import Preprocessor
+    return Preprocessor(threshold=140, median_size=3)
+
+def _open_image(image):
+    """A PIL image from a path, or the image itself"""
+    if isinstance(image, (str, os.PathLike)):
+        from PIL import Image
+        return Image.open(image)
+    return image
+
+# Per-page metrics, recorded in the parent from each result's stage timings;
+# collection is switched on by --metrics
+PAGE_STAGES = ('text_layer', 'render', 'enhance', 'ocr', 'parse', 'save')
+stage_latency = registry.histogram('page_stage_seconds', 'Time per page in each pipeline stage',
+                                   ('stage',))
+page_latency = registry.histogram('page_seconds', 'Total time per page by extraction method',
+                                  ('method',))
+ocr_cache_lookups = registry.counter('ocr_cache_lookups_total', 'OCR cache lookups', ('result',))
+
+@lru_cache(maxsize=None)
+def check_dependencies(ocr_backend='auto'):
+    """Verify all required packages are installed.
+
+    Packages are only located, not imported, and Tesseract is looked up on
+    PATH instead of being run. tesserocr is the exception: it only counts
+    when its engine starts, since it can be installed without language
+    data it finds. The result is cached for the process.
+    """
+    required = {
+        'fitz': 'pymupdf',
+        'pytesseract': 'pytesseract',
+        'PIL': 'pillow',
+        'pandas': 'pandas'
+    }
+    
+    missing = [package for module, package in required.items()
+               if importlib.util.find_spec(module) is None]
+    
+    if missing:
+        print("Missing dependencies. Please install with:")
+        print(f"pip install {' '.join(missing)}")
+        sys.exit(1)
+
+    has_cli = shutil.which('tesseract') is not None
+    has_tesserocr = ocr_backend != 'pytesseract' and tesserocr_usable(OCR_OPTIONS['lang'])
+    if ocr_backend == 'pytesseract':
+        usable = has_cli
+    elif ocr_backend == 'tesserocr':
+        usable = has_tesserocr
+    else:
+        usable = has_cli or has_tesserocr
+    if ocr_backend == 'tesserocr' and not usable:
+        print("\ntesserocr could not start. Please install it (pip install tesserocr) and")
+        print("set TESSDATA_PREFIX to the folder holding Tesseract's language data")
+        sys.exit(1)
+    if not usable:
+        print("\nTesseract OCR not found. Please install from:")
+        print("https://github.com/UB-Mannheim/tesseract/wiki")
+        print("Check 'Add to PATH' during installation")
+        sys.exit(1)
+    if ocr_backend == 'auto' and not has_tesserocr:
+        print("OCR runs one tesseract process per page and region; install tesserocr and")
+        print("Tesseract's language data for the faster in-process engine")
+
+def pdf_to_images(pdf_path, output_dir, page_numbers):
+    """Convert PDF pages to high-quality PNG images"""
+    try:
+        # Create output directory if it doesn't exist
+        os.makedirs(output_dir, exist_ok=True)
+        
+        import fitz  # PyMuPDF
+        doc = fitz.open(pdf_path)
+        images = []
+        for pg_num in page_numbers:
+            images.append(render_page(doc, pg_num, output_dir))
+        return images
+    except Exception as e:
+        print(f"PDF conversion error: {str(e)}")
+        return []
+
+# Fixed render resolution, used unless adaptive DPI is on
+RENDER_DPI = 300
+# Adaptive DPI: a cheap probe render measures the text, then the page is
+# rendered at the lowest resolution that gives TARGET_X_HEIGHT pixel
+# lowercase letters, which Tesseract reads reliably
+PROBE_DPI = 72
+TARGET_X_HEIGHT = 20
+ADAPTIVE_MIN_DPI = 100
+ADAPTIVE_MAX_DPI = 400
+DPI_STEP = 25
+# Whole-page OCR below this mean word confidence is retried at a higher DPI
+MIN_OCR_CONFIDENCE = 70
+
+def _render_pixmap(doc, pg_num, grayscale=False, dpi=RENDER_DPI):
+    import fitz
+    page = doc.load_page(pg_num)
+    zoom = 2.0  # Double resolution for better OCR
+    mat = fitz.Matrix(zoom, zoom)
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    return page.get_pixmap(matrix=mat, dpi=dpi, colorspace=colorspace)
+
+def _round_dpi(dpi):
+    """Round up to a DPI_STEP multiple within the adaptive range"""
+    dpi = -(-int(dpi) // DPI_STEP) * DPI_STEP
+    return max(ADAPTIVE_MIN_DPI, min(ADAPTIVE_MAX_DPI, dpi))
+
+def choose_render_dpi(doc, pg_num):
+    """Lowest DPI putting the page's text at TARGET_X_HEIGHT pixels.
+
+    Renders a PROBE_DPI grayscale probe and measures its x-height; x-height
+    scales linearly with DPI. Falls back to RENDER_DPI when the probe has
+    no measurable text. Returns (dpi, probe_x_height).
+    """
+    import numpy as np
+    from preprocessing import estimate_x_height
+    pix = _render_pixmap(doc, pg_num, grayscale=True, dpi=PROBE_DPI)
+    probe = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    x_height = estimate_x_height(probe)
+    if not x_height:
+        return RENDER_DPI, None
+    return _round_dpi(PROBE_DPI * TARGET_X_HEIGHT / x_height), x_height
+
+def render_page(doc, pg_num, output_dir):
+    """Render one page of an open PDF to a PNG and return its path"""
+    pix = _render_pixmap(doc, pg_num)
+    img_path = os.path.join(output_dir, f"page_{pg_num+1}.png")
+    pix.save(img_path)
+    print(f"Saved page {pg_num+1} as {img_path}")
+    return img_path
+
+def render_page_image(doc, pg_num, debug_dir=None, grayscale=False, dpi=RENDER_DPI):
+    """Render one page straight to a PIL image, skipping the PNG round-trip.
+
+    The image wraps the raw pixmap samples without encoding or decoding.
+    A PNG is only written when debug_dir is given. grayscale renders a
+    single channel directly, a third of the memory of RGB and no colour
+    conversion before thresholding.
+    """
+    from PIL import Image
+    pix = _render_pixmap(doc, pg_num, grayscale, dpi)
+    if pix.n == 1:
+        mode = "L"
+    else:
+        mode = "RGBA" if pix.alpha else "RGB"
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples,
+                           "raw", mode, pix.stride, 1)
+    if debug_dir:
+        os.makedirs(debug_dir, exist_ok=True)
+        img_path = os.path.join(debug_dir, f"page_{pg_num+1}.png")
+        pix.save(img_path)
+        print(f"Saved page {pg_num+1} as {img_path}")
+    return img
+
+# A page needs at least this many words in its text layer to skip OCR
+MIN_TEXT_LAYER_WORDS = 5
+
+def extract_text_layer(page, min_words=MIN_TEXT_LAYER_WORDS):
+    """Read a page's own text layer as table-like lines, without OCR.
+
+    Words are grouped into rows by their vertical position and joined left
+    to right. Gaps wider than a normal space become two spaces, which is
+    what Tesseract's preserve_interword_spaces output gives the parsers to
+    split columns on. Returns [] when the page has no usable text.
+    """
+    words = page.get_text("words")
+    if len(words) < min_words:
+        return []
+
+    heights = sorted(y1 - y0 for _, y0, _, y1, *_ in words)
+    height = heights[len(heights) // 2] or 1.0
+
+    rows = []
+    for word in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+        center = (word[1] + word[3]) / 2
+        if rows and center - rows[-1][0] <= height / 2:
+            rows[-1][1].append(word)
+        else:
+            rows.append([center, [word]])
+
+    lines = []
+    for _, row in rows:
+        row.sort(key=lambda w: w[0])
+        line = row[0][4]
+        for previous, word in zip(row, row[1:]):
+            gap = word[0] - previous[2]
+            line += ("  " if gap > 0.8 * height else " ") + word[4]
+        lines.append(line.strip())
+    return [line for line in lines if line]
+
+def enhance_image(image):
+    """Improve image quality for OCR (accepts a path or a PIL image)"""
+    try:
+        img = _open_image(image)
+        # Grayscale, increase contrast, reduce noise and sharpen in one pass
+        return get_preprocessor().process(img)
+    except Exception as e:
+        print(f"Image processing error: {str(e)}")
+        return None
+
+# Optimize OCR for tables: one uniform block, keep column spacing
+OCR_OPTIONS = {'lang': 'eng', 'psm': 6, 'variables': {'preserve_interword_spaces': '1'}}
+
+# OCR backends by name, created once per process and reused for every page
+_ocr_backends = {}
+
+def get_ocr_backend(name='auto'):
+    """Per-process OCR backend; model loading is paid on first use only"""
+    backend = _ocr_backends.get(name)
+    if backend is None:
+        backend = get_backend(name, **OCR_OPTIONS)
+        _ocr_backends[name] = backend
+    return backend
+
+# Cell OCR thread pools by size, kept for the process: the tesserocr
+# backend holds one engine per thread, so reusing the threads means each
+# loads its language model once, not once per page
+_cell_pools = {}
+
+def get_cell_pool(workers):
+    """Per-process thread pool for cell OCR"""
+    pool = _cell_pools.get(workers)
+    if pool is None:
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cell-ocr')
+        _cell_pools[workers] = pool
+    return pool
+
+# OCR caches by (directory, size limit), kept for the process so each one's
+# running size total carries over from page to page instead of every page
+# starting with a walk of the whole cache directory
+_ocr_caches = {}
+
+def get_ocr_cache(directory, max_bytes=None):
+    """Per-process OCRCache for directory"""
+    cache = _ocr_caches.get((directory, max_bytes))
+    if cache is None:
+        cache = OCRCache(directory, max_bytes) if max_bytes else OCRCache(directory)
+        _ocr_caches[(directory, max_bytes)] = cache
+    return cache
+
+@lru_cache(maxsize=None)
+def tesseract_version(backend_name='auto'):
+    """Installed Tesseract version, probed once per process"""
+    return get_ocr_backend(backend_name).version()
+
+def extract_text_from_image(image, cache=None, backend='auto', regions=False, stats=None):
+    """Perform OCR on enhanced image (accepts a path or a PIL image).
+
+    With an OCRCache, pages already seen with the same settings are
+    answered from disk without preprocessing or OCR. With regions, only
+    the inked bands of the page are recognized, one region at a time.
+    A stats dict, when given, receives the enhance and ocr seconds, the
+    cache outcome, for whole-page OCR the mean word confidence, and under
+    'error' why OCR failed when it did.
+    """
+    try:
+        img = _open_image(image)
+        ocr = get_ocr_backend(backend)
+
+        key = None
+        if cache is not None:
+            key = cache.key(img, ocr.config(), tesseract_version(backend),
+                            get_preprocessor().signature(), f"regions={regions}")
+            entry = cache.get_entry(key)
+            if stats is not None:
+                stats['cache'] = 'miss' if entry is None else 'hit'
+            if entry is not None:
+                if stats is not None:
+                    stats['confidence'] = entry.get('confidence')
+                return entry['lines']
+
+        start = time.perf_counter()
+        img = enhance_image(img)
+        if stats is not None:
+            stats['enhance'] = stats.get('enhance', 0.0) + time.perf_counter() - start
+        if not img:
+            if stats is not None:
+                stats['error'] = "image preprocessing failed"
+            return []
+        
+        start = time.perf_counter()
+        confidence = None
+        if regions:
+            import numpy as np
+            from preprocessing import text_regions
+            boxes = text_regions(np.asarray(img))
+            text = '\n'.join(ocr.ocr_regions(img, boxes)) if boxes else ''
+        else:
+            text, confidence = ocr.ocr_with_confidence(img)
+        if stats is not None:
+            stats['ocr'] = stats.get('ocr', 0.0) + time.perf_counter() - start
+            stats['confidence'] = confidence
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        if key is not None:
+            cache.put(key, lines, confidence=confidence)
+        return lines
+    except Exception as e:
+        print(f"OCR error: {str(e)}")
+        if stats is not None:
+            stats['error'] = str(e)
+        return []
+
+def extract_words_from_image(image, cache=None, backend='auto', min_confidence=MIN_OCR_CONFIDENCE,
+                             stats=None):
+    """OCR a page word by word and lay the words out as a table grid.
+
+    Tesseract's per-word boxes and confidences are binned into columns by
+    x position (see ocr_words), so parsers get aligned cells instead of
+    guessing columns from runs of spaces. Cells whose mean word confidence
+    is below min_confidence are re-recognized on their own. Returns rows of
+    cell texts ([] when nothing was read); cached and timed like
+    extract_text_from_image, including the page's mean word confidence.
+    """
+    try:
+        img = _open_image(image)
+        ocr = get_ocr_backend(backend)
+
+        key = None
+        if cache is not None:
+            key = cache.key(img, ocr.config(), tesseract_version(backend),
+                            get_preprocessor().signature(), f"words min_confidence={min_confidence}")
+            entry = cache.get_entry(key)
+            if stats is not None:
+                stats['cache'] = 'miss' if entry is None else 'hit'
+            if entry is not None:
+                if stats is not None:
+                    stats['confidence'] = entry.get('confidence')
+                return [line.split('\t') for line in entry['lines']]
+
+        start = time.perf_counter()
+        img = enhance_image(img)
+        if stats is not None:
+            stats['enhance'] = stats.get('enhance', 0.0) + time.perf_counter() - start
+        if not img:
+            if stats is not None:
+                stats['error'] = "image preprocessing failed"
+            return []
+
+        from ocr_words import WordTable, reocr_low_confidence, words_to_grid
+        start = time.perf_counter()
+        words = WordTable.from_tsv(ocr.ocr_data(img))
+        grid, cells = words_to_grid(words)
+        reocr_low_confidence(img, grid, cells, ocr, min_confidence)
+        confidence = words.mean_confidence()
+        if stats is not None:
+            stats['ocr'] = stats.get('ocr', 0.0) + time.perf_counter() - start
+            stats['confidence'] = confidence
+        if key is not None:
+            cache.put(key, ['\t'.join(row) for row in grid], confidence=confidence)
+        return grid
+    except Exception as e:
+        print(f"Word OCR error: {str(e)}")
+        if stats is not None:
+            stats['error'] = str(e)
+        return []
+
+def extract_table_from_image(image, cache=None, backend='auto', workers=4, stats=None):
+    """OCR a ruled table cell by cell (accepts a path or a PIL image).
+
+    Ruling lines are found on the enhanced page and each non-empty cell is
+    recognized on its own, on a thread pool. Returns the table as rows of
+    cell texts, or None when the page has no grid. Cached like
+    extract_text_from_image, one tab-separated line per row; stats is
+    filled the same way, with grid detection counted as ocr time.
+    """
+    try:
+        img = _open_image(image)
+        ocr = get_ocr_backend(backend)
+
+        key = None
+        if cache is not None:
+            key = cache.key(img, ocr.config(), tesseract_version(backend),
+                            get_preprocessor().signature(), "cells")
+            lines = cache.get(key)
+            if stats is not None:
+                stats['cache'] = 'miss' if lines is None else 'hit'
+            if lines is not None:
+                return [line.split('\t') for line in lines] if lines else None
+
+        start = time.perf_counter()
+        img = enhance_image(img)
+        if stats is not None:
+            stats['enhance'] = stats.get('enhance', 0.0) + time.perf_counter() - start
+        if not img:
+            if stats is not None:
+                stats['error'] = "image preprocessing failed"
+            return None
+
+        import numpy as np
+        from table_grid import build_grid, cell_boxes, detect_grid, ocr_cells
+        start = time.perf_counter()
+        binary = np.asarray(img)
+        rows, columns = detect_grid(binary)
+        grid = None
+        if len(rows) >= 2 and len(columns) >= 2:
+            cells = cell_boxes(binary, rows, columns)
+            pool = get_cell_pool(workers) if workers > 1 else None
+            texts = ocr_cells(img, cells, ocr, workers=workers, pool=pool)
+            grid = build_grid(texts, len(rows) - 1, len(columns) - 1)
+        if stats is not None:
+            stats['ocr'] = stats.get('ocr', 0.0) + time.perf_counter() - start
+        if key is not None:
+            cache.put(key, ['\t'.join(row) for row in grid] if grid else [])
+        return grid
+    except Exception as e:
+        print(f"Table OCR error: {str(e)}")
+        if stats is not None:
+            stats['error'] = str(e)
+        return None
+
+def _init_ocr_worker(backend='auto'):
+    # One Tesseract thread per process; the pool provides the parallelism
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    # Start the OCR engine now so each worker loads the model exactly once
+    try:
+        get_ocr_backend(backend)
+    except Exception as e:
+        print(f"OCR backend startup error: {str(e)}")
+
+def process_page(pdf_path, pg_num, output_dir=None, parser_name='nip', debug_images=False,
+                 cache_dir=None, cache_size=None, force_ocr=False, ocr_backend='auto',
+                 ocr_regions=False, table_cells=False, cell_workers=4, adaptive_dpi=False,
+                 min_confidence=MIN_OCR_CONFIDENCE, ocr_words=False):
+    """Extract and parse a single page (runs in a worker).
+
+    The page's own text layer is used when the parser finds rows in it;
+    otherwise (no text layer, or only a header or footer over a scan) the
+    page is rendered, enhanced and OCR'd. Pages stay in memory; PNGs are written to
+    output_dir only with debug_images. OCR results are cached in cache_dir
+    when given. With table_cells, IAP pages are OCR'd cell by cell from
+    their ruling lines and the matrix is rebuilt from cell positions
+    (method 'cells'), falling back to whole-page OCR when no grid is found.
+    With ocr_words, whole-page OCR keeps each word's box and confidence and
+    the page is parsed from the resulting column-aligned grid (method
+    'words'); its cells below min_confidence are re-OCR'd one by one.
+
+    With adaptive_dpi, OCR pages are rendered at the DPI chosen by
+    choose_render_dpi instead of RENDER_DPI, and whole-page OCR whose mean
+    word confidence is below min_confidence is re-rendered at higher DPIs
+    (up to ADAPTIVE_MAX_DPI), keeping the most confident result.
+
+    The result records which method was used, the render DPI and OCR
+    confidence (None when not applicable), how long the page took and
+    the seconds spent in each stage (see PAGE_STAGES).
+    """
+    start = time.perf_counter()
+    method = 'text'
+    stages = {}
+    dpi = confidence = grid = data = ocr_error = None
+    try:
+        import fitz
+        with fitz.open(pdf_path) as doc:
+            lines = []
+            if not force_ocr:
+                stage_start = time.perf_counter()
+                lines = extract_text_layer(doc.load_page(pg_num))
+                stages['text_layer'] = time.perf_counter() - stage_start
+                if lines:
+                    stage_start = time.perf_counter()
+                    data = PAGE_PARSERS[parser_name](lines)
+                    stages['parse'] = time.perf_counter() - stage_start
+                    if not data:
+                        lines = []
+            if not lines:
+                method = 'ocr'
+                cache = get_ocr_cache(cache_dir, cache_size) if cache_dir else None
+                render_dpi = RENDER_DPI
+                if adaptive_dpi:
+                    stage_start = time.perf_counter()
+                    render_dpi, _ = choose_render_dpi(doc, pg_num)
+                    stages['render'] = time.perf_counter() - stage_start
+
+                while True:
+                    stage_start = time.perf_counter()
+                    img = render_page_image(doc, pg_num, output_dir if debug_images else None,
+                                            grayscale=True, dpi=render_dpi)
+                    stages['render'] = stages.get('render', 0.0) + time.perf_counter() - stage_start
+
+                    if table_cells and parser_name == 'iap':
+                        page_grid = extract_table_from_image(img, cache=cache, backend=ocr_backend,
+                                                             workers=cell_workers, stats=stages)
+                        # A failed cell pass falls back to whole-page OCR below
+                        stages.pop('error', None)
+                        if page_grid:
+                            method, grid, dpi = 'cells', page_grid, render_dpi
+                            break
+
+                    page_grid = None
+                    if ocr_words:
+                        page_grid = extract_words_from_image(img, cache=cache, backend=ocr_backend,
+                                                             min_confidence=min_confidence,
+                                                             stats=stages)
+                        page_lines = ['  '.join(cell for cell in row if cell) for row in page_grid]
+                    else:
+                        page_lines = extract_text_from_image(img, cache=cache, backend=ocr_backend,
+                                                             regions=ocr_regions, stats=stages)
+                    page_confidence = stages.pop('confidence', None)
+                    ocr_error = stages.pop('error', None) or ocr_error
+                    if dpi is None or (page_confidence or 0) > (confidence or 0):
+                        lines, grid = page_lines, page_grid
+                        dpi, confidence = render_dpi, page_confidence
+                    if (not adaptive_dpi or page_confidence is None
+                            or page_confidence >= min_confidence
+                            or render_dpi >= ADAPTIVE_MAX_DPI):
+                        break
+                    render_dpi = _round_dpi(render_dpi * 1.5)
+                if not lines and ocr_error:
+                    # Report it: an OCR failure is not an empty page
+                    raise RuntimeError(f"OCR failed: {ocr_error}")
+        if method != 'text':
+            stage_start = time.perf_counter()
+            if grid:
+                if method == 'cells':
+                    lines = ['  '.join(cell for cell in row if cell) for row in grid]
+                else:
+                    method = 'words'
+                data = GRID_PARSERS[parser_name](grid)
+            else:
+                data = PAGE_PARSERS[parser_name](lines)
+            stages['parse'] = stages.get('parse', 0.0) + time.perf_counter() - stage_start
+        ocr_cache = stages.pop('cache', None)
+        return {
+            'pdf': pdf_path,
+            'page': pg_num,
+            'parser': parser_name,
+            'method': method,
+            'lines': lines,
+            'data': data,
+            'dpi': dpi,
+            'confidence': confidence,
+            'seconds': time.perf_counter() - start,
+            'stages': stages,
+            'ocr_cache': ocr_cache,
+            'error': None
+        }
+    except Exception as e:
+        print(f"Page {pg_num+1} processing error: {str(e)}")
+        return {'pdf': pdf_path, 'page': pg_num, 'parser': parser_name, 'method': method,
+                'lines': [], 'data': [], 'dpi': dpi, 'confidence': confidence,
+                'seconds': time.perf_counter() - start,
+                'stages': stages, 'ocr_cache': stages.pop('cache', None), 'error': str(e)}
+
+def stream_pages(jobs, workers=None, max_pending=None, ordered=False, **options):
+    """Run (pdf_path, page_number, parser_name) jobs and yield results as they finish.
+
+    jobs may be a lazy iterable. At most max_pending pages (default two per
+    worker) are in flight at once, so memory stays flat however many jobs
+    there are. Yields (job_index, result) in completion order, or with
+    ordered in job order; finished pages then wait for the ones before
+    them, and they count towards max_pending. options are passed through
+    to process_page.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, workers)
+    if max_pending is None:
+        max_pending = workers * 2
+
+    if workers == 1:
+        for i, (pdf_path, pg_num, parser_name) in enumerate(jobs):
+            yield i, process_page(pdf_path, pg_num, parser_name=parser_name, **options)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker,
+                             initargs=(options.get('ocr_backend', 'auto'),)) as pool:
+        pending = {}
+        held = {}  # ordered: finished pages waiting for earlier ones
+        next_index = 0
+
+        def collect():
+            nonlocal next_index
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if ordered:
+                    held[pending.pop(future)] = future.result()
+                else:
+                    yield pending.pop(future), future.result()
+            while next_index in held:
+                yield next_index, held.pop(next_index)
+                next_index += 1
+
+        for i, (pdf_path, pg_num, parser_name) in enumerate(jobs):
+            while len(pending) + len(held) >= max_pending:
+                yield from collect()
+            future = pool.submit(process_page, pdf_path, pg_num, parser_name=parser_name, **options)
+            pending[future] = i
+        while pending:
+            yield from collect()
+
+def run_pipeline(pdf_path, output_dir, page_jobs, workers=None, debug_images=False,
+                 cache_dir=None, cache_size=None, force_ocr=False, ocr_backend='auto',
+                 ocr_regions=False, table_cells=False, adaptive_dpi=False,
+                 min_confidence=MIN_OCR_CONFIDENCE, ocr_words=False):
+    """Process (page_number, parser_name) jobs across a process pool.
+
+    Results come back in the order of page_jobs. workers=1 runs everything
+    in-process, which is handy for debugging. cache_dir=None disables the
+    OCR cache.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(page_jobs)))
+
+    jobs = [(pdf_path, pg_num, parser_name) for pg_num, parser_name in page_jobs]
+    results = [None] * len(jobs)
+    for i, result in stream_pages(jobs, workers=workers, output_dir=output_dir,
+                                  debug_images=debug_images, cache_dir=cache_dir,
+                                  cache_size=cache_size, force_ocr=force_ocr,
+                                  ocr_backend=ocr_backend, ocr_regions=ocr_regions,
+                                  table_cells=table_cells, adaptive_dpi=adaptive_dpi,
+                                  min_confidence=min_confidence, ocr_words=ocr_words):
+        results[i] = result
+    return results
+
+def record_page_metrics(result):
+    """Feed one page result's timings into the metrics registry"""
+    if not registry.enabled:
+        return
+    for stage, seconds in result.get('stages', {}).items():
+        stage_latency.observe(seconds, stage=stage)
+    page_latency.observe(result['seconds'], method=result['method'])
+    if result.get('ocr_cache'):
+        ocr_cache_lookups.inc(result=result['ocr_cache'])
+
+def save_as_csv(data, filename, output_dir):
+    """Save extracted data to CSV"""
+    if not data:
+        print(f"No data to save for {filename}")
+        return False
+    
+    try:
+        import pandas as pd
+        df = clean_dataframe(pd.DataFrame(data))
+        
+        os.makedirs(output_dir, exist_ok=True)
+        filepath = os.path.join(output_dir, filename)
+        df.to_csv(filepath, index=False, encoding='utf-8')
+        print(f"Saved {filename} with {len(df)} entries")
+        print("Sample data:")
+        print(df.head())
+        return True
+    except Exception as e:
+        print(f"Error saving {filename}: {str(e)}")
+        return False
+
+class Checkpoint:
+    """Append-only record of finished (pdf, page) pairs for resuming a run.
+
+    Each entry also records the size of every output dataset at that point,
+    so rows written after the last entry (by a run that crashed before it
+    could record them) can be cut off again on resume.
+    """
+
+    def __init__(self, path, fmt='csv'):
+        self.path = path
+        self.fmt = fmt
+        self.done = set()
+        self.sizes = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from a crash
+                    self.done.add((entry['pdf'], entry['page']))
+                    self.sizes = entry.get('sizes', {})
+
+    def __contains__(self, item):
+        return item in self.done
+
+    def restore_outputs(self, outputs):
+        """Truncate outputs to their sizes at the last checkpoint entry"""
+        for name, path in outputs.items():
+            truncate_dataset(path, self.fmt, self.sizes.get(name, 0))
+
+    def mark(self, pdf_path, pg_num, outputs):
+        sizes = {name: dataset_size(path, self.fmt) for name, path in outputs.items()}
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'pdf': pdf_path, 'page': pg_num, 'sizes': sizes}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.add((pdf_path, pg_num))
+        self.sizes = sizes
+
+def find_pdfs(inputs):
+    """Expand directories and glob patterns into a sorted list of PDF paths"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, '**', '*.pdf'), recursive=True)
+            matches += glob.glob(os.path.join(item, '**', '*.PDF'), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True)
+        paths.update(os.path.abspath(path) for path in matches if os.path.isfile(path))
+    return sorted(paths)
+
+def parse_page_spec(spec):
+    """Parse '4:nip,5:iap' (1-based pages) into [(3, 'nip'), (4, 'iap')]"""
+    page_jobs = []
+    for part in spec.split(','):
+        page, _, parser_name = part.strip().partition(':')
+        if parser_name not in PAGE_PARSERS:
+            raise argparse.ArgumentTypeError(
+                f"Unknown parser '{parser_name}' (expected one of {', '.join(PAGE_PARSERS)})")
+        try:
+            number = int(page)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid page number '{page}'")
+        # PyMuPDF counts negative indexes from the end; never let 0 become -1
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"Page numbers start at 1, got '{page}'")
+        page_jobs.append((number - 1, parser_name))
+    return page_jobs
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract immunization schedules from PDFs")
+    parser.add_argument('inputs', nargs='+',
+                        help="PDF files, directories or glob patterns")
+    parser.add_argument('-o', '--output', default='output',
+                        help="Directory for the combined schedule outputs (default: output)")
+    parser.add_argument('-f', '--format', choices=list(FORMATS), default='csv',
+                        help="Output format; parquet and feather need pyarrow (default: csv)")
+    parser.add_argument('--pages', type=parse_page_spec, default=parse_page_spec('4:nip,5:iap'),
+                        help="Comma-separated page:parser pairs, 1-based (default: 4:nip,5:iap)")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="OCR worker processes (default: one per CPU core)")
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help="Pages in flight at once (default: two per worker)")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore the checkpoint and start the combined outputs afresh")
+    parser.add_argument('--save-page-images', action='store_true',
+                        help="Write page PNGs to the output directory for debugging OCR")
+    parser.add_argument('--force-ocr', action='store_true',
+                        help="OCR every page even when it has a text layer")
+    parser.add_argument('--ocr-backend', choices=['auto', 'tesserocr', 'pytesseract'], default='auto',
+                        help="auto uses tesserocr's persistent in-process engine when it is "
+                             "installed and can load its language data, else (the default "
+                             "without tesserocr) one tesseract process per call")
+    parser.add_argument('--ocr-regions', action='store_true',
+                        help="OCR only the detected text/table regions of each page")
+    parser.add_argument('--ocr-words', action='store_true',
+                        help="Keep OCR word boxes and confidences and parse pages from "
+                             "x-aligned columns, re-OCR'ing low-confidence cells")
+    parser.add_argument('--table-cells', action='store_true',
+                        help="Detect the IAP table grid and OCR each cell separately")
+    parser.add_argument('--cell-workers', type=int, default=4,
+                        help="Threads per page for cell OCR (default: 4)")
+    parser.add_argument('--adaptive-dpi', action='store_true',
+                        help="Pick each OCR page's render DPI from its text size instead of "
+                             f"a fixed {RENDER_DPI}, re-rendering higher when confidence is low")
+    parser.add_argument('--min-confidence', type=float, default=MIN_OCR_CONFIDENCE,
+                        help="Mean word confidence (0-100) below which --adaptive-dpi "
+                             "re-renders a page and --ocr-words re-OCRs a cell "
+                             f"(default: {MIN_OCR_CONFIDENCE})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always re-run OCR instead of reusing cached page results")
+    parser.add_argument('--cache-dir', default=None,
+                        help="OCR cache directory (default: <output>/.ocr_cache)")
+    parser.add_argument('--cache-size-mb', type=int, default=256,
+                        help="Maximum OCR cache size in MB")
+    parser.add_argument('--metrics', nargs='?', const='-', default=None, metavar='PATH',
+                        help="Collect per-stage timings and print a JSON summary at the end, "
+                             "or write it to PATH")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_folder = args.output
+    os.makedirs(output_folder, exist_ok=True)
+    cache_dir = None if args.no_cache else (args.cache_dir or os.path.join(output_folder, '.ocr_cache'))
+    registry.enabled = args.metrics is not None
+    
+    # Verify environment
+    check_dependencies(args.ocr_backend)
+    if args.format != 'csv':
+        if importlib.util.find_spec('pyarrow') is None:
+            print(f"Writing {args.format} output needs pyarrow. Please install with:")
+            print("pip install pyarrow")
+            return 1
+    
+    pdf_files = find_pdfs(args.inputs)
+    if not pdf_files:
+        print("No PDF files found")
+        return 1
+    
+    # Resume from the checkpoint unless asked to start over. Without a
+    # checkpoint the combined outputs are rebuilt from scratch.
+    checkpoint_path = os.path.join(output_folder, '.checkpoint.jsonl')
+    outputs = {name: dataset_path(output_folder, f"{name}_schedule", args.format)
+               for name in PAGE_PARSERS}
+    if args.restart or not os.path.exists(checkpoint_path):
+        for path in outputs.values():
+            remove_dataset(path, args.format)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path, args.format)
+    checkpoint.restore_outputs(outputs)
+    
+    jobs = (
+        (pdf_path, pg_num, parser_name)
+        for pdf_path in pdf_files
+        for pg_num, parser_name in args.pages
+        if (pdf_path, pg_num) not in checkpoint
+    )
+    
+    # Render, OCR and parse pages in parallel; save each page in input order
+    # so the combined outputs come out the same on every run
+    print(f"\nProcessing {len(pdf_files)} PDF file(s)...")
+    pages = rows = failed = 0
+    for _, result in stream_pages(jobs, workers=args.workers, max_pending=args.max_pending,
+                                  ordered=True, output_dir=output_folder,
+                                  debug_images=args.save_page_images, cache_dir=cache_dir, cache_size=args.cache_size_mb * 1024 * 1024,
+                                  force_ocr=args.force_ocr, ocr_backend=args.ocr_backend,
+                                  ocr_regions=args.ocr_regions, table_cells=args.table_cells,
+                                  cell_workers=args.cell_workers, adaptive_dpi=args.adaptive_dpi,
+                                  min_confidence=args.min_confidence, ocr_words=args.ocr_words):
+        name = os.path.basename(result['pdf'])
+        record_page_metrics(result)
+        if result['error']:
+            failed += 1
+            print(f"Failed {name} page {result['page']+1}: {result['error']}")
+            continue
+        if result['data']:
+            with stage_latency.time(stage='save'):
+                rows += append_dataset(result['data'], outputs[result['parser']], args.format,
+                                       extra_columns={'Source': name, 'Page': result['page'] + 1})
+        checkpoint.mark(result['pdf'], result['page'], outputs)
+        pages += 1
+        ocr_detail = ''
+        if result['dpi']:
+            ocr_detail = f" at {result['dpi']} dpi"
+            if result['confidence'] is not None:
+                ocr_detail += f", confidence {result['confidence']:.0f}"
+        print(f"{name} page {result['page']+1}: {len(result['data'])} {result['parser'].upper()} entries "
+              f"via {result['method']}{ocr_detail} in {result['seconds'] * 1000:.0f} ms")
+    
+    print(f"\nProcessed {pages} page(s), {rows} row(s) saved, {failed} failed")
+    for name, path in outputs.items():
+        if os.path.exists(path):
+            print(f"{name.upper()} schedule: {path}")
+
+    if args.metrics is not None:
+        summary = json.dumps(registry.summary(), indent=2)
+        if args.metrics == '-':
+            print(f"\nMetrics:\n{summary}")
+        else:
+            with open(args.metrics, 'w', encoding='utf-8') as f:
+                f.write(summary + '\n')
+            print(f"Metrics summary: {args.metrics}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# import os
+# import re
+# import pandas as pd
+# import pytesseract
+# from PIL import Image, ImageEnhance, ImageFilter
+
+# class ImmunizationExtractor:
+#     def __init__(self):
+#         self.vaccine_patterns = [
+#             ('BCG', r'BCG'),
+#             ('Hepatitis B', r'Hep[ab]t?i?t?i?s? B'),
+#             ('OPV', r'OPV'),
+#             ('Pentavalent', r'Penta(?:valent)?'),
+#             ('IPV', r'IPV'),
+#             ('Rotavirus', r'Rotavirus'),
+#             ('Pneumococcal', r'Pneumo(?:cocca)?l|PCV'),
+#             ('Measles', r'Measles'),
+#             ('Rubella', r'Rubella'),
+#             ('Japanese Encephalitis', r'Japanese Encephalitis|JE'),
+#             ('Vitamin A', r'Vitamin A'),
+#             ('DPT', r'DPT'),
+#             ('Td', r'Td')
+#         ]
+
+#     def clean_text(self, text):
+#         """Clean and normalize extracted text"""
+#         if not isinstance(text, str):
+#             text = str(text)
+#         text = re.sub(r'[^\w\s\-/()]', '', text)
+#         return text.strip()
+
+#     def enhance_image(self, image_path):
+#         """Enhanced image preprocessing"""
+#         try:
+#             img = Image.open(image_path)
+#             img = img.convert('L')
+#             enhancer = ImageEnhance.Contrast(img)
+#             img = enhancer.enhance(3.0)
+#             img = img.filter(ImageFilter.MedianFilter(size=3))
+#             img = img.point(lambda x: 0 if x < 180 else 255)
+#             return img
+#         except Exception as e:
+#             print(f"Image processing error: {str(e)}")
+#             return None
+
+#     def extract_text(self, image_path):
+#         """Robust text extraction with error handling"""
+#         try:
+#             img = self.enhance_image(image_path)
+#             if img is None:
+#                 return ""
+#             custom_config = r'--oem 3 --psm 6 -c preserve_interword_spaces=1'
+#             text = pytesseract.image_to_string(img, config=custom_config)
+#             return text
+#         except Exception as e:
+#             print(f"OCR error: {str(e)}")
+#             return ""
+
+#     def parse_nip_schedule(self, text):
+#         """Improved NIP table parser with robust column detection"""
+#         schedule = []
+#         current_entry = None
+        
+#         for line in text.split('\n'):
+#             line = line.strip()
+#             if not line:
+#                 continue
+                
+#             # Skip headers and separators
+#             if "Vaccine" in line or re.match(r'^[\|+=_-]+$', line):
+#                 continue
+                
+#             # Find vaccine names
+#             vaccine = None
+#             for v_name, pattern in self.vaccine_patterns:
+#                 match = re.search(pattern, line, re.IGNORECASE)
+#                 if match:
+#                     vaccine = v_name
+#                     remaining = line[match.end():].strip()
+#                     break
+            
+#             if vaccine:
+#                 # Save previous entry if exists
+#                 if current_entry:
+#                     schedule.append(current_entry)
+                
+#                 # Split remaining text into columns
+#                 parts = re.split(r'\s{2,}', remaining, maxsplit=3)
+#                 current_entry = {
+#                     'Vaccine': vaccine,
+#                     'When to give': self.clean_text(parts[0]) if len(parts) > 0 else '',
+#                     'Dose': self.clean_text(parts[1]) if len(parts) > 1 else '',
+#                     'Route': self.clean_text(parts[2]) if len(parts) > 2 else '',
+#                     'Site': self.clean_text(parts[3]) if len(parts) > 3 else ''
+#                 }
+#             elif current_entry:
+#                 # Handle continuation lines
+#                 if not current_entry['When to give']:
+#                     current_entry['Vaccine'] += " " + self.clean_text(line)
+#                 elif not current_entry['Dose']:
+#                     current_entry['When to give'] += " " + self.clean_text(line)
+#                 elif not current_entry['Route']:
+#                     current_entry['Dose'] += " " + self.clean_text(line)
+#                 elif not current_entry['Site']:
+#                     current_entry['Route'] += " " + self.clean_text(line)
+#                 else:
+#                     current_entry['Site'] += " " + self.clean_text(line)
+        
+#         # Add the last entry if it exists
+#         if current_entry:
+#             schedule.append(current_entry)
+            
+#         return schedule
+
+#     def parse_iap_schedule(self, text):
+#         """Fixed IAP matrix parser with proper parentheses"""
+#         schedule = []
+#         age_headers = []
+#         in_table = False
+        
+#         for line in text.split('\n'):
+#             line = line.strip()
+#             if not line:
+#                 continue
+                
+#             # Find age headers
+#             if not in_table and any(age in line.lower() for age in ['birth', '6w', '10w']):
+#                 age_headers = re.findall(r'\b(?:birth|\d+[wmdy])\b', line.lower())
+#                 in_table = True
+#                 continue
+                
+#             if in_table:
+#                 # Skip separators
+#                 if re.match(r'^[\-=\+]+$', line):
+#                     continue
+                    
+#                 # Find vaccine names
+#                 vaccine = None
+#                 for v_name, pattern in self.vaccine_patterns:
+#                     match = re.search(pattern, line, re.IGNORECASE)
+#                     if match:
+#                         vaccine = v_name
+#                         line = line[match.end():].strip()
+#                         break
+                        
+#                 if vaccine and age_headers:
+#                     # Find all dose codes with proper column calculation
+#                     for dose in re.finditer(r'([A-Z]{2,}\d*)', line):
+#                         pos = dose.start()
+#                         col = min(int(pos / (len(line)/len(age_headers))), len(age_headers)-1)
+#                         schedule.append({
+#                             'Vaccine': vaccine,
+#                             'Age': age_headers[col],
+#                             'Dose': dose.group()
+#                         })
+        
+#         return schedule
+
+#     def save_to_csv(self, data, filename, output_dir):
+#         """Save data with validation"""
+#         if not data:
+#             print(f"No data to save for {filename}")
+#             return False
+            
+#         try:
+#             df = pd.DataFrame(data)
+#             # Clean all columns
+#             for col in df.columns:
+#                 df[col] = df[col].apply(self.clean_text)
+            
+#             os.makedirs(output_dir, exist_ok=True)
+#             filepath = os.path.join(output_dir, filename)
+#             df.to_csv(filepath, index=False)
+#             print(f"Saved {filename} with {len(df)} entries")
+#             print("First 3 entries:")
+#             print(df.head(3).to_string(index=False))
+#             return True
+#         except Exception as e:
+#             print(f"Error saving {filename}: {str(e)}")
+#             return False
+
+#     def process_schedules(self, nip_image_path, iap_image_path, output_dir):
+#         """Main processing method with error handling"""
+#         print("\nProcessing NIP schedule...")
+#         nip_text = self.extract_text(nip_image_path)
+#         print("\nExtracted NIP Text Sample:")
+#         print(nip_text[:500] + "..." if len(nip_text) > 500 else nip_text)
+        
+#         nip_data = self.parse_nip_schedule(nip_text)
+#         self.save_to_csv(nip_data, 'nip_schedule.csv', output_dir)
+        
+#         print("\nProcessing IAP schedule...")
+#         iap_text = self.extract_text(iap_image_path)
+#         print("\nExtracted IAP Text Sample:")
+#         print(iap_text[:500] + "..." if len(iap_text) > 500 else iap_text)
+        
+#         iap_data = self.parse_iap_schedule(iap_text)
+#         self.save_to_csv(iap_data, 'iap_schedule.csv', output_dir)
+        
+#         print("\nProcessing completed!")
+
+# if __name__ == "__main__":
+#     output_dir = r"C:\Users\mackrish_malik\Desktop\Amandeep Code\output"
+#     nip_image_path = os.path.join(output_dir, "page_4.png")
+#     iap_image_path = os.path.join(output_dir, "page_5.png")
+    
+#     if not os.path.exists(nip_image_path):
+#         print(f"Error: NIP image not found at {nip_image_path}")
+#     if not os.path.exists(iap_image_path):
+#         print(f"Error: IAP image not found at {iap_image_path}")
+    
+#     extractor = ImmunizationExtractor()
+#     extractor.process_schedules(nip_image_path, iap_image_path, output_dir)
+
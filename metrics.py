@@ -0,0 +1,264 @@
+import os
+import threading
+import time
+
+# Seconds; covers page stages and requests from a millisecond to a minute
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Seconds; for in-memory lookups that take microseconds
+FAST_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+                0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class _Timer:
+    """Context manager that observes its own duration into a histogram"""
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values, like Prometheus'"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (+Inf last), sum, count, max
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            series[1] += value
+            series[2] += 1
+            if value > series[3]:
+                series[3] = value
+
+    def time(self, **labels):
+        """with histogram.time(route='/'): ... observes the block's duration"""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def _quantile(self, q, counts, total):
+        """Estimate a quantile by interpolating within its bucket"""
+        rank = q * total
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1] if self.buckets else 0.0
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(value[0]), value[1], value[2], value[3])
+                      for key, value in self._series.items()}
+        lines = []
+        for key, (counts, total_sum, count, _) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(self.labelnames, key, ('le', _format_value(bound)))}"
+                             f" {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def summary(self):
+        with self._lock:
+            series = {key: (list(value[0]), value[1], value[2], value[3])
+                      for key, value in self._series.items()}
+        result = {}
+        for key, (counts, total_sum, count, maximum) in sorted(series.items()):
+            name = ','.join(f"{label}={value}" for label, value in zip(self.labelnames, key))
+            result[name or 'all'] = {
+                "count": count,
+                "sum_seconds": total_sum,
+                "mean_seconds": total_sum / count if count else 0.0,
+                "p50_seconds": min(self._quantile(0.5, counts, count), maximum),
+                "p95_seconds": min(self._quantile(0.95, counts, count), maximum),
+                "max_seconds": maximum
+            }
+        return result
+
+
+class Counter:
+    """Monotonic count keyed by label values"""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+    def summary(self):
+        with self._lock:
+            values = dict(self._values)
+        return {','.join(f"{label}={value}" for label, value in zip(self.labelnames, key)) or 'all': value
+                for key, value in sorted(values.items())}
+
+
+class Gauge:
+    """Value read from a callback at scrape time.
+
+    callback() returns {label_values_tuple: value}, so existing counters
+    (like LRUCache.stats) are reported without extra bookkeeping.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help_text, callback, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def _values(self):
+        try:
+            return self.callback()
+        except Exception as e:
+            print(f"Metrics gauge {self.name} error: {str(e)}")
+            return {}
+
+    def samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values().items())]
+
+    def summary(self):
+        return {','.join(f"{label}={value}" for label, value in zip(self.labelnames, key)) or 'all': value
+                for key, value in sorted(self._values().items())}
+
+
+class Registry:
+    """Named metrics with Prometheus text and JSON output.
+
+    When disabled, observe() and inc() return after a single attribute
+    check and time() hands out a shared no-op context manager.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' is already registered as a {metric.kind}")
+            return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, callback, labelnames=()):
+        return self._register(Gauge, name, help_text, callback, labelnames)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """All metrics as a JSON-serializable dict"""
+        return {name: metric.summary() for name, metric in list(self._metrics.items())}
+
+
+# Shared registry; set METRICS_ENABLED=0 to turn collection off
+registry = Registry(enabled=os.environ.get('METRICS_ENABLED', '1') != '0')
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
@@ -0,0 +1,217 @@
+import threading
+
+# Page segmentation modes used here (same numbers as Tesseract's --psm)
+PSM_SINGLE_BLOCK = 6
+PSM_SINGLE_LINE = 7
+
+# Columns of Tesseract's TSV output used here
+TSV_LEFT_COLUMN = 6
+TSV_TOP_COLUMN = 7
+TSV_CONF_COLUMN = 10
+
+def mean_tsv_confidence(tsv):
+    """Mean confidence (0-100) of the recognized words in Tesseract TSV, or None"""
+    confidences = []
+    for row in tsv.splitlines()[1:]:
+        fields = row.split('\t')
+        if len(fields) <= TSV_CONF_COLUMN + 1 or not fields[TSV_CONF_COLUMN + 1].strip():
+            continue
+        try:
+            conf = float(fields[TSV_CONF_COLUMN])
+        except ValueError:
+            continue
+        if conf >= 0:
+            confidences.append(conf)
+    return sum(confidences) / len(confidences) if confidences else None
+
+def offset_tsv(tsv, left, top):
+    """Shift the boxes in Tesseract TSV by (left, top)"""
+    rows = []
+    for row in tsv.splitlines():
+        fields = row.split('\t')
+        if len(fields) > TSV_CONF_COLUMN and fields[0].isdigit():
+            fields[TSV_LEFT_COLUMN] = str(int(fields[TSV_LEFT_COLUMN]) + left)
+            fields[TSV_TOP_COLUMN] = str(int(fields[TSV_TOP_COLUMN]) + top)
+        rows.append('\t'.join(fields))
+    return '\n'.join(rows)
+
+class PytesseractBackend:
+    """OCR through the tesseract CLI; every call starts a new process.
+
+    Works anywhere tesseract is on PATH, but pays process startup and model
+    load on each call, including once per region.
+    """
+
+    name = 'pytesseract'
+
+    def __init__(self, lang='eng', psm=PSM_SINGLE_BLOCK, variables=None):
+        import pytesseract
+        self._pytesseract = pytesseract
+        self.lang = lang
+        self.psm = psm
+        self.variables = dict(variables or {'preserve_interword_spaces': '1'})
+
+    def config(self, psm=None):
+        options = [f"--oem 3 --psm {psm or self.psm}"]
+        options += [f"-c {key}={value}" for key, value in sorted(self.variables.items())]
+        return ' '.join(options)
+
+    def version(self):
+        return f"{self.name} {self._pytesseract.get_tesseract_version()}"
+
+    def ocr(self, image, box=None, psm=None):
+        """Text of image, or of the (left, top, width, height) box within it"""
+        if box is not None:
+            left, top, width, height = box
+            image = image.crop((left, top, left + width, top + height))
+        return self._pytesseract.image_to_string(image, lang=self.lang, config=self.config(psm))
+
+    def ocr_regions(self, image, regions, psm=None):
+        return [self.ocr(image, box, psm) for box in regions]
+
+    def ocr_with_confidence(self, image, box=None, psm=None):
+        """(text, mean word confidence) from a single tesseract run.
+
+        The run writes the usual text output plus a TSV with per-word
+        confidences, so the text is identical to ocr().
+        """
+        if box is not None:
+            left, top, width, height = box
+            image = image.crop((left, top, left + width, top + height))
+        runner = self._pytesseract.pytesseract
+        with runner.save(image) as (output_base, input_filename):
+            runner.run_tesseract(input_filename, output_base, 'txt', self.lang,
+                                 config=self.config(psm) + ' -c tessedit_create_tsv=1')
+            with open(output_base + '.txt', encoding='utf-8') as f:
+                text = f.read()
+            with open(output_base + '.tsv', encoding='utf-8') as f:
+                confidence = mean_tsv_confidence(f.read())
+        return text, confidence
+
+    def ocr_data(self, image, box=None, psm=None):
+        """Tesseract TSV (one row per page, block, paragraph, line and word).
+
+        Boxes are in the coordinates of the whole image, also when only the
+        box region is recognized.
+        """
+        if box is None:
+            return self._pytesseract.image_to_data(image, lang=self.lang, config=self.config(psm))
+        left, top, width, height = box
+        tsv = self._pytesseract.image_to_data(image.crop((left, top, left + width, top + height)),
+                                              lang=self.lang, config=self.config(psm))
+        return offset_tsv(tsv, left, top)
+
+
+class TesserocrBackend:
+    """OCR through tesserocr's in-process TessBaseAPI.
+
+    The API (and its language model) is created once per thread and reused
+    for every page. ocr_regions() sets the page image once and recognizes
+    each region with SetRectangle, so cells cost no extra image copies.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, lang='eng', psm=PSM_SINGLE_BLOCK, variables=None):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.lang = lang
+        self.psm = psm
+        self.variables = dict(variables or {'preserve_interword_spaces': '1'})
+        self._local = threading.local()
+        # Load the model now: startup cost and errors belong to worker start
+        self._api(psm)
+
+    def _api(self, psm):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = self._tesserocr.PyTessBaseAPI(lang=self.lang, psm=self.psm)
+            for key, value in self.variables.items():
+                api.SetVariable(key, value)
+            self._local.api = api
+        api.SetPageSegMode(psm or self.psm)
+        return api
+
+    def config(self, psm=None):
+        options = [f"psm={psm or self.psm}"]
+        options += [f"{key}={value}" for key, value in sorted(self.variables.items())]
+        return ' '.join(options)
+
+    def version(self):
+        return f"{self.name} {self._tesserocr.tesseract_version().splitlines()[0]}"
+
+    def ocr(self, image, box=None, psm=None):
+        return self.ocr_regions(image, [box], psm)[0]
+
+    def ocr_with_confidence(self, image, box=None, psm=None):
+        """(text, mean word confidence) from one recognition pass"""
+        api = self._api(psm)
+        api.SetImage(image)
+        if box is not None:
+            api.SetRectangle(*box)
+        text = api.GetUTF8Text()
+        confidence = api.MeanTextConf() if text.strip() else None
+        api.Clear()
+        return text, confidence
+
+    def ocr_data(self, image, box=None, psm=None):
+        """Tesseract TSV, like PytesseractBackend.ocr_data"""
+        api = self._api(psm)
+        api.SetImage(image)
+        if box is not None:
+            api.SetRectangle(*box)
+        tsv = api.GetTSVText(0)
+        api.Clear()
+        return tsv
+
+    def ocr_regions(self, image, regions, psm=None):
+        api = self._api(psm)
+        api.SetImage(image)
+        texts = []
+        for box in regions:
+            if box is None:
+                left, top = 0, 0
+                width, height = image.size
+            else:
+                left, top, width, height = box
+            api.SetRectangle(left, top, width, height)
+            texts.append(api.GetUTF8Text())
+        api.Clear()
+        return texts
+
+    def close(self):
+        api = getattr(self._local, 'api', None)
+        if api is not None:
+            api.End()
+            self._local.api = None
+
+
+BACKENDS = {
+    PytesseractBackend.name: PytesseractBackend,
+    TesserocrBackend.name: TesserocrBackend
+}
+
+def tesserocr_usable(lang='eng'):
+    """Whether tesserocr is installed and can load lang's language data"""
+    try:
+        import tesserocr
+        with tesserocr.PyTessBaseAPI(lang=lang):
+            return True
+    except (ImportError, RuntimeError):
+        return False
+
+def get_backend(name='auto', **options):
+    """Create an OCR backend; 'auto' prefers tesserocr when it is usable.
+
+    tesserocr is an optional install (it builds against libtesseract), so
+    without it 'auto' means pytesseract: one tesseract process per call.
+    """
+    if name == 'auto':
+        try:
+            return TesserocrBackend(**options)
+        except (ImportError, RuntimeError):
+            # Not installed, or no language data for it
+            return PytesseractBackend(**options)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend '{name}' (expected auto, {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import tempfile
+
+class OCRCache:
+    """On-disk OCR results addressed by page content and OCR settings.
+
+    Entries are small JSON files holding the raw OCR lines, named by a hash
+    of the page image bytes, the Tesseract config and version, and the
+    preprocessing settings. A hit refreshes the file's mtime, and when the
+    cache grows past max_bytes the least recently used files are removed,
+    down to trim_to of it so the next few writes don't evict again.
+    Writes go through a temp file and os.replace so several worker
+    processes can share one directory.
+
+    Finding the least recently used files means a walk over the whole
+    directory, so put() keeps a running total of the cache size and only
+    walks when that says the cache is full. Other processes' writes are not
+    in the total, so it also walks every evict_every puts to catch up.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, trim_to=0.9, evict_every=100):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.trim_to = trim_to
+        self.evict_every = evict_every
+        self._size = None  # Running total since the last walk; None until one
+        self._puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(image, *settings):
+        """Hash a PIL image's pixels together with the OCR settings"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+        digest.update(image.tobytes())
+        for setting in settings:
+            digest.update(b"\0" + str(setting).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """Cached OCR lines for key, or None"""
+        entry = self.get_entry(key)
+        return entry["lines"] if entry is not None else None
+
+    def get_entry(self, key):
+        """The whole cached entry ({"lines": ..., plus extras}) for key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or "lines" not in entry:
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, lines, **extra):
+        """Store lines (and JSON-serializable extras, like a confidence)"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"lines": lines, **extra}, f)
+                written = f.tell()
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._puts += 1
+        # An overwritten entry is counted twice; that only walks a bit early
+        if (self._size is None or self._size + written > self.max_bytes
+                or self._puts % self.evict_every == 0):
+            self.evict()
+        else:
+            self._size += written
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Evicted by another process
+                yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        """Remove least recently used entries if over max_bytes, down to
+        trim_to of it; returns the number removed"""
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * self.trim_to
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+        self._size = total
+        return removed
+
+    def size(self):
+        self._size = sum(size for _, size, _ in self._entries())
+        return self._size
@@ -0,0 +1,161 @@
+import numpy as np
+
+from ocr_backend import PSM_SINGLE_LINE, TSV_CONF_COLUMN
+
+# TSV row level of a single word (1 page, 2 block, 3 paragraph, 4 line)
+WORD_LEVEL = '5'
+
+class WordTable:
+    """Words recognized on a page, as parallel NumPy arrays.
+
+    text holds the words and left, top, width and height their boxes in
+    page pixels. conf is Tesseract's 0-100 word confidence, block the
+    block number, and line a page-wide line number in reading order.
+    """
+
+    def __init__(self, text, left, top, width, height, conf, block, line):
+        self.text = text
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.conf = conf
+        self.block = block
+        self.line = line
+
+    @classmethod
+    def from_tsv(cls, tsv):
+        """Parse Tesseract TSV (image_to_data, GetTSVText), keeping only words"""
+        rows = [fields for fields in (row.split('\t', TSV_CONF_COLUMN + 1) for row in tsv.splitlines())
+                if len(fields) == TSV_CONF_COLUMN + 2 and fields[0] == WORD_LEVEL
+                and fields[-1].strip()]
+        if not rows:
+            empty = np.empty(0, dtype=np.int32)
+            return cls(np.empty(0, dtype=object), empty, empty, empty, empty,
+                       np.empty(0, dtype=np.float32), empty, empty)
+
+        numbers = np.array([fields[:TSV_CONF_COLUMN + 1] for fields in rows], dtype=np.float64)
+        text = np.array([fields[-1].strip() for fields in rows], dtype=object)
+        # block, paragraph, line -> one number per line, in reading order
+        _, line = np.unique(numbers[:, 2:5], axis=0, return_inverse=True)
+        columns = numbers[:, 6:10].astype(np.int32)
+        return cls(text, columns[:, 0], columns[:, 1], columns[:, 2], columns[:, 3],
+                   numbers[:, TSV_CONF_COLUMN].astype(np.float32),
+                   numbers[:, 2].astype(np.int32), line.reshape(-1).astype(np.int32))
+
+    def __len__(self):
+        return len(self.text)
+
+    @property
+    def right(self):
+        return self.left + self.width
+
+    @property
+    def center_x(self):
+        return self.left + self.width / 2
+
+    def mean_confidence(self):
+        """Mean word confidence, or None without words"""
+        return float(self.conf.mean()) if len(self) else None
+
+def row_ids(words, tolerance=0.5):
+    """Table row of every word, from the words' vertical centers.
+
+    Tesseract often splits a table row into one block per column, so its
+    line numbers do not line rows up across columns. Words are sorted by
+    center y instead, and a new row starts wherever the next center is
+    more than tolerance median word heights below the previous one.
+    """
+    if not len(words):
+        return np.empty(0, dtype=np.int32)
+    center_y = words.top + words.height / 2
+    order = np.argsort(center_y, kind='stable')
+    breaks = np.diff(center_y[order]) > tolerance * np.median(words.height)
+    rows = np.empty(len(words), dtype=np.int32)
+    rows[order] = np.concatenate(([0], np.cumsum(breaks)))
+    return rows
+
+def column_edges(words, rows=None, min_gap=None, max_share=0.1):
+    """x positions separating table columns, from gaps between the words.
+
+    A column gap is a vertical strip at least min_gap pixels wide (default
+    1.5 median word heights) crossed by no more than max_share of the
+    rows (default row_ids(words)), so a title spanning the page does not
+    merge every column. The edge is the middle of the strip.
+    """
+    if not len(words):
+        return np.empty(0)
+    if rows is None:
+        rows = row_ids(words)
+    if min_gap is None:
+        min_gap = 1.5 * np.median(words.height)
+    start = int(words.left.min())
+    right = words.right
+    # Rows crossing each x: +1 where a word starts, -1 where it ends
+    coverage = np.zeros(int(right.max()) - start + 1, dtype=np.int32)
+    np.add.at(coverage, words.left - start, 1)
+    np.add.at(coverage, right - start, -1)
+    coverage = np.cumsum(coverage)
+
+    free = np.concatenate(([False], coverage <= max_share * (int(rows.max()) + 1), [False]))
+    changes = np.flatnonzero(np.diff(free.astype(np.int8)))
+    gap_starts, gap_ends = changes[::2], changes[1::2]
+    # Ignore the free strip after the last word
+    wide = ((gap_ends - gap_starts) >= min_gap) & (gap_ends < len(coverage))
+    return (gap_starts[wide] + gap_ends[wide]) / 2 + start
+
+def words_to_grid(words, edges=None):
+    """Lay words out as table rows (see row_ids), binned into columns by x.
+
+    Returns (grid, cells): grid is a list of rows of cell texts ('' for
+    empty cells) and cells lists (row, column, box, confidence) for every
+    filled cell, box being (left, top, width, height) and confidence that
+    of its least certain word.
+    """
+    if not len(words):
+        return [], []
+    rows = row_ids(words)
+    if edges is None:
+        edges = column_edges(words, rows)
+    column = np.searchsorted(edges, words.center_x)
+
+    order = np.lexsort((words.left, column, rows))
+    row, column = rows[order], column[order]
+    starts = np.flatnonzero(np.concatenate(([True], (np.diff(row) != 0) | (np.diff(column) != 0))))
+
+    conf = np.minimum.reduceat(words.conf[order], starts)
+    left = np.minimum.reduceat(words.left[order], starts)
+    top = np.minimum.reduceat(words.top[order], starts)
+    right = np.maximum.reduceat(words.right[order], starts)
+    bottom = np.maximum.reduceat(words.top[order] + words.height[order], starts)
+    texts = np.split(words.text[order], starts[1:])
+
+    grid = [[''] * (len(edges) + 1) for _ in range(int(row[-1]) + 1)]
+    cells = []
+    for i, (r, c) in enumerate(zip(row[starts].tolist(), column[starts].tolist())):
+        grid[r][c] = ' '.join(texts[i])
+        box = (int(left[i]), int(top[i]), int(right[i] - left[i]), int(bottom[i] - top[i]))
+        cells.append((r, c, box, float(conf[i])))
+    return grid, cells
+
+def reocr_low_confidence(image, grid, cells, backend, min_confidence, pad=4):
+    """Re-recognize cells below min_confidence on their own, as single lines.
+
+    Only those cells are OCR'd again, each cropped to its box plus pad
+    pixels, and the new text replaces the old one in grid when Tesseract
+    is more confident about it. Returns the number of cells replaced.
+    """
+    width, height = image.size
+    replaced = 0
+    for r, c, (left, top, box_width, box_height), conf in cells:
+        if conf >= min_confidence:
+            continue
+        x0, y0 = max(left - pad, 0), max(top - pad, 0)
+        x1, y1 = min(left + box_width + pad, width), min(top + box_height + pad, height)
+        text, new_conf = backend.ocr_with_confidence(image, (x0, y0, x1 - x0, y1 - y0),
+                                                     psm=PSM_SINGLE_LINE)
+        text = ' '.join(text.split())
+        if text and new_conf is not None and new_conf > conf:
+            grid[r][c] = text
+            replaced += 1
+    return replaced
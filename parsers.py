@@ -0,0 +1,143 @@
+import re
+
+# Compiled once; the parsers run over every OCR'd or text-layer line
+SEPARATOR_PATTERN = re.compile(r'^[\|+=_-]+$')
+COLUMN_SPLIT_PATTERN = re.compile(r'\s{2,}')
+AGE_HEADER_PATTERN = re.compile(r'\b(?:birth|\d+[wmdy])\b')
+DOSE_PATTERN = re.compile(r'[A-Z]{2,}\d*')
+
+# Columns of the NIP table, left to right
+NIP_FIELDS = ('Vaccine', 'When to give', 'Dose', 'Route', 'Site')
+
+# Words that mark a line as the IAP matrix header row (matched lowercased)
+IAP_HEADER_HINTS = ('birth', '6w', '10w')
+
+def iter_nip_rows(lines):
+    """Yield NIP schedule rows from table-like lines, one pass, lazily.
+
+    Columns are separated by runs of two or more spaces. A line with fewer
+    than four columns continues the previous row's wrapped vaccine name,
+    so each row is held back until the next one starts. lines can be any
+    iterable, e.g. a generator over many pages' OCR output.
+    """
+    pending = None
+    for line in lines:
+        # Skip headers and separators
+        if "Vaccine" in line or SEPARATOR_PATTERN.match(line):
+            continue
+
+        cols = COLUMN_SPLIT_PATTERN.split(line.strip())
+        if len(cols) >= 4:
+            if pending is not None:
+                yield pending
+            pending = {
+                'Vaccine': cols[0],
+                'When to give': cols[1],
+                'Dose': cols[2],
+                'Route': cols[3],
+                'Site': cols[4] if len(cols) > 4 else ''
+            }
+        elif pending is not None and pending['Vaccine']:
+            # Handle wrapped vaccine names
+            pending['Vaccine'] += " " + cols[0]
+    if pending is not None:
+        yield pending
+
+def iter_iap_doses(lines):
+    """Yield (vaccine, age_column, dose) for every dose in an IAP matrix.
+
+    The first line naming "Vaccine" and an early age (birth, 6w, 10w)
+    supplies the age columns. Each later line is scanned once: the text
+    before its first dose code is the vaccine, and its n-th dose code
+    belongs to the n-th age column.
+    """
+    age_headers = None
+    for line in lines:
+        if age_headers is None:
+            if "Vaccine" in line:
+                lowered = line.lower()
+                if any(hint in lowered for hint in IAP_HEADER_HINTS):
+                    age_headers = AGE_HEADER_PATTERN.findall(lowered)
+            continue
+
+        if SEPARATOR_PATTERN.match(line):
+            continue
+
+        vaccine = None
+        for i, dose in enumerate(DOSE_PATTERN.finditer(line)):
+            if vaccine is None:
+                vaccine = line[:dose.start()].strip()
+                if not vaccine:
+                    break
+            if i >= len(age_headers):
+                break
+            yield vaccine, age_headers[i], dose.group()
+
+def parse_nip_table(lines):
+    """Extract NIP vaccination schedule"""
+    return list(iter_nip_rows(lines))
+
+def parse_iap_matrix(lines):
+    """Extract IAP vaccination matrix"""
+    return [{'Vaccine': vaccine, 'Age': age, 'Dose': dose}
+            for vaccine, age, dose in iter_iap_doses(lines)]
+
+def grid_to_nip_schedule(grid):
+    """Turn a NIP table grid (rows of column-aligned cells) into NIP rows.
+
+    Like iter_nip_rows, a row with four or more filled cells starts an
+    entry. Other rows continue wrapped text, and since their cells are
+    aligned, each one is appended to the field of its own column.
+    """
+    schedule = []
+    for row in grid:
+        cells = [cell.strip() for cell in row[:len(NIP_FIELDS)]]
+        if any("Vaccine" in cell for cell in cells):
+            continue
+        if sum(1 for cell in cells if cell) >= 4:
+            cells += [''] * (len(NIP_FIELDS) - len(cells))
+            schedule.append(dict(zip(NIP_FIELDS, cells)))
+        elif schedule:
+            for field, cell in zip(NIP_FIELDS, cells):
+                if cell:
+                    entry = schedule[-1]
+                    entry[field] = f"{entry[field]} {cell}" if entry[field] else cell
+    return schedule
+
+def grid_to_iap_schedule(grid):
+    """Turn an IAP matrix grid into the rows parse_iap_matrix produces.
+
+    The first row with age headers (birth, 6w, 9m, ...) labels the columns;
+    the first column of each later row is the vaccine. Every dose code in a
+    cell becomes one entry under that cell's column header; cells with no
+    dose code (notes, OCR noise) add nothing, as in parse_iap_matrix.
+    """
+    schedule = []
+    age_headers = None
+    for row in grid:
+        if age_headers is None:
+            headers = [AGE_HEADER_PATTERN.findall(cell.lower()) for cell in row]
+            if sum(1 for found in headers if found) >= 2:
+                age_headers = [found[0] if found else '' for found in headers]
+            continue
+
+        vaccine = row[0].strip() if row else ''
+        if not vaccine:
+            continue
+        for cell, age in zip(row[1:], age_headers[1:]):
+            if not age or not cell:
+                continue
+            for dose in DOSE_PATTERN.findall(cell):
+                schedule.append({'Vaccine': vaccine, 'Age': age, 'Dose': dose})
+    return schedule
+
+PAGE_PARSERS = {
+    'nip': parse_nip_table,
+    'iap': parse_iap_matrix
+}
+
+# Parsers for pages read as cell grids (table_grid, ocr_words)
+GRID_PARSERS = {
+    'nip': grid_to_nip_schedule,
+    'iap': grid_to_iap_schedule
+}
@@ -0,0 +1,85 @@
+import csv
+import hashlib
+import io
+from datetime import datetime, timedelta, timezone
+
+CSV_FIELDS = ('child', 'vaccine', 'schedule_type', 'due_age', 'due_date', 'window_end', 'status')
+
+def _child_ids(projections, child_ids):
+    return list(child_ids) if child_ids is not None else [str(i + 1) for i in range(len(projections))]
+
+def projection_rows(projections, child_ids=None):
+    """Flat rows (dicts keyed by CSV_FIELDS) for one projection per child"""
+    for child, projection in zip(_child_ids(projections, child_ids), projections):
+        for dose in projection:
+            yield {
+                'child': child,
+                'vaccine': dose['vaccine'],
+                'schedule_type': dose['schedule_type'],
+                'due_age': dose['due_age'],
+                'due_date': dose['due_date'].isoformat(),
+                'window_end': dose['window_end'].isoformat() if dose['window_end'] else '',
+                'status': dose['status']
+            }
+
+def to_csv(projections, child_ids=None):
+    """CSV text with one row per dose per child"""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    writer.writerows(projection_rows(projections, child_ids))
+    return out.getvalue()
+
+def _ical_escape(text):
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+def _ical_fold(line):
+    """Split a content line into 75-octet pieces, as RFC 5545 requires"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    pieces = []
+    while data:
+        limit = 75 if not pieces else 74
+        cut = min(limit, len(data))
+        # Do not split a UTF-8 sequence
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    return '\r\n '.join(pieces)
+
+def _event_uid(row):
+    """A UID that stays the same for a dose however the projection changes,
+    so calendar clients update the event instead of adding a duplicate"""
+    key = '\0'.join((row['child'], row['schedule_type'], row['vaccine'], row['due_date']))
+    return f"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}@vaccine-recommender"
+
+def to_ical(projections, child_ids=None, calendar_name="Immunization schedule"):
+    """iCalendar text with an all-day event per dose, spanning its window.
+
+    Open-ended windows become single-day events on the due date.
+    """
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//vaccine-recommender//schedule//EN',
+             'CALSCALE:GREGORIAN', f'X-WR-CALNAME:{_ical_escape(calendar_name)}']
+    for row in projection_rows(projections, child_ids):
+        start = row['due_date'].replace('-', '')
+        last_day = row['window_end'] or row['due_date']
+        # DTEND is exclusive for all-day events
+        end = (datetime.strptime(last_day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y%m%d')
+        summary = f"{row['vaccine']} ({row['schedule_type']}, {row['due_age']})"
+        description = f"Child {row['child']}: {row['status']}"
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:{_event_uid(row)}',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;VALUE=DATE:{start}',
+            f'DTEND;VALUE=DATE:{end}',
+            f'SUMMARY:{_ical_escape(summary)}',
+            f'DESCRIPTION:{_ical_escape(description)}',
+            'END:VEVENT'
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_ical_fold(line) for line in lines) + '\r\n'
@@ -0,0 +1,93 @@
+import os
+import threading
+
+from vaccine_recommender import VaccineRecommender
+
+class ScheduleReloader:
+    """Holds the live VaccineRecommender and rebuilds it when the JSON changes.
+
+    A daemon thread polls the schedule files' mtime and size. On a change it
+    builds a fresh recommender (compiling its indexes) off the request path
+    and swaps it in with a single attribute assignment, so requests never
+    wait on a reload. Each swap bumps ``generation`` and notifies listeners
+    so derived caches can be dropped.
+    """
+
+    def __init__(self, nip_file, iap_file, interval=5.0):
+        self.nip_file = nip_file
+        self.iap_file = iap_file
+        self.interval = interval
+        self.generation = 0
+        self.recommender = VaccineRecommender(nip_file, iap_file)
+        self._signature = self._file_signature()
+        self._failed_signature = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _file_signature(self):
+        signature = []
+        for path in (self.nip_file, self.iap_file):
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def add_listener(self, callback):
+        """Call callback(generation) after every successful reload"""
+        self._listeners.append(callback)
+
+    def reload_if_changed(self):
+        """Rebuild the recommender if either schedule file changed"""
+        with self._lock:
+            try:
+                signature = self._file_signature()
+            except OSError as e:
+                print(f"Schedule reload check failed: {str(e)}")
+                return False
+            if signature in (self._signature, self._failed_signature):
+                return False
+
+            try:
+                recommender = VaccineRecommender(self.nip_file, self.iap_file)
+            except Exception as e:
+                # Most likely a half-written file; keep serving the old
+                # schedule and retry once the files change again
+                print(f"Schedule reload failed: {str(e)}")
+                self._failed_signature = signature
+                return False
+
+            self.recommender = recommender
+            self.generation += 1
+            self._signature = signature
+
+        for callback in self._listeners:
+            callback(self.generation)
+        print(f"Reloaded schedules (generation {self.generation})")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.reload_if_changed()
+
+    def ensure_started(self):
+        """Start the polling thread in this process if it isn't running.
+
+        Threads do not survive fork, so forked workers start their own on
+        first use.
+        """
+        if self.interval <= 0:
+            return
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="schedule-reloader", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
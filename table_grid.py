@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Candidate rows processed per step in the line detection
+CHUNK = 512
+
+def _long_runs(ink, length):
+    """Morphological opening of each row with a 1 x length line.
+
+    Keeps only pixels that belong to horizontal runs of at least length
+    ink pixels: erosion finds where such a run starts, dilation spreads it
+    back over the run.
+    """
+    height, width = ink.shape
+    opened = np.zeros_like(ink)
+    if length > width:
+        return opened
+    # Only rows with at least length ink pixels can hold such a run
+    candidates = np.flatnonzero(ink.sum(axis=1) >= length)
+    if not len(candidates):
+        return opened
+
+    n_starts = width - length + 1
+    columns = np.arange(width)
+    # Window starts that can cover pixel j: max(j - length + 1, 0) .. min(j, n_starts - 1)
+    first = np.maximum(columns - length + 1, 0)
+    last = np.minimum(columns, n_starts - 1) + 1
+    for i in range(0, len(candidates), CHUNK):
+        chunk = candidates[i:i + CHUNK]
+        rows = ink[chunk]
+        counts = np.zeros((rows.shape[0], width + 1), dtype=np.int32)
+        np.cumsum(rows, axis=1, out=counts[:, 1:])
+        # Erosion: windows [i, i + length) made entirely of ink
+        starts = (counts[:, length:] - counts[:, :n_starts]) == length
+        # Dilation: keep a pixel if any full window covers it
+        started = np.zeros((rows.shape[0], n_starts + 1), dtype=np.int32)
+        np.cumsum(starts, axis=1, out=started[:, 1:])
+        opened[chunk] = (started[:, last] - started[:, first]) > 0
+    return opened
+
+def _line_positions(profile, min_pixels, merge=3, max_thickness=12):
+    """Centers of runs of rows/columns whose line-pixel count reaches min_pixels.
+
+    Runs thicker than max_thickness are solid blocks (shading, bold bars),
+    not ruling lines, and are ignored.
+    """
+    hits = np.flatnonzero(profile >= min_pixels)
+    if not len(hits):
+        return []
+    breaks = np.flatnonzero(np.diff(hits) > merge)
+    starts = np.concatenate(([hits[0]], hits[breaks + 1]))
+    ends = np.concatenate((hits[breaks], [hits[-1]]))
+    return [int(start + end) // 2 for start, end in zip(starts, ends)
+            if end - start < max_thickness]
+
+def detect_grid(binary, min_line_fraction=0.1):
+    """Find a table's ruling lines in a preprocessed 0/255 page.
+
+    Returns (row_lines, column_lines) as sorted pixel positions. A line must
+    span at least min_line_fraction of the page's width (or height).
+    """
+    ink = np.asarray(binary) == 0
+    height, width = ink.shape
+
+    horizontal = _long_runs(ink, max(int(width * min_line_fraction), 1))
+    vertical = _long_runs(np.ascontiguousarray(ink.T), max(int(height * min_line_fraction), 1))
+
+    rows = _line_positions(horizontal.sum(axis=1), max(int(width * min_line_fraction), 1))
+    columns = _line_positions(vertical.sum(axis=1), max(int(height * min_line_fraction), 1))
+    return rows, columns
+
+def cell_boxes(binary, rows, columns, inset=4, min_ink=10):
+    """(row, column, box) for every non-empty cell between the ruling lines.
+
+    Boxes are (left, top, width, height), inset so the ruling lines are not
+    part of the cell. Cells with fewer than min_ink black pixels are blank
+    and skipped, so they never reach OCR.
+    """
+    ink = np.asarray(binary) == 0
+    cells = []
+    for r, (top, bottom) in enumerate(zip(rows, rows[1:])):
+        for c, (left, right) in enumerate(zip(columns, columns[1:])):
+            top_in, bottom_in = top + inset, bottom - inset
+            left_in, right_in = left + inset, right - inset
+            if bottom_in <= top_in or right_in <= left_in:
+                continue
+            if ink[top_in:bottom_in, left_in:right_in].sum() < min_ink:
+                continue
+            cells.append((r, c, (left_in, top_in, right_in - left_in, bottom_in - top_in)))
+    return cells
+
+def ocr_cells(image, cells, backend, workers=4, pool=None):
+    """OCR cells independently on a thread pool; returns {(row, col): text}
+
+    Pass a long-lived pool to keep the threads, and with them tesserocr's
+    per-thread engines, from page to page. Without one a pool is started
+    for this call.
+    """
+    if not cells:
+        return {}
+    workers = max(1, min(workers, len(cells)))
+    chunks = [cells[i::workers] for i in range(workers)]
+
+    def run(chunk):
+        texts = backend.ocr_regions(image, [box for _, _, box in chunk])
+        return [((r, c), ' '.join(text.split())) for (r, c, _), text in zip(chunk, texts)]
+
+    if workers == 1:
+        return dict(run(chunks[0]))
+    if pool is not None:
+        return dict(item for result in pool.map(run, chunks) for item in result)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(item for result in pool.map(run, chunks) for item in result)
+
+def build_grid(texts, n_rows, n_columns):
+    """Lay cell texts out as a list of rows ('' for skipped cells)"""
+    grid = [[''] * n_columns for _ in range(n_rows)]
+    for (r, c), text in texts.items():
+        grid[r][c] = text
+    return grid
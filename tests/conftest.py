@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# app.py resolves data/ and templates/ relative to the working directory
+os.chdir(ROOT)
+# No reload thread, and extraction jobs stay out of the checkout
+os.environ.setdefault('SCHEDULE_RELOAD_INTERVAL', '0')
+os.environ.setdefault('EXTRACTION_JOBS_DIR', tempfile.mkdtemp(prefix='extraction-jobs-'))
+
+@pytest.fixture(scope='session')
+def recommender():
+    from vaccine_recommender import VaccineRecommender
+    return VaccineRecommender('data/nip_schedule.json', 'data/iap_schedule.json')
+
+@pytest.fixture(scope='session')
+def scaled_schedules(tmp_path_factory):
+    """(nip_path, iap_path) of the schedules scaled up with random due ages"""
+    import benchmark
+    return benchmark.generate_schedules(str(tmp_path_factory.mktemp('schedules')), scale=5)
+
+@pytest.fixture(scope='session')
+def webapp():
+    import app
+    yield app
+    app.extraction_jobs.stop()
+
+@pytest.fixture
+def client(webapp):
+    webapp.recommendation_cache.clear()
+    return webapp.app.test_client()
@@ -0,0 +1,106 @@
+import io
+import random
+import re
+from collections import defaultdict
+
+import pandas as pd
+import pytest
+
+from Cleaning import VACCINE_MAP, clean_nip_dataframe, clean_nip_schedule
+
+
+def reference_clean(df):
+    """The row-by-row clean_nip_schedule that clean_nip_dataframe replaced"""
+    current_vaccine = None
+    vaccine_entries = defaultdict(dict)
+    for _, row in df.iterrows():
+        vaccine_found = None
+        for col in df.columns:
+            cell_value = str(row[col])
+            for vaccine, patterns in VACCINE_MAP.items():
+                if any(re.search(p, cell_value, re.IGNORECASE) for p in patterns):
+                    vaccine_found = vaccine
+                    break
+            if vaccine_found:
+                break
+        if vaccine_found:
+            current_vaccine = vaccine_found
+            vaccine_entries[current_vaccine] = {
+                'Vaccine': current_vaccine, 'When to give': '', 'Dose': '', 'Route': '', 'Site': ''
+            }
+        if current_vaccine:
+            for col in df.columns:
+                clean_val = re.sub(r'[^a-zA-Z0-9\s\-/()]', '', str(row[col])).strip()
+                if not clean_val:
+                    continue
+                if col in ('When to give', 'Dose', 'Route', 'Site'):
+                    vaccine_entries[current_vaccine][col] += ' ' + clean_val
+                elif col == 'Vaccine' and not vaccine_found:
+                    vaccine_entries[current_vaccine]['Vaccine'] += ' ' + clean_val
+
+    clean_data = []
+    for entry in vaccine_entries.values():
+        if 'dose' in entry['Dose'].lower():
+            entry['Dose'] = re.sub(r'(?i)dose\s*', '', entry['Dose'])
+        age_matches = re.findall(
+            r'(\d+\s*(?:days?|weeks?|months?|years?)|at\s*birth|first\s*\d+\s*days?)',
+            entry['When to give'], re.IGNORECASE)
+        if age_matches:
+            entry['When to give'] = ', '.join(sorted(set(age_matches)))
+        for field in ['Dose', 'Route', 'Site']:
+            entry[field] = re.sub(r'\s+', ' ', entry[field]).strip()
+            entry[field] = re.sub(r'(?i)left\b', 'Left', entry[field])
+            entry[field] = re.sub(r'(?i)right\b', 'Right', entry[field])
+        clean_data.append(entry)
+    return pd.DataFrame(clean_data)
+
+TOKENS = ['Hepatitis B', 'hep b', 'Pentavalent', 'Tetanus', 'Hib', 'IPV', 'polio', 'PCV',
+          'Pneumococcal', 'Td', 'std', 'Measles', 'rubella', 'JE', 'Japanese Encephalitis',
+          'At birth', '6 weeks', '10 Weeks', 'first 15 days', '0.5 ml', 'dose', 'Dose 2', 'left',
+          'right', 'cleft', 'thigh', 'arm', 'Oral', 'IM', '!!', '@#', 'x', '12 months', '5 years',
+          '3', '4.5']
+COLUMN_SETS = [
+    ['Vaccine', 'When to give', 'Dose', 'Route', 'Site'],
+    ['Vaccine', 'When to give', 'Dose', 'Route', 'Site', 'Source', 'Page'],
+    ['Vaccine', 'Dose'],
+    ['A', 'Vaccine', 'Site', 'When to give'],
+    ['X', 'Y'],
+]
+
+def ocr_csv(rng):
+    """CSV text shaped like noisy OCR output of the NIP table"""
+    columns = rng.choice(COLUMN_SETS)
+    rows = [[' '.join(rng.choice(TOKENS) for _ in range(rng.randint(1, 3)))
+             if rng.random() > 0.15 else '' for _ in columns]
+            for _ in range(rng.randint(0, 25))]
+    out = io.StringIO()
+    pd.DataFrame(rows, columns=columns).to_csv(out, index=False)
+    return out.getvalue()
+
+@pytest.mark.parametrize('seed', range(3))
+def test_matches_row_by_row_cleaning(seed):
+    rng = random.Random(seed)
+    for _ in range(60):
+        text = ocr_csv(rng)
+        df = pd.read_csv(io.StringIO(text), header=0, on_bad_lines='skip')
+        expected = reference_clean(df)
+        result = clean_nip_schedule(io.StringIO(text))
+        assert list(result.columns) == list(expected.columns), text
+        assert result.values.tolist() == expected.values.tolist(), text
+
+def test_repeated_vaccine_keeps_first_position_and_last_block():
+    df = pd.DataFrame({
+        'Vaccine': ['Hepatitis B', 'booster', 'Measles', 'Hep B', 'again'],
+        'When to give': ['At birth', '', '9 months', '6 weeks', ''],
+        'Dose': ['0.5 ml dose', '', '0.5 ml', '1 dose', ''],
+        'Route': ['IM', '', 'SC', 'IM', ''],
+        'Site': ['left thigh', '', 'right arm', 'LEFT thigh', ''],
+    })
+    result = clean_nip_dataframe(df)
+    assert result.to_dict('records') == [
+        {'Vaccine': 'Hepatitis B again', 'When to give': '6 weeks', 'Dose': '1',
+         'Route': 'IM', 'Site': 'Left thigh'},
+        {'Vaccine': 'Measles', 'When to give': '9 months', 'Dose': '05 ml',
+         'Route': 'SC', 'Site': 'Right arm'},
+    ]
+    assert result.values.tolist() == reference_clean(df).values.tolist()
@@ -0,0 +1,222 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import main
+from extraction_jobs import FINISHED_STATES, ExtractionQueue
+
+class ThreadQueue(ExtractionQueue):
+    """Runs pages on threads, so the tests can swap in process_page"""
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers)
+        return self._pool
+
+def wait_for(check, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def fake_result(page, parser_name):
+    return {'page': page, 'parser': parser_name, 'method': 'text', 'data': [{'Vaccine': f'V{page}'}],
+            'seconds': 0.0, 'error': None}
+
+@pytest.fixture
+def release():
+    """Pages block in process_page until this is set"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+@pytest.fixture
+def pages(monkeypatch, release):
+    """The (page, parser) calls process_page got; pages of parser 'bad' raise"""
+    calls = []
+    def process_page(pdf_path, page, parser_name='nip', **options):
+        calls.append((page, parser_name))
+        assert release.wait(10)
+        if parser_name == 'bad':
+            raise RuntimeError("unreadable page")
+        return fake_result(page, parser_name)
+    monkeypatch.setattr(main, 'process_page', process_page)
+    monkeypatch.setattr(main, 'record_page_metrics', lambda result: None)
+    return calls
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+    def make(**kwargs):
+        kwargs.setdefault('poll_interval', 0.02)
+        queues.append(ThreadQueue(str(tmp_path / str(len(queues))), **kwargs))
+        return queues[-1]
+    yield make
+    for queue in queues:
+        queue.stop()
+
+def state(queue, job_id):
+    return queue.status(job_id)['status']
+
+def test_job_goes_from_queued_to_done(make_queue, pages, release):
+    queue = make_queue(workers=2)
+    job_id = queue.submit(b'%PDF-', [(1, 'nip'), (0, 'nip'), (1, 'nip')], filename='a.pdf')
+    wait_for(lambda: len(pages) == 2)
+    status = queue.status(job_id)
+    assert (status['status'], status['pages_total'], status['pages_done']) == ('running', 2, 0)
+    assert status['filename'] == 'a.pdf'
+
+    release.set()
+    wait_for(lambda: state(queue, job_id) in FINISHED_STATES)
+    status = queue.status(job_id)
+    assert (status['status'], status['pages_done'], status['error']) == ('done', 2, None)
+    assert [(page['page'], page['status'], page['rows']) for page in status['pages']] == \
+        [(1, 'done', 1), (2, 'done', 1)]
+    assert queue.results(job_id) == {'nip': [{'Vaccine': 'V0', 'Page': 1}, {'Vaccine': 'V1', 'Page': 2}]}
+
+def test_failed_pages(make_queue, pages, release):
+    queue = make_queue(workers=2)
+    release.set()
+    partial = queue.submit(b'%PDF-', [(0, 'nip'), (1, 'bad')])
+    failed = queue.submit(b'%PDF-', [(0, 'bad')])
+    wait_for(lambda: all(state(queue, job_id) in FINISHED_STATES for job_id in (partial, failed)))
+
+    status = queue.status(partial)
+    assert status['status'] == 'done'
+    assert [(page['status'], page['error']) for page in status['pages']] == \
+        [('done', None), ('failed', 'unreadable page')]
+    assert queue.results(partial) == {'nip': [{'Vaccine': 'V0', 'Page': 1}]}
+    status = queue.status(failed)
+    assert (status['status'], status['error']) == ('failed', 'No page could be extracted')
+
+def test_jobs_run_side_by_side(make_queue, monkeypatch):
+    # Every page waits for three others, so this only finishes if pages of
+    # different jobs are on the pool at the same time
+    barrier = threading.Barrier(4, timeout=10)
+    def process_page(pdf_path, page, parser_name='nip', **options):
+        barrier.wait()
+        return fake_result(page, parser_name)
+    monkeypatch.setattr(main, 'process_page', process_page)
+    monkeypatch.setattr(main, 'record_page_metrics', lambda result: None)
+
+    queue = make_queue(workers=4)
+    job_ids = [queue.submit(b'%PDF-', [(0, 'nip'), (1, 'nip')]) for _ in range(2)]
+    wait_for(lambda: all(state(queue, job_id) in FINISHED_STATES for job_id in job_ids))
+    assert [state(queue, job_id) for job_id in job_ids] == ['done', 'done']
+
+def test_jobs_wait_for_a_free_worker(make_queue, pages, release):
+    queue = make_queue(workers=1)
+    first, second, third = [queue.submit(b'%PDF-', [(0, 'nip')]) for _ in range(3)]
+    wait_for(lambda: state(queue, first) == 'running')
+    assert [queue.status(job_id)['queue_position'] for job_id in (second, third)] == [0, 1]
+    assert queue.counts() == {'running': 1, 'queued': 2}
+
+    release.set()
+    wait_for(lambda: state(queue, third) == 'done')
+    assert queue.counts() == {'done': 3}
+
+def test_options_are_passed_to_process_page(make_queue, monkeypatch):
+    seen = []
+    def process_page(pdf_path, page, parser_name='nip', **options):
+        seen.append(options)
+        return fake_result(page, parser_name)
+    monkeypatch.setattr(main, 'process_page', process_page)
+    monkeypatch.setattr(main, 'record_page_metrics', lambda result: None)
+
+    queue = make_queue(workers=1)
+    job_id = queue.submit(b'%PDF-', [(0, 'nip')], force_ocr=True)
+    wait_for(lambda: state(queue, job_id) == 'done')
+    assert seen[0]['force_ocr'] is True
+    assert queue.status(job_id)['options'] == {'force_ocr': True}
+
+def test_submit_rejects_bad_jobs(make_queue):
+    queue = make_queue(workers=1)
+    with pytest.raises(ValueError, match='Unknown job options: bogus'):
+        queue.submit(b'%PDF-', [(0, 'nip')], bogus=True)
+    with pytest.raises(ValueError, match='No pages'):
+        queue.submit(b'%PDF-', [])
+    assert queue.counts() == {}
+
+def test_sweep_deletes_expired_jobs(make_queue, pages, release):
+    queue = make_queue(workers=1, retention=60)
+    release.set()
+    old, recent = [queue.submit(b'%PDF-', [(0, 'nip')]) for _ in range(2)]
+    wait_for(lambda: all(state(queue, job_id) == 'done' for job_id in (old, recent)))
+    with queue._db() as db:
+        db.execute('UPDATE jobs SET finished = finished - 120 WHERE id = ?', (old,))
+
+    queue._last_sweep = 0
+    queue._sweep()
+    assert queue.status(old) is None
+    assert queue.results(old) == {}
+    assert state(queue, recent) == 'done'
+    with queue._db() as db:
+        assert db.execute('SELECT COUNT(*) FROM pages').fetchone()[0] == 1
+
+def test_no_sweep_without_retention(make_queue, pages, release):
+    queue = make_queue(workers=1, retention=None)
+    release.set()
+    job_id = queue.submit(b'%PDF-', [(0, 'nip')])
+    wait_for(lambda: state(queue, job_id) == 'done')
+    with queue._db() as db:
+        db.execute('UPDATE jobs SET finished = 0')
+    queue._last_sweep = 0
+    queue._sweep()
+    assert state(queue, job_id) == 'done'
+
+@pytest.fixture(scope='module')
+def sample_pdf(tmp_path_factory):
+    import benchmark
+    path = tmp_path_factory.mktemp('pdf') / 'sample.pdf'
+    benchmark.make_sample_pdf(str(path), pages=2, rows=30)
+    return path.read_bytes()
+
+def test_api_extraction(client, sample_pdf):
+    response = client.post('/api/extractions', query_string={'pages': '1:nip,2:nip'},
+                           data=sample_pdf, content_type='application/pdf')
+    assert response.status_code == 202
+    job = response.get_json()
+    assert response.headers['Location'] == job['status_url']
+
+    wait_for(lambda: client.get(job['status_url']).get_json()['status'] in FINISHED_STATES, timeout=120)
+    status = client.get(job['status_url']).get_json()
+    assert (status['status'], status['pages_done']) == ('done', 2)
+
+    results = client.get(job['results_url']).get_json()['results']['nip']
+    assert len(results) == 60
+    assert [row['Page'] for row in results] == [1] * 30 + [2] * 30
+
+    events = client.get(job['events_url']).get_data(as_text=True)
+    assert events.startswith('retry: 1000\n\n')
+    assert events.count('event: progress') == 1
+    assert '"status": "done"' in events
+
+def test_api_multipart_upload(client, sample_pdf):
+    import io
+    response = client.post('/api/extractions', data={
+        'pdf': (io.BytesIO(sample_pdf), 'schedule.pdf'), 'pages': '1:nip'})
+    assert response.status_code == 202
+    status = client.get(response.get_json()['status_url']).get_json()
+    assert (status['filename'], status['pages_total']) == ('schedule.pdf', 1)
+
+@pytest.mark.parametrize('query, body, message', [
+    ({}, b'plain text', 'Not a PDF file'),
+    ({'pages': '1:bogus'}, b'%PDF-1.4', "Unknown parser 'bogus' (expected one of nip, iap)"),
+])
+def test_api_rejects_bad_uploads(client, query, body, message):
+    response = client.post('/api/extractions', query_string=query, data=body,
+                           content_type='application/pdf')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == message
+
+def test_api_rejects_large_uploads(client, webapp, monkeypatch):
+    monkeypatch.setattr(webapp, 'MAX_UPLOAD_BYTES', 1024)
+    response = client.post('/api/extractions', data=b'%PDF-' + b'0' * 2048,
+                           content_type='application/pdf')
+    assert response.status_code == 413
+
+@pytest.mark.parametrize('suffix', ['', '/events', '/results'])
+def test_api_unknown_job(client, suffix):
+    assert client.get(f'/api/extractions/no-such-job{suffix}').status_code == 404
@@ -0,0 +1,24 @@
+from lru_cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert len(cache) == 2
+
+def test_counts_hits_and_misses():
+    cache = LRUCache(maxsize=4)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('a')
+    cache.get('missing')
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+    assert stats["hit_ratio"] == 2 / 3
+    cache.clear()
+    assert cache.get('a') is None
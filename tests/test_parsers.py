@@ -0,0 +1,143 @@
+import random
+import re
+
+import pytest
+
+from parsers import (grid_to_iap_schedule, grid_to_nip_schedule, iter_nip_rows,
+                     parse_iap_matrix, parse_nip_table)
+
+# The page parsers as they were inlined in main.py, kept as the reference
+def reference_nip_table(lines):
+    schedule = []
+    current_vaccine = ""
+    for line in lines:
+        if "Vaccine" in line or re.match(r'^[\|+=_-]+$', line):
+            continue
+        cols = re.split(r'\s{2,}', line.strip())
+        if len(cols) >= 4:
+            current_vaccine = cols[0]
+            schedule.append({
+                'Vaccine': current_vaccine,
+                'When to give': cols[1],
+                'Dose': cols[2],
+                'Route': cols[3],
+                'Site': cols[4] if len(cols) > 4 else ''
+            })
+        elif cols and current_vaccine:
+            schedule[-1]['Vaccine'] += " " + cols[0]
+    return schedule
+
+def reference_iap_matrix(lines):
+    schedule = []
+    age_headers = []
+    in_table = False
+    for line in lines:
+        if not in_table and "Vaccine" in line and any(x in line.lower() for x in ['birth', '6w', '10w']):
+            in_table = True
+            age_headers = re.findall(r'\b(?:birth|\d+[wmdy])\b', line.lower())
+            continue
+        if in_table:
+            if re.match(r'^[\|+=_-]+$', line):
+                continue
+            vaccine = re.split(r'[A-Z]{2,}\d*', line)[0].strip()
+            if not vaccine:
+                continue
+            for i, dose in enumerate(re.finditer(r'([A-Z]{2,}\d*)', line)):
+                if i < len(age_headers):
+                    schedule.append({'Vaccine': vaccine, 'Age': age_headers[i], 'Dose': dose.group()})
+    return schedule
+
+NIP_LINES = [
+    "Vaccine          When to give       Dose      Route           Site",
+    "-------------------------------------------------------------------",
+    "BCG              At birth           0.1 ml    Intra-dermal    Left upper arm",
+    "Hepatitis B      At birth           0.5 ml    Intra-muscular  Antero-lateral thigh",
+    "OPV-0            At birth           2 drops   Oral",
+    "Pentavalent      6, 10 and 14       0.5 ml    Intra-muscular  Antero-lateral",
+    "(DPT+HepB+Hib)",
+    "   weeks",
+    "",
+    "Td               10 years           0.5 ml    Intra-muscular  Upper arm",
+]
+
+IAP_LINES = [
+    "IAP immunization schedule",
+    "Vaccine     Birth  6w   10w   14w   6m   9m   12m  15m  18m  5y",
+    "=================================================================",
+    "BCG         BCG1",
+    "Hepatitis B HB1    HB2              HB3",
+    "Polio       OPV0   IPV1 IPV2  IPV3",
+    "DTwP/DTaP          DTP1 DTP2  DTP3                      DTP4 DTP5",
+    "   note: catch-up allowed",
+    "MMR                                     MMR1      MMR2           MMR3",
+    "Influenza                         IIV1 IIV2 IIV3 IIV4 IIV5 IIV6 IIV7 IIV8",
+    "HPV",
+]
+
+NIP_TOKENS = ['BCG', 'Hepatitis B', 'Vaccine', 'At birth', '6 weeks', '0.5 ml', 'Oral',
+              'Intra-muscular', 'Left arm', '---', '|', '', '(contd)', 'x']
+IAP_TOKENS = ['Hep B', 'Polio', 'Vaccine', 'birth', '6w', '10w', '9m', '5y', 'HB1', 'OPV0',
+              'IPV2', 'MMR', 'note', '===', '+-+', '', 'a', 'Z9']
+
+def random_lines(rng, tokens, count):
+    lines = []
+    for _ in range(count):
+        words = [rng.choice(tokens) for _ in range(rng.randint(0, 6))]
+        lines.append(''.join(word + ' ' * rng.randint(1, 3) for word in words).rstrip(' ' * rng.randint(0, 1)))
+    return lines
+
+def test_nip_table_matches_reference():
+    assert parse_nip_table(NIP_LINES) == reference_nip_table(NIP_LINES)
+    assert parse_nip_table(NIP_LINES)[3]['Vaccine'] == "Pentavalent (DPT+HepB+Hib) weeks "
+
+def test_iap_matrix_matches_reference():
+    assert parse_iap_matrix(IAP_LINES) == reference_iap_matrix(IAP_LINES)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_lines_match_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        lines = random_lines(rng, NIP_TOKENS, rng.randint(0, 12))
+        assert parse_nip_table(lines) == reference_nip_table(lines)
+        lines = random_lines(rng, IAP_TOKENS, rng.randint(0, 12))
+        assert parse_iap_matrix(lines) == reference_iap_matrix(lines)
+
+def test_nip_rows_stream_from_a_generator():
+    consumed = []
+    def lines():
+        for line in NIP_LINES:
+            consumed.append(line)
+            yield line
+    rows = iter_nip_rows(lines())
+    assert next(rows)['Vaccine'] == 'BCG'
+    # The first row is released as soon as the next one starts
+    assert len(consumed) == 4
+    assert [row['Vaccine'] for row in rows][-1] == 'Td'
+
+def test_nip_grid_appends_wrapped_cells_to_their_column():
+    grid = [
+        ['Vaccine', 'When to give', 'Dose', 'Route', 'Site'],
+        ['Pentavalent', '6, 10 and 14', '0.5 ml', 'Intra-muscular', 'Antero-lateral'],
+        ['(DPT+HepB+Hib)', 'weeks', '', '', 'mid-thigh'],
+        ['OPV', 'At birth', '2 drops', 'Oral'],
+    ]
+    assert grid_to_nip_schedule(grid) == [
+        {'Vaccine': 'Pentavalent (DPT+HepB+Hib)', 'When to give': '6, 10 and 14 weeks',
+         'Dose': '0.5 ml', 'Route': 'Intra-muscular', 'Site': 'Antero-lateral mid-thigh'},
+        {'Vaccine': 'OPV', 'When to give': 'At birth', 'Dose': '2 drops', 'Route': 'Oral', 'Site': ''},
+    ]
+
+def test_iap_grid_keeps_only_dose_codes():
+    grid = [
+        ['Vaccine', 'Birth', '6w', '10w', 'Notes'],
+        ['Hepatitis B', 'HB1', 'HB2', '', 'catch-up'],
+        ['Polio', 'OPV0', 'IPV1 OPV1', 'see note', 'IPV2'],
+        ['', 'HB9', '', '', ''],
+    ]
+    assert grid_to_iap_schedule(grid) == [
+        {'Vaccine': 'Hepatitis B', 'Age': 'birth', 'Dose': 'HB1'},
+        {'Vaccine': 'Hepatitis B', 'Age': '6w', 'Dose': 'HB2'},
+        {'Vaccine': 'Polio', 'Age': 'birth', 'Dose': 'OPV0'},
+        {'Vaccine': 'Polio', 'Age': '6w', 'Dose': 'IPV1'},
+        {'Vaccine': 'Polio', 'Age': '6w', 'Dose': 'OPV1'},
+    ]
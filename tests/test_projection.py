@@ -0,0 +1,125 @@
+import csv
+import io
+from datetime import date, timedelta
+
+import pytest
+
+from schedule_export import CSV_FIELDS, to_csv, to_ical
+from vaccine_recommender import MAX_HORIZON_DAYS
+
+DOB = date(2024, 1, 15)
+AS_OF = date(2024, 6, 1)
+
+def expected_doses(recommender, horizon_days, include_iap=True):
+    """(due_day, vaccine, due_age) of every dose within horizon, from the indexes"""
+    doses = []
+    indexes = [recommender.nip_index] + ([recommender.iap_index] if include_iap else [])
+    for index in indexes:
+        for start, end, _, record in index.intervals:
+            if start == float('inf'):
+                continue
+            repeat = [start]
+            if record.get("is_annual"):
+                repeat = range(int(start), horizon_days + 1, 365)
+            doses += [(due, record.vaccine, record.due_age) for due in repeat if due <= horizon_days]
+    return sorted(doses)
+
+@pytest.mark.parametrize('horizon_days', [1, 365, 6 * 365, 18 * 365])
+@pytest.mark.parametrize('include_iap', [True, False])
+def test_projection_lists_every_dose_in_due_order(recommender, horizon_days, include_iap):
+    projection = recommender.project_schedule(DOB, horizon_days, as_of=AS_OF, include_iap=include_iap)
+    due_dates = [dose["due_date"] for dose in projection]
+    assert due_dates == sorted(due_dates)
+    found = sorted(((dose["due_date"] - DOB).days, dose["vaccine"], dose["due_age"])
+                   for dose in projection)
+    assert found == expected_doses(recommender, horizon_days, include_iap)
+
+def test_projection_agrees_with_age_lookups(recommender):
+    for dose in recommender.project_schedule(DOB, 6 * 365, as_of=AS_OF):
+        age = (dose["due_date"] - DOB).days
+        lookup = recommender.get_nip_recommendations if dose["schedule_type"] == "NIP" \
+            else recommender.get_iap_recommendations
+        assert dose["record"] in lookup(age)
+
+def test_status_follows_the_window(recommender):
+    for dose in recommender.project_schedule(DOB, 2 * 365, as_of=AS_OF):
+        if dose["window_end"] is not None and dose["window_end"] < AS_OF:
+            assert dose["status"] == "overdue"
+        elif dose["due_date"] <= AS_OF:
+            assert dose["status"] == "due"
+        else:
+            assert dose["status"] == "upcoming"
+
+def test_batch_projection_matches_single(recommender):
+    dobs = [DOB, date(2020, 2, 29), date(2025, 12, 31)]
+    batch = recommender.project_schedules(dobs, 10 * 365, as_of=AS_OF)
+    for dob, projection in zip(dobs, batch):
+        assert projection == recommender.project_schedule(dob, 10 * 365, as_of=AS_OF)
+    assert recommender.project_schedules([], as_of=AS_OF) == []
+
+@pytest.mark.parametrize('horizon', [0, -1, MAX_HORIZON_DAYS + 1, timedelta(days=-5)])
+def test_rejects_horizons_out_of_range(recommender, horizon):
+    with pytest.raises(ValueError):
+        recommender.project_schedule(DOB, horizon)
+    with pytest.raises(ValueError):
+        recommender.project_schedules([DOB], horizon)
+
+@pytest.mark.parametrize('horizon_days', ['0', '-3', '100000000', 'soon'])
+def test_api_rejects_horizons_out_of_range(client, horizon_days):
+    response = client.get('/api/schedule/projection',
+                          query_string={'dob': '2024-01-15', 'horizon_days': horizon_days})
+    assert response.status_code == 400
+    response = client.post('/api/schedule/projection/batch',
+                           query_string={'horizon_days': horizon_days}, json=['2024-01-15'])
+    assert response.status_code == 400
+
+def test_api_projection(client):
+    body = client.get('/api/schedule/projection', query_string={
+        'dob': '2024-01-15', 'as_of': '2024-06-01', 'horizon_days': '365'}).get_json()
+    child = body["children"][0]
+    assert (body["count"], child["date_of_birth"]) == (1, '2024-01-15')
+    first = child["doses"][0]
+    assert set(first) == {"vaccine", "schedule_type", "due_age", "due_date", "window_end", "status"}
+    assert (first["due_date"], first["schedule_type"]) == ('2024-01-15', 'NIP')
+    assert {dose["status"] for dose in child["doses"]} <= {"overdue", "due", "upcoming"}
+
+    batch = client.post('/api/schedule/projection/batch', query_string={
+        'as_of': '2024-06-01', 'horizon_days': '365'},
+        json={'dates_of_birth': ['2024-01-15'], 'ids': ['a']}).get_json()
+    assert batch["children"][0]["child"] == 'a'
+    assert batch["children"][0]["doses"] == child["doses"]
+
+def test_csv_export(recommender):
+    projection = recommender.project_schedule(DOB, 365, as_of=AS_OF)
+    rows = list(csv.DictReader(io.StringIO(to_csv([projection], ['a']))))
+    assert len(rows) == len(projection)
+    assert list(rows[0]) == list(CSV_FIELDS)
+    assert rows[0]['child'] == 'a'
+    assert rows[0]['due_date'] == projection[0]['due_date'].isoformat()
+
+def ical_events(text):
+    events = []
+    for block in text.split('BEGIN:VEVENT\r\n')[1:]:
+        unfolded = block.split('END:VEVENT')[0].replace('\r\n ', '')
+        events.append(dict(line.split(':', 1) for line in unfolded.split('\r\n') if line))
+    return events
+
+def test_ical_export(recommender):
+    projection = recommender.project_schedule(DOB, 2 * 365, as_of=AS_OF)
+    text = to_ical([projection], ['a'])
+    assert text.startswith('BEGIN:VCALENDAR\r\n') and text.endswith('END:VCALENDAR\r\n')
+    assert all(len(line.encode()) <= 75 for line in text.split('\r\n'))
+    events = ical_events(text)
+    assert len(events) == len(projection)
+    assert events[0]['DTSTART;VALUE=DATE'] == DOB.strftime('%Y%m%d')
+    assert len({event['UID'] for event in events}) == len(events)
+
+def test_ical_uids_survive_a_changed_projection(recommender):
+    short = ical_events(to_ical([recommender.project_schedule(DOB, 365, as_of=AS_OF)], ['a']))
+    full = ical_events(to_ical([recommender.project_schedule(DOB, 10 * 365, as_of=AS_OF)], ['a']))
+    by_uid = {event['UID']: event for event in full}
+    for event in short:
+        assert by_uid[event['UID']]['SUMMARY'] == event['SUMMARY']
+        assert by_uid[event['UID']]['DTSTART;VALUE=DATE'] == event['DTSTART;VALUE=DATE']
+    other = ical_events(to_ical([recommender.project_schedule(DOB, 365, as_of=AS_OF)], ['b']))
+    assert not {event['UID'] for event in other} & set(by_uid)
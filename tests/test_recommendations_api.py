@@ -0,0 +1,96 @@
+import io
+import random
+
+import pytest
+
+
+def test_recommend_many_matches_single_lookups(recommender):
+    rng = random.Random(0)
+    ages = [rng.uniform(0, 20 * 365) for _ in range(500)] + [0, 42, 70, 180, 365]
+    results = recommender.recommend_many(ages)
+    for age, result in zip(ages, results):
+        assert result["age_days"] == age
+        assert result["nip"] == recommender.get_nip_recommendations(age)
+        assert result["iap"] == recommender.get_iap_recommendations(age)
+    assert all(result["iap"] == () for result in recommender.recommend_many(ages, include_iap=False))
+
+def batch(client, **kwargs):
+    response = client.post('/api/recommendations/batch', **kwargs)
+    return response.status_code, response.get_json()
+
+def test_batch_accepts_json_and_csv(client):
+    expected = batch(client, json=[0, 6.5, 70])[1]
+    assert expected["count"] == 3
+    assert [result["age"] for result in expected["results"]] == [0, 6.5, 70]
+    assert batch(client, json={"ages": [0, 6.5, 70]})[1] == expected
+    assert batch(client, data="age\n0\n6.5\n\n70\n", content_type='text/csv')[1] == expected
+    upload = {'file': (io.BytesIO(b"name,age\na,0\nb,6.5\nc,70\n"), 'ages.csv')}
+    assert batch(client, data=upload, content_type='multipart/form-data')[1] == expected
+
+def test_batch_converts_units(client):
+    weeks = batch(client, query_string={'age_unit': 'weeks'}, json=[10])[1]["results"][0]
+    days = batch(client, json=[70])[1]["results"][0]
+    assert weeks["age_days"] == 70
+    assert weeks["nip_recommendations"] == days["nip_recommendations"]
+
+def test_batch_matches_single_endpoint(client):
+    for include_iap in ('on', 'off'):
+        single = client.get('/api/recommendations', query_string={
+            'age_value': '70', 'age_unit': 'days', 'include_iap': include_iap}).get_json()
+        result = batch(client, query_string={'include_iap': include_iap}, json=[70])[1]["results"][0]
+        assert result["nip_recommendations"] == single["nip_recommendations"]
+        assert result["iap_recommendations"] == single["iap_recommendations"]
+    # Both leave IAP out unless asked
+    assert batch(client, json=[70])[1]["include_iap"] is False
+
+@pytest.mark.parametrize('ages', [["NaN"], ["inf"], [True], [None], ["abc"], [-1]])
+def test_batch_rejects_invalid_json_ages(client, ages):
+    status, body = batch(client, json=ages)
+    assert status == 400
+    assert "error" in body
+
+def test_batch_rejects_non_finite_json_numbers(client):
+    status, _ = batch(client, data='[1e400]', content_type='application/json')
+    assert status == 400
+
+def test_batch_reports_short_csv_rows(client):
+    status, body = batch(client, data="name,age\na,3\nb\n", content_type='text/csv')
+    assert status == 400
+    assert body == {"error": "Row 3 has no age column"}
+
+def recommendations(client, **args):
+    response = client.get('/api/recommendations', query_string=args)
+    return response.status_code, response.headers.get('X-Cache'), response.get_json()
+
+def test_single_endpoint_matches_recommender(client, recommender):
+    status, _, body = recommendations(client, age_value='10', age_unit='weeks', include_iap='on')
+    assert status == 200
+    assert body["age_days"] == 70
+    assert body["include_iap"] is True
+    assert body["nip_recommendations"] == [r.to_dict() for r in recommender.get_nip_recommendations(70)]
+    assert body["iap_recommendations"] == [r.to_dict() for r in recommender.get_iap_recommendations(70)]
+    assert recommendations(client, age_value='70', age_unit='days')[2]["iap_recommendations"] == []
+
+def test_cache_is_keyed_on_age_in_days(client):
+    before = client.get('/api/recommendations/cache').get_json()
+    assert recommendations(client, age_value='10', age_unit='weeks')[1] == 'MISS'
+    assert recommendations(client, age_value='70', age_unit='days')[1] == 'HIT'
+    assert recommendations(client, age_value='70', age_unit='days', include_iap='on')[1] == 'MISS'
+    stats = client.get('/api/recommendations/cache').get_json()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["misses"] - before["misses"] == 2
+    assert stats["size"] == 2
+
+def test_cache_misses_after_a_reload(client, webapp, monkeypatch):
+    first = recommendations(client, age_value='70', age_unit='days')
+    assert recommendations(client, age_value='70', age_unit='days')[1] == 'HIT'
+    monkeypatch.setattr(webapp.schedules, 'generation', webapp.schedules.generation + 1)
+    again = recommendations(client, age_value='70', age_unit='days')
+    assert again[1] == 'MISS'
+    assert again[2] == first[2]
+
+@pytest.mark.parametrize('age_value', ['', 'abc', '-3', '1e5'])
+def test_single_endpoint_rejects_bad_ages(client, age_value):
+    status, _, body = recommendations(client, age_value=age_value, age_unit='days')
+    assert status == 400
+    assert "error" in body
@@ -0,0 +1,72 @@
+import json
+import math
+
+import pytest
+
+from vaccine_recommender import VaccineRecommender
+
+
+def scan_nip(recommender, entries, age_days):
+    """What get_nip_recommendations returned before the index: a full scan"""
+    found = []
+    for vaccine in entries:
+        due_age = recommender.parse_age(vaccine["due_age"], "nip")
+        max_age = float('inf')
+        if "max_age" in vaccine:
+            max_age = recommender.parse_age(vaccine["max_age"], "nip")
+        if due_age <= age_days <= max_age:
+            found.append({**vaccine, "schedule_type": "NIP", "category": "Government Program"})
+    return found
+
+def scan_iap(recommender, entries, age_days):
+    found = []
+    for vaccine in entries:
+        for age_str in vaccine["schedule"]:
+            if age_str == "Annually from 6m":
+                if age_days >= 6 * 30:
+                    found.append({**vaccine, "due_age": "Annual", "schedule_type": "IAP",
+                                  "is_annual": True})
+                continue
+            elif age_str == "Post-exposure":
+                continue
+            due_age = recommender.parse_age(age_str, "iap")
+            if due_age <= age_days <= due_age + 30:
+                found.append({**vaccine, "due_age": age_str, "schedule_type": "IAP",
+                              "is_annual": False})
+    return found
+
+def probe_ages(recommender):
+    """Every window boundary and its neighbours, plus a sweep of whole days"""
+    ages = set(range(0, 20 * 365, 3))
+    for index in (recommender.nip_index, recommender.iap_index):
+        for key in index.keys:
+            if math.isfinite(key):
+                ages.update((key - 1, key - 0.5, key, key + 0.5, key + 1))
+    return sorted(age for age in ages if age >= 0)
+
+@pytest.fixture(params=['shipped', 'scaled'])
+def schedule_files(request, scaled_schedules):
+    if request.param == 'shipped':
+        return "data/nip_schedule.json", "data/iap_schedule.json"
+    return scaled_schedules
+
+def test_lookups_match_full_scan(schedule_files):
+    nip_path, iap_path = schedule_files
+    recommender = VaccineRecommender(nip_path, iap_path)
+    with open(nip_path) as f:
+        nip_entries = json.load(f)["schedule"]
+    with open(iap_path) as f:
+        iap_entries = json.load(f)["schedule"]
+
+    for age in probe_ages(recommender):
+        nip = [record.to_dict() for record in recommender.get_nip_recommendations(age)]
+        iap = [record.to_dict() for record in recommender.get_iap_recommendations(age)]
+        assert nip == scan_nip(recommender, nip_entries, age), age
+        assert iap == scan_iap(recommender, iap_entries, age), age
+
+def test_lookups_do_not_parse_ages(recommender, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("parse_age called on the request path")
+    monkeypatch.setattr(recommender, 'parse_age', fail)
+    assert recommender.get_nip_recommendations(70)
+    assert recommender.get_iap_recommendations(70)
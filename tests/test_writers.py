@@ -0,0 +1,57 @@
+import random
+import re
+
+import pandas as pd
+import pytest
+
+from writers import (FORMATS, append_dataset, clean_dataframe, dataset_path, dataset_size,
+                     read_dataset, remove_dataset, truncate_dataset)
+
+ROWS = [
+    {'Vaccine': 'BCG*', 'When to give': 'At birth!', 'Dose': '0.05 ml', 'Route': 'Intra-dermal'},
+    {'Vaccine': 'OPV (0)', 'When to give': '  within 15 days ', 'Dose': '2 drops', 'Route': 'Oral'},
+]
+
+def test_clean_matches_per_cell_scrub():
+    rng = random.Random(0)
+    alphabet = 'abcXYZ019 .,;:!?*#@&-/()_éà\t'
+    cells = [[''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))) for _ in range(4)]
+             for _ in range(300)]
+    cells[0] = [None, 1.5, 7, 'nan']
+    df = pd.DataFrame(cells, columns=['a', 'b', 'c', 'd'])
+    expected = df.apply(lambda column: column.map(
+        lambda x: re.sub(r'[^\w\s\-/()]', '', str(x)).strip()))
+    pd.testing.assert_frame_equal(clean_dataframe(df), expected)
+
+def test_csv_appends_without_repeating_the_header(tmp_path):
+    path = dataset_path(str(tmp_path), 'nip_schedule', 'csv')
+    assert append_dataset(ROWS[:1], path, extra_columns={'Page': 1}) == 1
+    assert append_dataset(ROWS[1:], path, extra_columns={'Page': 2}) == 1
+    df = read_dataset(path)
+    assert df['Vaccine'].tolist() == ['BCG', 'OPV (0)']
+    assert df['When to give'].tolist() == ['At birth', 'within 15 days']
+    assert df['Page'].tolist() == [1, 2]
+
+def test_truncate_rolls_back_an_append(tmp_path):
+    path = dataset_path(str(tmp_path), 'nip_schedule', 'csv')
+    append_dataset(ROWS[:1], path)
+    size = dataset_size(path, 'csv')
+    append_dataset(ROWS[1:], path)
+    truncate_dataset(path, 'csv', size)
+    assert read_dataset(path)['Vaccine'].tolist() == ['BCG']
+    remove_dataset(path, 'csv')
+    assert dataset_size(path, 'csv') == 0
+
+@pytest.mark.parametrize('fmt', [fmt for fmt in FORMATS if fmt != 'csv'])
+def test_columnar_datasets_match_csv(tmp_path, fmt):
+    pytest.importorskip('pyarrow')
+    csv_path = dataset_path(str(tmp_path), 'nip_schedule', 'csv')
+    path = dataset_path(str(tmp_path), 'nip_schedule', fmt)
+    for page, row in enumerate(ROWS, 1):
+        append_dataset([row], csv_path, extra_columns={'Page': page})
+        append_dataset([row], path, fmt, extra_columns={'Page': page})
+    assert dataset_size(path, fmt) == 2
+    pd.testing.assert_frame_equal(read_dataset(path, fmt), read_dataset(csv_path), check_dtype=False)
+
+    truncate_dataset(path, fmt, 1)
+    assert read_dataset(path, fmt)['Vaccine'].tolist() == ['BCG']
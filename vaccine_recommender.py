@@ -1,152 +1,496 @@
-import json
-from datetime import datetime, timedelta
-
-class VaccineRecommender:
-    def __init__(self, nip_file, iap_file):
-        """Initialize with both schedule files"""
-        with open(nip_file) as f:
-            self.nip_schedule = json.load(f)["schedule"]
-        with open(iap_file) as f:
-            self.iap_data = json.load(f)
-            self.iap_schedule = self.iap_data["schedule"]
-            self.age_units = self.iap_data["age_units"]
-            self.categories = self.iap_data["categories"]
-    
-    def parse_age(self, age_str, schedule_type="nip"):
-        """Convert age string to days for comparison"""
-        if not age_str:
-            return float('inf')
-            
-        age_str = age_str.lower().strip()
-        
-        if age_str == "at birth":
-            return 0
-        if age_str == "annually from 6m":
-            return 6 * 30  # 6 months in days
-        if age_str == "post-exposure":
-            return float('inf')  # Special case
-        
-        # Handle NIP schedule ages
-        if schedule_type == "nip":
-            if "within" in age_str:
-                if "24 hours" in age_str:
-                    return 1  # 1 day
-                elif "15 days" in age_str:
-                    return 15
-            
-            # Extract numeric value
-            numeric_part = ''.join(c for c in age_str if c.isdigit())
-            if not numeric_part:
-                return float('inf')
-                
-            value = int(numeric_part)
-            
-            if "week" in age_str:
-                return value * 7
-            elif "month" in age_str:
-                return value * 30
-            elif "year" in age_str:
-                return value * 365
-            elif "day" in age_str:
-                return value
-        
-        # Handle IAP schedule ages
-        elif schedule_type == "iap":
-            if age_str.endswith('w'):
-                return int(age_str[:-1]) * 7
-            elif age_str.endswith('m'):
-                return int(age_str[:-1]) * 30
-            elif age_str.endswith('y'):
-                return int(age_str[:-1]) * 365
-        
-        return float('inf')  # Default for unrecognized formats
-    
-    def get_nip_recommendations(self, child_age_days):
-        """Get NIP vaccines due at or before child_age_days"""
-        recommendations = []
-        
-        for vaccine in self.nip_schedule:
-            due_age = self.parse_age(vaccine["due_age"], "nip")
-            
-            max_age = float('inf')
-            if "max_age" in vaccine:
-                max_age = self.parse_age(vaccine["max_age"], "nip")
-            
-            if due_age <= child_age_days <= max_age:
-                recommendations.append({
-                    **vaccine,
-                    "schedule_type": "NIP",
-                    "category": "Government Program"
-                })
-                
-        return recommendations
-    
-    def get_iap_recommendations(self, child_age_days):
-        """Get IAP vaccines due at or before child_age_days"""
-        recommendations = []
-        
-        for vaccine in self.iap_schedule:
-            for age_str in vaccine["schedule"]:
-                if age_str == "Annually from 6m":
-                    if child_age_days >= 6*30:  # 6 months
-                        recommendations.append({
-                            **vaccine,
-                            "due_age": "Annual",
-                            "schedule_type": "IAP",
-                            "is_annual": True
-                        })
-                    continue
-                elif age_str == "Post-exposure":
-                    continue  # Skip post-exposure vaccines
-                
-                due_age = self.parse_age(age_str, "iap")
-                max_age = due_age + 30  # 1 month window
-                
-                if due_age <= child_age_days <= max_age:
-                    recommendations.append({
-                        **vaccine,
-                        "due_age": age_str,
-                        "schedule_type": "IAP",
-                        "is_annual": False
-                    })
-        
-        return recommendations
-    
-    def get_all_schedules(self):
-        """Get complete schedules from both programs"""
-        return {
-            "nip": self.nip_schedule,
-            "iap": self.iap_schedule,
-            "iap_categories": self.categories
-        }
-    
-    def get_formatted_schedule(self, schedule_type):
-        """Get schedule in a more user-friendly format"""
-        if schedule_type == "nip":
-            return self.nip_schedule
-        elif schedule_type == "iap":
-            formatted = []
-            for vaccine in self.iap_schedule:
-                formatted_doses = []
-                for dose in vaccine["schedule"]:
-                    if dose == "Birth":
-                        formatted_doses.append("At birth")
-                    elif dose == "Annually from 6m":
-                        formatted_doses.append("Annually (starting at 6 months)")
-                    elif dose == "Post-exposure":
-                        formatted_doses.append("Post-exposure only")
-                    else:
-                        try:
-                            unit = self.age_units.get(dose[-1], "")
-                            value = dose[:-1]
-                            formatted_doses.append(f"{value} {unit}")
-                        except (IndexError, KeyError):
-                            formatted_doses.append(dose)
-                
-                formatted.append({
-                    "vaccine": vaccine["vaccine"],
-                    "schedule": ", ".join(formatted_doses),
-                    "category": vaccine["category"]
-                })
-            return formatted
+import heapq
+import json
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from types import MappingProxyType
+
+import numpy as np
+
+# Fields of NIP and IAP entries, plus the ones the indexes add
+RECORD_FIELDS = ('vaccine', 'due_age', 'max_age', 'dose', 'diluent', 'route', 'site',
+                 'schedule', 'category', 'notes', 'schedule_type', 'is_annual')
+_RECORD_FIELD_SET = frozenset(RECORD_FIELDS)
+
+class ScheduleRecord:
+    """One compiled schedule entry, built once and shared by every lookup.
+
+    Read-only. Fields read as attributes (record.vaccine) or like a dict
+    (record['vaccine'], record.get('site')), so templates written against
+    the JSON dicts work unchanged; fields the entry lacks are missing, not
+    None. Keys outside RECORD_FIELDS are kept in a read-only mapping.
+    ``json`` holds the entry already serialized, so API responses are
+    joined from these strings instead of re-encoding the fields.
+    """
+
+    __slots__ = RECORD_FIELDS + ('_keys', '_extra', 'json')
+
+    # Entries of one schedule share a few key orders; keep one tuple of each
+    _key_orders = {}
+
+    def __init__(self, fields):
+        keys = tuple(fields)
+        extra = {}
+        for key, value in fields.items():
+            if isinstance(value, list):
+                value = tuple(value)
+            if key in _RECORD_FIELD_SET:
+                object.__setattr__(self, key, value)
+            else:
+                extra[key] = value
+        object.__setattr__(self, '_keys', self._key_orders.setdefault(keys, keys))
+        object.__setattr__(self, '_extra', MappingProxyType(extra) if extra else None)
+        object.__setattr__(self, 'json', json.dumps(fields))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ScheduleRecord is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("ScheduleRecord is read-only")
+
+    def __getitem__(self, key):
+        if key in _RECORD_FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def keys(self):
+        return self._keys
+
+    def items(self):
+        return [(key, self[key]) for key in self._keys]
+
+    def to_dict(self):
+        """A plain (mutable) dict copy, as the JSON API sends it"""
+        return json.loads(self.json)
+
+    def __repr__(self):
+        return f"ScheduleRecord({self.json})"
+
+
+def records_json(records):
+    """JSON array of records, joined from their pre-serialized forms"""
+    return '[' + ', '.join(record.json for record in records) + ']'
+
+
+class AgeIndex:
+    """Sorted (start_day, end_day, record) table with precomputed lookups.
+
+    Every distinct window boundary becomes a key. The answer for each key and
+    for each gap between neighbouring keys is precomputed into ``slots``:
+    slot ``2*i`` holds the records covering the gap just below ``keys[i]``,
+    slot ``2*i + 1`` the records whose closed window contains ``keys[i]``.
+    A lookup is then one bisect.
+    """
+
+    def __init__(self, intervals):
+        # Keep source order for ties so results match schedule order
+        self.intervals = sorted(
+            ((start, end, seq, record) for seq, (start, end, record) in enumerate(intervals)),
+            key=lambda item: (item[0], item[2])
+        )
+        self.keys = sorted({start for start, _, _, _ in self.intervals} |
+                           {end for _, end, _, _ in self.intervals})
+        self._keys_array = np.asarray(self.keys, dtype=float)
+        by_seq = sorted(self.intervals, key=lambda item: item[2])
+
+        self.slots = []
+        previous = None
+        for key in self.keys:
+            if previous is None:
+                self._append_slot(())
+            else:
+                self._append_slot(tuple(
+                    record for start, end, _, record in by_seq
+                    if start <= previous and end >= key
+                ))
+            self._append_slot(tuple(
+                record for start, end, _, record in by_seq if start <= key <= end
+            ))
+            previous = key
+        # Anything past the last boundary is outside every window
+        self._append_slot(())
+
+    def _append_slot(self, records):
+        # Neighbouring slots often hold the same records; share one tuple
+        if self.slots and self.slots[-1] == records:
+            records = self.slots[-1]
+        self.slots.append(records)
+
+    def slot_for(self, age_days):
+        """Slot number holding the answer for age_days"""
+        i = bisect_left(self.keys, age_days)
+        if i < len(self.keys) and self.keys[i] == age_days:
+            return 2 * i + 1
+        return 2 * i
+
+    def slots_for_many(self, ages_days):
+        """Vectorized slot_for over an array of ages"""
+        ages = np.asarray(ages_days, dtype=float)
+        if not self.keys:
+            return np.zeros(ages.shape, dtype=np.intp)
+        i = np.searchsorted(self._keys_array, ages, side='left')
+        exact = self._keys_array[np.minimum(i, len(self.keys) - 1)] == ages
+        return 2 * i + exact
+
+    def lookup(self, age_days):
+        """Records whose window contains age_days, in schedule order.
+
+        Returns the shared, immutable slot tuple itself; nothing is copied.
+        """
+        return self.slots[self.slot_for(age_days)]
+
+    def __len__(self):
+        return len(self.intervals)
+
+
+# Default projection horizon: through childhood
+DEFAULT_HORIZON_DAYS = 18 * 365
+# Longest accepted horizon; annual doses repeat until it, so it bounds the work
+MAX_HORIZON_DAYS = 100 * 365
+# Days between repeats of an annual IAP dose
+ANNUAL_INTERVAL_DAYS = 365
+
+def to_date(value):
+    """A date from a date, a datetime or an ISO 'YYYY-MM-DD' string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+
+def _horizon_days(horizon):
+    if horizon is None:
+        return DEFAULT_HORIZON_DAYS
+    days = horizon.days if isinstance(horizon, timedelta) else int(horizon)
+    if not 1 <= days <= MAX_HORIZON_DAYS:
+        raise ValueError(f"Horizon must be between 1 and {MAX_HORIZON_DAYS} days")
+    return days
+
+def _dose_status(due_date, window_end, as_of):
+    # Assumes the dose has not been given; callers filter recorded doses
+    if window_end is not None and window_end < as_of:
+        return "overdue"
+    if due_date <= as_of:
+        return "due"
+    return "upcoming"
+
+def _annual_doses(record, first_day):
+    """(due_day, window_end_day, record) for every repeat of an annual dose"""
+    due = first_day
+    while True:
+        yield due, due + ANNUAL_INTERVAL_DAYS - 1, record
+        due += ANNUAL_INTERVAL_DAYS
+
+
+class VaccineRecommender:
+    def __init__(self, nip_file, iap_file):
+        """Initialize with both schedule files.
+
+        Only compiled records are kept, not the parsed JSON: nip_schedule and
+        iap_schedule hold one read-only ScheduleRecord per file entry, and
+        the indexes share the NIP ones and the IAP ones' field values.
+        """
+        with open(nip_file) as f:
+            nip_entries = json.load(f)["schedule"]
+        with open(iap_file) as f:
+            iap_data = json.load(f)
+        self.age_units = iap_data["age_units"]
+        self.categories = iap_data["categories"]
+
+        # Parse every age string once; requests only hit the compiled indexes
+        self.nip_index = self._compile_nip_index(nip_entries)
+        self.iap_index = self._compile_iap_index(iap_data["schedule"])
+        self._compile_due_lists()
+    
+    def parse_age(self, age_str, schedule_type="nip"):
+        """Convert age string to days for comparison"""
+        if not age_str:
+            return float('inf')
+            
+        age_str = age_str.lower().strip()
+        
+        if age_str == "at birth":
+            return 0
+        if age_str == "annually from 6m":
+            return 6 * 30  # 6 months in days
+        if age_str == "post-exposure":
+            return float('inf')  # Special case
+        
+        # Handle NIP schedule ages
+        if schedule_type == "nip":
+            if "within" in age_str:
+                if "24 hours" in age_str:
+                    return 1  # 1 day
+                elif "15 days" in age_str:
+                    return 15
+            
+            # Extract numeric value
+            numeric_part = ''.join(c for c in age_str if c.isdigit())
+            if not numeric_part:
+                return float('inf')
+                
+            value = int(numeric_part)
+            
+            if "week" in age_str:
+                return value * 7
+            elif "month" in age_str:
+                return value * 30
+            elif "year" in age_str:
+                return value * 365
+            elif "day" in age_str:
+                return value
+        
+        # Handle IAP schedule ages
+        elif schedule_type == "iap":
+            if age_str.endswith('w'):
+                return int(age_str[:-1]) * 7
+            elif age_str.endswith('m'):
+                return int(age_str[:-1]) * 30
+            elif age_str.endswith('y'):
+                return int(age_str[:-1]) * 365
+        
+        return float('inf')  # Default for unrecognized formats
+    
+    def _compile_nip_index(self, entries):
+        """Build the NIP age-window index from the file's entries"""
+        intervals = []
+        for vaccine in entries:
+            due_age = self.parse_age(vaccine["due_age"], "nip")
+
+            max_age = float('inf')
+            if "max_age" in vaccine:
+                max_age = self.parse_age(vaccine["max_age"], "nip")
+
+            intervals.append((due_age, max_age, ScheduleRecord({
+                **vaccine,
+                "schedule_type": "NIP",
+                "category": "Government Program"
+            })))
+        self.nip_schedule = tuple(record for _, _, record in intervals)
+        return AgeIndex(intervals)
+
+    def _compile_iap_index(self, entries):
+        """Build the IAP age-window index, one window per scheduled dose"""
+        intervals = []
+        self.iap_schedule = tuple(ScheduleRecord(vaccine) for vaccine in entries)
+        for entry in self.iap_schedule:
+            # Dose records reuse the entry's values (its schedule tuple too)
+            vaccine = dict(entry.items())
+            for age_str in entry.schedule:
+                if age_str == "Annually from 6m":
+                    intervals.append((6*30, float('inf'), ScheduleRecord({  # 6 months onwards
+                        **vaccine,
+                        "due_age": "Annual",
+                        "schedule_type": "IAP",
+                        "is_annual": True
+                    })))
+                    continue
+                elif age_str == "Post-exposure":
+                    continue  # Skip post-exposure vaccines
+
+                due_age = self.parse_age(age_str, "iap")
+                max_age = due_age + 30  # 1 month window
+
+                intervals.append((due_age, max_age, ScheduleRecord({
+                    **vaccine,
+                    "due_age": age_str,
+                    "schedule_type": "IAP",
+                    "is_annual": False
+                })))
+        return AgeIndex(intervals)
+
+    def _compile_due_lists(self):
+        """Every dose as (due_day, window_end_day, record), sorted by due day.
+
+        Built from the indexes' sorted windows. Annual IAP doses have an
+        open window there and are kept apart, to be repeated per year.
+        """
+        self._nip_doses = [(start, end, record)
+                           for start, end, _, record in self.nip_index.intervals
+                           if start != float('inf')]
+        self._iap_doses = []
+        self._iap_annual = []
+        for start, end, _, record in self.iap_index.intervals:
+            if record.get("is_annual"):
+                self._iap_annual.append((start, record))
+            elif start != float('inf'):
+                self._iap_doses.append((start, end, record))
+
+    def _due_doses(self, include_iap=True):
+        """All doses in due order: one linear merge of the sorted lists"""
+        streams = [self._nip_doses]
+        if include_iap:
+            streams.append(self._iap_doses)
+            streams.extend(_annual_doses(record, start) for start, record in self._iap_annual)
+        return heapq.merge(*streams, key=itemgetter(0))
+
+    def project_schedule(self, date_of_birth, horizon=None, as_of=None, include_iap=True):
+        """A child's whole calendar: every dose due within horizon of birth.
+
+        horizon is a timedelta or a number of days (default 18 years);
+        as_of (default today) decides each dose's status: "overdue" once
+        its window has closed, "due" inside the window, else "upcoming".
+        Returns dicts in due-date order with the vaccine, schedule type,
+        due age, absolute due_date and window_end (None when open-ended),
+        status and the underlying record.
+        """
+        dob = to_date(date_of_birth)
+        as_of = to_date(as_of) if as_of is not None else date.today()
+        horizon_days = _horizon_days(horizon)
+
+        projection = []
+        for due, end, record in self._due_doses(include_iap):
+            if due > horizon_days:
+                break
+            due_date = dob + timedelta(days=due)
+            window_end = dob + timedelta(days=end) if end != float('inf') else None
+            projection.append({
+                "vaccine": record.vaccine,
+                "schedule_type": record.schedule_type,
+                "due_age": record.due_age,
+                "due_date": due_date,
+                "window_end": window_end,
+                "status": _dose_status(due_date, window_end, as_of),
+                "record": record
+            })
+        return projection
+
+    def project_schedules(self, dates_of_birth, horizon=None, as_of=None, include_iap=True):
+        """project_schedule for many children at once.
+
+        The doses within horizon are merged once; every child's dates and
+        statuses then come from one vectorized add and compare over
+        (children x doses). Returns one projection list per date of birth.
+        """
+        as_of = np.datetime64(to_date(as_of) if as_of is not None else date.today(), 'D')
+        horizon_days = _horizon_days(horizon)
+        doses = []
+        for dose in self._due_doses(include_iap):
+            if dose[0] > horizon_days:
+                break
+            doses.append(dose)
+        dobs = np.array([to_date(dob) for dob in dates_of_birth], dtype='datetime64[D]')
+        if not doses or not len(dobs):
+            return [[] for _ in dobs]
+
+        due_days = np.array([due for due, _, _ in doses], dtype='timedelta64[D]')
+        open_ended = np.array([end == float('inf') for _, end, _ in doses])
+        end_days = np.array([0 if end == float('inf') else end for _, end, _ in doses],
+                            dtype='timedelta64[D]')
+
+        due_dates = dobs[:, None] + due_days[None, :]
+        window_ends = dobs[:, None] + end_days[None, :]
+        overdue = (window_ends < as_of) & ~open_ended[None, :]
+        due_now = ~overdue & (due_dates <= as_of)
+        status = np.where(overdue, "overdue", np.where(due_now, "due", "upcoming"))
+
+        fixed = [(record.vaccine, record.schedule_type, record.due_age, record,
+                  is_open) for (_, _, record), is_open in zip(doses, open_ended.tolist())]
+        projections = []
+        for child_due, child_end, child_status in zip(due_dates.tolist(), window_ends.tolist(),
+                                                      status.tolist()):
+            projections.append([
+                {
+                    "vaccine": vaccine,
+                    "schedule_type": schedule_type,
+                    "due_age": due_age,
+                    "due_date": due_date,
+                    "window_end": None if is_open else window_end,
+                    "status": dose_status,
+                    "record": record
+                }
+                for (vaccine, schedule_type, due_age, record, is_open), due_date, window_end, dose_status
+                in zip(fixed, child_due, child_end, child_status)
+            ])
+        return projections
+
+    def get_nip_recommendations(self, child_age_days):
+        """Get NIP vaccines due at or before child_age_days"""
+        return self.nip_index.lookup(child_age_days)
+
+    def get_iap_recommendations(self, child_age_days):
+        """Get IAP vaccines due at or before child_age_days"""
+        return self.iap_index.lookup(child_age_days)
+
+    def recommend_many(self, ages_days, include_iap=True):
+        """Get recommendations for a whole cohort of ages in one pass.
+
+        Returns one dict per age with ``nip`` and ``iap`` tuples. Children
+        falling in the same age window share the same (immutable) tuples.
+        """
+        ages = np.asarray(ages_days, dtype=float).ravel()
+        nip_slots = self.nip_index.slots_for_many(ages).tolist()
+        if include_iap:
+            iap_slots = self.iap_index.slots_for_many(ages).tolist()
+        else:
+            iap_slots = [None] * len(nip_slots)
+
+        nip_table = self.nip_index.slots
+        iap_table = self.iap_index.slots
+        return [
+            {
+                "age_days": age,
+                "nip": nip_table[nip_slot],
+                "iap": iap_table[iap_slot] if iap_slot is not None else ()
+            }
+            for age, nip_slot, iap_slot in zip(ages.tolist(), nip_slots, iap_slots)
+        ]
+
+    def get_all_schedules(self):
+        """Get complete schedules from both programs"""
+        return {
+            "nip": self.nip_schedule,
+            "iap": self.iap_schedule,
+            "iap_categories": self.categories
+        }
+    
+    def get_formatted_schedule(self, schedule_type):
+        """Get schedule in a more user-friendly format"""
+        if schedule_type == "nip":
+            return self.nip_schedule
+        elif schedule_type == "iap":
+            formatted = []
+            for vaccine in self.iap_schedule:
+                formatted_doses = []
+                for dose in vaccine["schedule"]:
+                    if dose == "Birth":
+                        formatted_doses.append("At birth")
+                    elif dose == "Annually from 6m":
+                        formatted_doses.append("Annually (starting at 6 months)")
+                    elif dose == "Post-exposure":
+                        formatted_doses.append("Post-exposure only")
+                    else:
+                        try:
+                            unit = self.age_units.get(dose[-1], "")
+                            value = dose[:-1]
+                            formatted_doses.append(f"{value} {unit}")
+                        except (IndexError, KeyError):
+                            formatted_doses.append(dose)
+                
+                formatted.append({
+                    "vaccine": vaccine["vaccine"],
+                    "schedule": ", ".join(formatted_doses),
+                    "category": vaccine["category"]
+                })
+            return formatted
         return []
\ No newline at end of file
@@ -0,0 +1,93 @@
+import glob
+import os
+import re
+
+# pandas is imported when a dataset is written or read, not at import time
+
+NOISE_PATTERN = re.compile(r'[^\w\s\-/()]')
+
+FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather'
+}
+
+def clean_dataframe(df):
+    """Strip OCR noise characters from every cell, one column at a time"""
+    return df.apply(
+        lambda column: column.astype(str).str.replace(NOISE_PATTERN, '', regex=True).str.strip()
+    )
+
+def dataset_path(output_dir, name, fmt):
+    """Where a schedule's combined output lives for the given format.
+
+    CSV appends to a single file. Parquet and Feather files cannot be
+    appended to, so those datasets are directories of numbered part files.
+    """
+    return os.path.join(output_dir, name + FORMATS[fmt])
+
+def _parts(path, fmt):
+    return sorted(glob.glob(os.path.join(path, f"part-*{FORMATS[fmt]}")))
+
+def dataset_size(path, fmt):
+    """Bytes for a CSV, number of part files for a directory dataset"""
+    if fmt == 'csv':
+        return os.path.getsize(path) if os.path.exists(path) else 0
+    return len(_parts(path, fmt))
+
+def truncate_dataset(path, fmt, size):
+    """Roll a dataset back to an earlier dataset_size()"""
+    if fmt == 'csv':
+        if not os.path.exists(path):
+            return
+        if size:
+            with open(path, 'r+b') as f:
+                f.truncate(size)
+        else:
+            os.remove(path)
+        return
+    for part in _parts(path, fmt)[size:]:
+        os.remove(part)
+
+def remove_dataset(path, fmt):
+    truncate_dataset(path, fmt, 0)
+
+def append_dataset(data, path, fmt='csv', extra_columns=None):
+    """Clean rows and append them to a dataset without rewriting it.
+
+    extra_columns are added after cleaning, so their values are kept as is.
+    Returns the number of rows written.
+    """
+    import pandas as pd
+    df = clean_dataframe(pd.DataFrame(data))
+    for column, value in (extra_columns or {}).items():
+        df[column] = value
+
+    if fmt == 'csv':
+        write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+        df.to_csv(path, mode='a', header=write_header, index=False, encoding='utf-8')
+        return len(df)
+
+    os.makedirs(path, exist_ok=True)
+    part = os.path.join(path, f"part-{len(_parts(path, fmt)):06d}{FORMATS[fmt]}")
+    tmp_path = part + '.tmp'
+    try:
+        if fmt == 'parquet':
+            df.to_parquet(tmp_path, index=False)
+        elif fmt == 'feather':
+            df.reset_index(drop=True).to_feather(tmp_path)
+        else:
+            raise ValueError(f"Unknown output format '{fmt}'")
+    except ImportError as e:
+        raise ImportError(f"Writing {fmt} needs pyarrow (pip install pyarrow): {str(e)}")
+    os.replace(tmp_path, part)
+    return len(df)
+
+def read_dataset(path, fmt='csv'):
+    """Load a whole dataset back into one DataFrame"""
+    import pandas as pd
+    if fmt == 'csv':
+        return pd.read_csv(path)
+    reader = pd.read_parquet if fmt == 'parquet' else pd.read_feather
+    parts = [reader(part) for part in _parts(path, fmt)]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
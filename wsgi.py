@@ -0,0 +1,27 @@
+"""Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+gunicorn.conf.py sets preload_app, so the master imports this module once:
+the schedules are parsed, their age indexes compiled and the static pages
+rendered before any worker is forked. Workers then share those objects
+copy-on-write instead of each rebuilding them from JSON.
+"""
+import gc
+
+from app import app, prerender_static_pages
+
+def create_app(freeze=True):
+    """Build everything the workers share, once, in the current process.
+
+    freeze moves every object alive now into the garbage collector's
+    permanent generation. Collections in forked workers then never touch
+    (and so never copy) the pages holding the shared schedules.
+    """
+    prerender_static_pages()
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    return app
+
+application = create_app()